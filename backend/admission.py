@@ -0,0 +1,163 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+# Prometheus Metrics
+ADMISSION_IN_FLIGHT = Gauge("admission_in_flight", "Requests currently being processed", ["lane"])
+ADMISSION_QUEUE_DEPTH = Gauge("admission_queue_depth", "Requests waiting for a processing slot", ["lane"])
+ADMISSION_QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds",
+    "Time admitted requests spent waiting for a processing slot",
+    ["lane"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+ADMISSION_REJECTIONS = Counter("admission_rejections_total", "Requests rejected by admission control", ["lane", "reason"])
+
+class Rejected(Exception):
+    def __init__(self, status_code, reason, retry_after):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """ Concurrency limiter with bounded, prioritized wait queues and per-request deadlines
+
+    At most `max_concurrency` requests run at once, of which at most
+    `bulk_max_concurrency` may be bulk requests, so single-patient calls always have
+    capacity left. When a slot frees up, waiting interactive requests are admitted
+    before bulk ones. A request is rejected immediately with 429 when its lane's queue
+    is full, and with 503 when its deadline passes (or has already passed) before a
+    slot is available. Must be used from a single event loop.
+    """
+
+    def __init__(self, max_concurrency=4, max_queue=32, bulk_max_concurrency=1, timeout=2.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.bulk_max_concurrency = min(bulk_max_concurrency, max_concurrency)
+        self.timeout = timeout
+        self.in_flight = {lane: 0 for lane in LANES}
+        self.waiters = {lane: deque() for lane in LANES}
+        self.service_time = 0.05  # Moving average of request duration, for Retry-After
+
+    def _has_slot(self, lane):
+        if sum(self.in_flight.values()) >= self.max_concurrency:
+            return False
+        return lane == INTERACTIVE or self.in_flight[BULK] < self.bulk_max_concurrency
+
+    def _take_slot(self, lane):
+        self.in_flight[lane] += 1
+        ADMISSION_IN_FLIGHT.labels(lane=lane).set(self.in_flight[lane])
+
+    def retry_after(self, lane):
+        """ Seconds until the current backlog is likely drained (at least 1) """
+        capacity = self.max_concurrency if lane == INTERACTIVE else self.bulk_max_concurrency
+        backlog = sum(len(w) for w in self.waiters.values()) if lane == BULK else len(self.waiters[INTERACTIVE])
+        return max(1, math.ceil((backlog + 1) * self.service_time / capacity))
+
+    def _reject(self, lane, status_code, reason):
+        ADMISSION_REJECTIONS.labels(lane=lane, reason=reason).inc()
+        return Rejected(status_code, reason, self.retry_after(lane))
+
+    async def acquire(self, lane, timeout=None):
+        """ Wait for a processing slot; raises Rejected instead of waiting past the deadline """
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        if timeout <= 0:
+            raise self._reject(lane, 503, "deadline_exceeded")
+
+        # Only take a free slot directly if nobody of equal or higher priority is waiting
+        ahead = len(self.waiters[INTERACTIVE]) + (len(self.waiters[BULK]) if lane == BULK else 0)
+        if ahead == 0 and self._has_slot(lane):
+            self._take_slot(lane)
+            ADMISSION_QUEUE_WAIT.labels(lane=lane).observe(0)
+            return
+
+        if len(self.waiters[lane]) >= self.max_queue:
+            raise self._reject(lane, 429, "queue_full")
+
+        waiter = asyncio.get_event_loop().create_future()
+        self.waiters[lane].append(waiter)
+        ADMISSION_QUEUE_DEPTH.labels(lane=lane).set(len(self.waiters[lane]))
+        start_time = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(lane, waiter)
+            raise self._reject(lane, 503, "deadline_exceeded")
+        except asyncio.CancelledError:
+            # Client disconnected (or the task was cancelled) while queued
+            self._abandon(lane, waiter)
+            raise
+        finally:
+            ADMISSION_QUEUE_DEPTH.labels(lane=lane).set(len(self.waiters[lane]))
+        ADMISSION_QUEUE_WAIT.labels(lane=lane).observe(time.monotonic() - start_time)
+
+    def _abandon(self, lane, waiter):
+        """ Give up a queued request without losing its slot """
+        if waiter.done():
+            # The slot was granted just before the request gave up; hand it back
+            self.release(lane)
+        else:
+            waiter.cancel()
+            self.waiters[lane].remove(waiter)
+
+    def release(self, lane, duration=None):
+        """ Free a slot and admit the next waiter(s), interactive first """
+        self.in_flight[lane] -= 1
+        ADMISSION_IN_FLIGHT.labels(lane=lane).set(self.in_flight[lane])
+        if duration is not None:
+            self.service_time = 0.9 * self.service_time + 0.1 * duration
+
+        for next_lane in LANES:
+            while self.waiters[next_lane] and self._has_slot(next_lane):
+                waiter = self.waiters[next_lane].popleft()
+                self._take_slot(next_lane)
+                waiter.set_result(True)
+            ADMISSION_QUEUE_DEPTH.labels(lane=next_lane).set(len(self.waiters[next_lane]))
+
+class AdmissionMiddleware(BaseHTTPMiddleware):
+    """ Applies an AdmissionController to the prediction endpoints
+
+    `classify(request)` returns the lane of a request, or None to bypass admission
+    control (e.g. /metrics). Clients may pass their remaining time budget in seconds
+    through the `X-Request-Timeout` header.
+    """
+
+    def __init__(self, app, controller, classify):
+        super().__init__(app)
+        self.controller = controller
+        self.classify = classify
+
+    async def dispatch(self, request, call_next):
+        lane = self.classify(request)
+        if lane is None:
+            return await call_next(request)
+
+        try:
+            timeout = float(request.headers.get("X-Request-Timeout", self.controller.timeout))
+        except ValueError:
+            timeout = self.controller.timeout
+
+        try:
+            await self.controller.acquire(lane, timeout)
+        except Rejected as e:
+            return JSONResponse(
+                {"error": "Server is overloaded, retry later", "reason": e.reason},
+                status_code=e.status_code,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+
+        start_time = time.monotonic()
+        try:
+            return await call_next(request)
+        finally:
+            self.controller.release(lane, time.monotonic() - start_time)
@@ -1,4 +1,6 @@
-from fastapi import FastAPI
+from typing import List, Optional, Union
+
+from fastapi import FastAPI, Header
 import uvicorn
 import pandas as pd
 import os
@@ -11,6 +13,15 @@ from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 
+from admission import BULK, INTERACTIVE, AdmissionController, AdmissionMiddleware
+from compact_forest import CompactForest
+from drift import DriftMonitor
+from explain import PathExplainer
+from feature_store import FeatureStore
+from inference_pool import InferencePool
+from registry import MODEL_LATENCY, ModelRegistry
+from shadow import ShadowScorer
+
 # Load environment variables from .env file (if running locally)
 load_dotenv()
 
@@ -23,9 +34,43 @@ MODEL_KEY = os.getenv("MODEL_KEY", "models/sagemaker-scikit-learn-2025-03-13-20-
 if not all([AWS_REGION, S3_BUCKET, MODEL_KEY]):
     raise EnvironmentError("Missing AWS environment variables! Ensure AWS_REGION, S3_BUCKET, and MODEL_KEY are set.")
 
+# Precomputed feature store (built by scripts/model_prep.py)
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "feature_store")
+
 # Define model paths
 MODEL_TAR_PATH = "model.tar.gz"  # Downloaded model archive
 MODEL_PKL_PATH = "model.pkl"  # Extracted model file
+MODEL_COMPACT_PATH = "model.npz"  # Optional compact model from scripts/compress_model.py
+DRIFT_REFERENCE_PATH = "drift_reference.json"  # Training distribution written by train_script.py
+
+# Model registry configuration: extra models servable by name, as
+# "name=<S3 key of model.tar.gz or SageMaker training job name>,..." (e.g. per site or A/B cohort)
+DEFAULT_MODEL_NAME = "default"  # The MODEL_KEY model, always loaded
+MODEL_VERSIONS = os.getenv("MODEL_VERSIONS", "")
+MODEL_REGISTRY_DIR = "registry"  # Downloaded registry models, one directory per name
+MODEL_REGISTRY_MEMORY_MB = int(os.getenv("MODEL_REGISTRY_MEMORY_MB", 512))
+
+# Shadow model configuration (leave SHADOW_MODEL_KEY empty to disable)
+SHADOW_MODEL_KEY = os.getenv("SHADOW_MODEL_KEY", "")
+SHADOW_TAR_PATH = "shadow_model.tar.gz"
+SHADOW_PKL_PATH = "shadow_model.pkl"
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", 1000))
+SHADOW_BATCH_SIZE = int(os.getenv("SHADOW_BATCH_SIZE", 32))
+
+# Drift monitoring configuration
+DRIFT_INTERVAL_SECONDS = int(os.getenv("DRIFT_INTERVAL_SECONDS", 60))
+DRIFT_MIN_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", 100))
+
+# Admission control configuration (requests beyond the queue are rejected instead of piling up)
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", 4))
+ADMISSION_BULK_MAX_CONCURRENCY = int(os.getenv("ADMISSION_BULK_MAX_CONCURRENCY", 1))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 32))
+ADMISSION_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_TIMEOUT_SECONDS", 2.0))
+
+# Process-pool inference for the default model (0 keeps predictions in the API process)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 0))
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", 1024))
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", 10.0))
 
 # Initialize S3 client
 s3_client = boto3.client("s3", region_name=AWS_REGION)
@@ -48,51 +93,175 @@ class MetricsMiddleware(BaseHTTPMiddleware):
 
         return response
 
-def download_and_extract_model():
+def request_lane(request):
+    """ Admission lane of a request: bulk scoring, single-patient scoring, or None (not limited) """
+    path = request.url.path
+    if path == "/explain" or (path == "/predict/subject/" and request.method == "POST"):
+        return BULK
+    if path.startswith("/predict/") or (path.startswith("/models/") and path.endswith("/predict/")):
+        return INTERACTIVE
+    return None
+
+def download_and_extract_model(model_key=MODEL_KEY, tar_path=MODEL_TAR_PATH, pkl_path=MODEL_PKL_PATH, extract_dir="."):
     """ Download and extract model from S3 """
     
     # Download if not already present
-    if not os.path.exists(MODEL_PKL_PATH):
-        print(f"Downloading model from s3://{S3_BUCKET}/{MODEL_KEY}...")
-        s3_client.download_file(S3_BUCKET, MODEL_KEY, MODEL_TAR_PATH)
+    if not os.path.exists(pkl_path):
+        print(f"Downloading model from s3://{S3_BUCKET}/{model_key}...")
+        s3_client.download_file(S3_BUCKET, model_key, tar_path)
         print("Model downloaded successfully.")
 
         print("Extracting model archive...")
-        with tarfile.open(MODEL_TAR_PATH, "r:gz") as tar:
+        with tarfile.open(tar_path, "r:gz") as tar:
             members = [m for m in tar.getmembers() if m.name.endswith("model.pkl")]
             if not members:
                 raise FileNotFoundError("Model file not found in archive. Check S3 contents!")
-            tar.extract(members[0], path=".")  # Extract directly in backend
-            extracted_model_name = members[0].name
+            tar.extract(members[0], path=extract_dir)  # Extract directly in backend
+            extracted_model_name = os.path.join(extract_dir, members[0].name)
 
-        # Rename extracted model to MODEL_PKL_PATH
-        os.rename(extracted_model_name, MODEL_PKL_PATH)
-        print(f"Model successfully extracted and renamed to {MODEL_PKL_PATH}")
+        # Rename extracted model to pkl_path
+        os.rename(extracted_model_name, pkl_path)
+        print(f"Model successfully extracted and renamed to {pkl_path}")
 
     else:
-        print(f"Model already exists: {MODEL_PKL_PATH}")
+        print(f"Model already exists: {pkl_path}")
+
+def parse_model_versions(value):
+    """ Parse MODEL_VERSIONS into {name: S3 key}; bare training job names map to their model.tar.gz """
+    versions = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, key = (part.strip() for part in item.partition("="))
+        if not name or not key or name == DEFAULT_MODEL_NAME:
+            raise EnvironmentError(f"Invalid MODEL_VERSIONS entry: {item!r}")
+        versions[name] = key if key.endswith(".tar.gz") else f"models/{key}/output/model.tar.gz"
+    return versions
+
+def load_registered_model(name, key):
+    """ Download (once) and load a registry model into its own directory """
+    model_dir = os.path.join(MODEL_REGISTRY_DIR, name)
+    os.makedirs(model_dir, exist_ok=True)
+    pkl_path = os.path.join(model_dir, "model.pkl")
+    download_and_extract_model(key, os.path.join(model_dir, "model.tar.gz"), pkl_path, extract_dir=model_dir)
+    return joblib.load(pkl_path)
+
+def extract_drift_reference():
+    """ Extract the drift reference from the model archive, if the archive has one """
+
+    if os.path.exists(DRIFT_REFERENCE_PATH) or not os.path.exists(MODEL_TAR_PATH):
+        return
+
+    with tarfile.open(MODEL_TAR_PATH, "r:gz") as tar:
+        members = [m for m in tar.getmembers() if m.name.endswith(DRIFT_REFERENCE_PATH)]
+        if not members:
+            print("No drift reference in model archive. Drift monitoring is disabled.")
+            return
+        tar.extract(members[0], path=".")
+        os.rename(members[0].name, DRIFT_REFERENCE_PATH)
+        print(f"Drift reference extracted to {DRIFT_REFERENCE_PATH}")
 
 # Ensure model is downloaded and extracted
-download_and_extract_model()
+if not os.path.exists(MODEL_COMPACT_PATH):
+    download_and_extract_model()
+extract_drift_reference()
 
-# Load Model
-print(f"Loading model from {MODEL_PKL_PATH}...")
-model = joblib.load(MODEL_PKL_PATH)
+# Load Model (the compact artifact is preferred: smaller and faster to load than pickle)
+if os.path.exists(MODEL_COMPACT_PATH):
+    print(f"Loading compact model from {MODEL_COMPACT_PATH}...")
+    model = CompactForest.load(MODEL_COMPACT_PATH)
+else:
+    print(f"Loading model from {MODEL_PKL_PATH}...")
+    model = joblib.load(MODEL_PKL_PATH)
 print("Model loaded successfully!")
 
-# Extract expected feature names from the model
-if hasattr(model, "feature_names_in_"):  # scikit-learn >= 1.0
-    expected_features = list(model.feature_names_in_)
-elif hasattr(model, "n_features_in_"):  # scikit-learn < 1.0
-    expected_features = [str(i) for i in range(model.n_features_in_)]
-else:
-    raise ValueError("Unable to determine expected feature names from the model!")
+# Register the default model (pinned) next to the lazily loaded MODEL_VERSIONS models
+model_registry = ModelRegistry(
+    parse_model_versions(MODEL_VERSIONS), load_registered_model, MODEL_REGISTRY_MEMORY_MB * 1024 * 1024
+)
+default_entry = model_registry.add(DEFAULT_MODEL_NAME, MODEL_KEY, model, pinned=True)
+print(f"Registered models: {list(model_registry.sources)}")
 
+# Expected feature names of the default model
+expected_features = default_entry.expected_features
 print(f"Expected feature names: {expected_features}")
 
+# Path explainer for /explain (contributions are computed per request)
+explainer = PathExplainer(model, expected_features)
+print(f"Explainer ready (bias: {explainer.bias:.4f})")
+
+# Inference workers are forked by the startup hook, so importing this module starts no process
+inference_pool = None
+
+def default_predict_proba(df):
+    """ Class probabilities of the default model, scored in the inference pool when enabled """
+    if inference_pool is not None:
+        return inference_pool.predict_proba(df.to_numpy())
+    return model.predict_proba(df)
+
+# Load Shadow Model (scored in the background, never returned to clients)
+shadow_scorer = None
+if SHADOW_MODEL_KEY:
+    # Extract into its own directory so the primary model.pkl is never overwritten
+    download_and_extract_model(SHADOW_MODEL_KEY, SHADOW_TAR_PATH, SHADOW_PKL_PATH, extract_dir="shadow")
+    shadow_model = joblib.load(SHADOW_PKL_PATH)
+    if getattr(shadow_model, "n_features_in_", None) != len(expected_features):
+        print("Shadow model expects different features than the primary model. Shadow scoring is disabled.")
+    else:
+        shadow_scorer = ShadowScorer(
+            shadow_model, SHADOW_MODEL_KEY, max_queue=SHADOW_QUEUE_SIZE, batch_size=SHADOW_BATCH_SIZE
+        )
+        print(f"Shadow model loaded from s3://{S3_BUCKET}/{SHADOW_MODEL_KEY}")
+
+# Drift monitoring against the training distribution (started with the app)
+drift_monitor = None
+if os.path.exists(DRIFT_REFERENCE_PATH):
+    drift_monitor = DriftMonitor.from_file(
+        DRIFT_REFERENCE_PATH, interval=DRIFT_INTERVAL_SECONDS, min_samples=DRIFT_MIN_SAMPLES
+    )
+    if drift_monitor.names != expected_features:
+        print("Drift reference features do not match the model. Drift monitoring is disabled.")
+        drift_monitor = None
+    else:
+        print(f"Drift monitoring enabled (window: {DRIFT_INTERVAL_SECONDS}s)")
+
+# Open the feature store (swapped in automatically when a rebuild is published)
+feature_store = FeatureStore(FEATURE_STORE_DIR, expected_features)
+if feature_store.version:
+    print(f"Feature store version: {feature_store.version}")
+elif feature_store.error:
+    print(f"Feature store refused ({feature_store.error}); /predict/subject/ is unavailable")
+else:
+    print(f"No feature store found in {FEATURE_STORE_DIR}; /predict/subject/ is unavailable")
+
 # Initialize FastAPI
 app = FastAPI()
-app.add_middleware(MetricsMiddleware)  # Add Prometheus Middleware
+admission_controller = AdmissionController(
+    max_concurrency=ADMISSION_MAX_CONCURRENCY,
+    max_queue=ADMISSION_MAX_QUEUE,
+    bulk_max_concurrency=ADMISSION_BULK_MAX_CONCURRENCY,
+    timeout=ADMISSION_TIMEOUT_SECONDS
+)
+app.add_middleware(AdmissionMiddleware, controller=admission_controller, classify=request_lane)
+app.add_middleware(MetricsMiddleware)  # Add Prometheus Middleware (outermost, so rejections are counted too)
+
+@app.on_event("startup")
+def start_background_work():
+    """ Fork the inference workers, then start the background threads (forking after them is unsafe) """
+    global inference_pool
+    if INFERENCE_WORKERS > 0:
+        inference_pool = InferencePool(
+            explainer.forest, INFERENCE_WORKERS, max_rows=INFERENCE_MAX_BATCH, timeout=INFERENCE_TIMEOUT_SECONDS
+        )
+        print(f"Inference pool started with {INFERENCE_WORKERS} worker processes")
+    if shadow_scorer is not None:
+        shadow_scorer.start()
+    if drift_monitor is not None:
+        drift_monitor.start()
+
+@app.on_event("shutdown")
+def close_inference_pool():
+    """ Stop the inference workers and free their shared buffers """
+    if inference_pool is not None:
+        inference_pool.close()
 
 @app.get("/")
 def home():
@@ -103,28 +272,172 @@ def metrics():
     """ Exposes Prometheus metrics """
     return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
-@app.post("/predict/")
-def predict(data: dict):
-    """ Receive JSON input, convert to DataFrame, and make a prediction """
-    
-    df = pd.DataFrame([data])
-
-    # Ensure input data matches expected features
-    if set(df.columns) != set(expected_features):
+def check_features(df, features):
+    """ Return an error response if the input columns do not match the model's features, else None """
+    if set(df.columns) != set(features):
         return {
             "error": "Feature names do not match model expectations",
             "received": df.columns.tolist(),
-            "expected": expected_features
+            "expected": features
         }
+    return None
+
+def explain_rows(df):
+    """ Class probabilities and per-feature contributions of each row of an ordered feature DataFrame
+
+    One forest traversal gives both, so callers do not score the rows again.
+    """
+    probabilities, contributions = explainer.explain(df)
+    explanations = [
+        {
+            "probability": float(probability),
+            "contributions": dict(zip(expected_features, row.tolist()))
+        }
+        for probability, row in zip(probabilities[:, explainer.positive_class_index], contributions)
+    ]
+    return probabilities, explanations
+
+def resolve_model(name):
+    """ Return (registry entry, None) for a model name, or (None, error response) """
+    name = name or DEFAULT_MODEL_NAME
+    try:
+        return model_registry.get(name), None
+    except KeyError:
+        return None, {"error": f"Unknown model: {name}", "available": list(model_registry.sources)}
+    except Exception as e:
+        return None, {"error": f"Model {name} could not be loaded: {e}"}
+
+def predict_with_model(model_name, data, explain):
+    """ Receive JSON input, convert to DataFrame, and make a prediction with a registry model """
+
+    entry, error = resolve_model(model_name)
+    if error:
+        return error
+    is_default = entry.name == DEFAULT_MODEL_NAME
+    if explain and not is_default:
+        return {"error": "Explanations are only available for the default model"}
+
+    df = pd.DataFrame([data])
+
+    # Ensure input data matches expected features
+    error = check_features(df, entry.expected_features)
+    if error:
+        return error
 
     # Reorder features before prediction
-    df = df[expected_features]
+    df = df[entry.expected_features]
+
+    # Make prediction (same result as model.predict, but keeps the probability for the shadow model);
+    # with `explain`, the explainer's traversal gives the probabilities too
+    start_time = time.time()
+    if explain:
+        probabilities, explanations = explain_rows(df)
+    else:
+        probabilities = default_predict_proba(df) if is_default else entry.model.predict_proba(df)
+    prediction = entry.model.classes_.take(probabilities.argmax(axis=1))
+    MODEL_LATENCY.labels(model=entry.name).observe(time.time() - start_time)
 
-    # Make prediction
-    prediction = model.predict(df)
+    # Hand the default model's inputs to the drift monitor and shadow model (non-blocking)
+    features = df.to_numpy()[0]
+    if is_default and drift_monitor is not None:
+        drift_monitor.observe(features)
+    if is_default and shadow_scorer is not None:
+        shadow_scorer.submit(features, probabilities[0, 1], prediction[0])
+
+    # Optionally include per-feature contributions (probability = bias + sum of contributions)
+    if explain:
+        return {"prediction": int(prediction[0]), "bias": explainer.bias, **explanations[0]}
 
     return {"prediction": int(prediction[0])}  # Return the result
 
+@app.post("/predict/")
+def predict(data: dict, explain: bool = False, x_model_version: Optional[str] = Header(None)):
+    """ Predict with the default model, or the registry model named in the X-Model-Version header """
+    return predict_with_model(x_model_version, data, explain)
+
+@app.post("/models/{model_name}/predict/")
+def predict_model(model_name: str, data: dict, explain: bool = False):
+    """ Predict with the registry model named in the path """
+    return predict_with_model(model_name, data, explain)
+
+@app.get("/models")
+def list_models():
+    """ Registered models and which of them are currently loaded """
+    return {"models": model_registry.status(), "memory_budget_mb": MODEL_REGISTRY_MEMORY_MB}
+
+@app.post("/explain")
+def explain(data: Union[List[dict], dict]):
+    """ Explain one feature dict or a list of them with per-feature contributions """
+
+    batched = isinstance(data, list)
+    df = pd.DataFrame(data if batched else [data])
+
+    error = check_features(df, expected_features)
+    if error:
+        return error
+
+    df = df[expected_features]
+    probabilities, explanations = explain_rows(df)
+    predictions = model.classes_.take(probabilities.argmax(axis=1))
+    explanations = [
+        {"prediction": int(prediction), **explanation}
+        for prediction, explanation in zip(predictions, explanations)
+    ]
+
+    if batched:
+        return {"bias": explainer.bias, "explanations": explanations}
+    return {"bias": explainer.bias, **explanations[0]}
+
+def predict_subjects(subject_ids):
+    """ Look up precomputed features by subject ID and score the found rows
+
+    Returns ([(subject_id, prediction), ...] in request order, missing subject IDs);
+    repeated IDs are scored once per occurrence.
+    """
+    features, found = feature_store.lookup(subject_ids)
+    if len(features):
+        probabilities = default_predict_proba(pd.DataFrame(features, columns=expected_features))
+        predictions = model.classes_.take(probabilities.argmax(axis=1))
+    else:
+        predictions = []
+    found_ids = [sid for sid, hit in zip(subject_ids, found) if hit]
+    missing_ids = [sid for sid, hit in zip(subject_ids, found) if not hit]
+    return list(zip(found_ids, (int(p) for p in predictions))), missing_ids
+
+@app.get("/predict/subject/{subject_id}")
+def predict_subject(subject_id: int):
+    """ Score one subject from the feature store without receiving its features """
+    try:
+        predictions, missing = predict_subjects([subject_id])
+    except (FileNotFoundError, ValueError) as e:
+        return {"error": str(e)}
+
+    if missing:
+        return {"error": "Subject not found in feature store", "subject_id": subject_id}
+
+    return {"subject_id": subject_id, "prediction": predictions[0][1]}
+
+@app.post("/predict/subject/")
+def predict_subject_bulk(data: dict):
+    """ Score several subjects from the feature store: {"subject_ids": [...]} """
+    subject_ids = data.get("subject_ids")
+    # bool is a subclass of int, but true/false are not subject IDs
+    if not isinstance(subject_ids, list) or not all(
+        isinstance(s, int) and not isinstance(s, bool) for s in subject_ids
+    ):
+        return {"error": "Expected a JSON body of the form {\"subject_ids\": [int, ...]}"}
+
+    try:
+        predictions, missing = predict_subjects(subject_ids)
+    except (FileNotFoundError, ValueError) as e:
+        return {"error": str(e)}
+
+    return {
+        "predictions": [{"subject_id": sid, "prediction": pred} for sid, pred in predictions],
+        "missing": missing,
+        "feature_store_version": feature_store.version
+    }
+
 # Read port from environment variables (default: 8080)
 PORT = int(os.getenv("PORT", 8080))
 
@@ -0,0 +1,160 @@
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+def _smallest_int(max_value, signed=True):
+    """ Smallest integer dtype able to hold `max_value` """
+    candidates = (np.int16, np.int32, np.int64) if signed else (np.uint8, np.uint16, np.uint32)
+    for dtype in candidates:
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    raise ValueError(f"Value {max_value} does not fit any supported integer type")
+
+def float32_thresholds(thresholds):
+    """ Round split thresholds to float32 without changing any split decision
+
+    Trees compare float32 inputs against float64 thresholds. Rounding a threshold
+    *down* to the nearest float32 keeps `x <= t` identical for every float32 `x`.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    rounded = thresholds.astype(np.float32)
+    too_high = rounded.astype(np.float64) > thresholds
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+class CompactForest:
+    """ Flat-array random forest for fast loading and vectorized inference
+
+    All trees are concatenated into one set of node arrays; children hold global
+    node indices (-1 marks a leaf), `tree_roots` holds the root of each tree and
+    `value` holds the class distribution of every node (internal nodes included,
+    which is what path-based explanations need).
+    Mirrors the parts of the RandomForestClassifier API used by the app:
+    `predict_proba`, `predict`, `classes_` and `n_features_in_`.
+    """
+
+    def __init__(self, children_left, children_right, feature, threshold, value, tree_roots, classes, n_features):
+        self.children_left = children_left
+        self.children_right = children_right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.tree_roots = tree_roots
+        self.classes_ = np.asarray(classes)
+        self.n_classes_ = len(self.classes_)
+        self.n_features_in_ = int(n_features)
+
+    @property
+    def n_estimators(self):
+        return len(self.tree_roots)
+
+    @property
+    def node_count(self):
+        return len(self.children_left)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """ Convert a fitted RandomForestClassifier (or a list of fitted trees) """
+        estimators = getattr(forest, "estimators_", forest)
+        lefts, rights, features, thresholds, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+            rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            node_value = tree.value[:, 0, :]
+            values.append(node_value / node_value.sum(axis=1, keepdims=True))
+            roots.append(offset)
+            offset += tree.node_count
+
+        n_features = estimators[0].n_features_in_ if hasattr(estimators[0], "n_features_in_") else estimators[0].n_features_
+        return cls.from_arrays(
+            np.concatenate(lefts), np.concatenate(rights), np.concatenate(features),
+            np.concatenate(thresholds), np.concatenate(values), np.asarray(roots),
+            estimators[0].classes_, n_features
+        )
+
+    @classmethod
+    def from_arrays(cls, children_left, children_right, feature, threshold, value, tree_roots, classes, n_features):
+        """ Build a forest, storing every array in its most compact dtype """
+        index_dtype = _smallest_int(len(children_left))
+        return cls(
+            np.asarray(children_left).astype(index_dtype),
+            np.asarray(children_right).astype(index_dtype),
+            np.asarray(feature).astype(_smallest_int(max(n_features - 1, 0), signed=False)),
+            float32_thresholds(threshold),
+            np.asarray(value, dtype=np.float64),  # float32 would move probabilities (and AUC) slightly
+            np.asarray(tree_roots).astype(index_dtype),
+            classes,
+            n_features
+        )
+
+    def save(self, path):
+        """ Write the forest as an uncompressed .npz archive (no pickle involved) """
+        np.savez(path, **self._arrays())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format_version"]) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported compact forest format: {int(data['format_version'])}")
+            return cls(
+                data["children_left"], data["children_right"], data["feature"], data["threshold"],
+                data["value"], data["tree_roots"], data["classes"], int(data["n_features"])
+            )
+
+    def save_arrays(self, directory):
+        """ Write every array as its own .npy file, so other processes can memory-map them """
+        os.makedirs(directory, exist_ok=True)
+        for name, array in self._arrays().items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+
+    @classmethod
+    def load_arrays(cls, directory, mmap_mode="r"):
+        """ Load a forest written by `save_arrays`; with mmap_mode the node arrays share the page cache """
+        def load(name, mode=mmap_mode):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode, allow_pickle=False)
+
+        if int(load("format_version", None)) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact forest format: {int(load('format_version', None))}")
+        return cls(
+            load("children_left"), load("children_right"), load("feature"), load("threshold"),
+            load("value"), load("tree_roots"), load("classes", None), int(load("n_features", None))
+        )
+
+    def _arrays(self):
+        return {
+            "format_version": np.array(FORMAT_VERSION),
+            "children_left": self.children_left,
+            "children_right": self.children_right,
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "value": self.value,
+            "tree_roots": self.tree_roots,
+            "classes": self.classes_,
+            "n_features": np.array(self.n_features_in_)
+        }
+
+    def apply(self, X):
+        """ Leaf node index of every sample in every tree, shape (n_samples, n_trees) """
+        X = np.asarray(X, dtype=np.float32)
+        nodes = np.broadcast_to(self.tree_roots.astype(np.int64), (len(X), self.n_estimators)).copy()
+        active = self.children_left[nodes] != -1
+        while active.any():
+            current = nodes[active]
+            go_left = X[np.nonzero(active)[0], self.feature[current]] <= self.threshold[current]
+            nodes[active] = np.where(go_left, self.children_left[current], self.children_right[current])
+            active[active] = self.children_left[nodes[active]] != -1
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        return self.value[leaves].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
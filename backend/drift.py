@@ -0,0 +1,98 @@
+import json
+import math
+import queue
+import threading
+import time
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+# Prometheus Metrics
+DRIFT_PSI = Gauge("feature_drift_psi", "Population stability index of live inputs vs training data", ["feature"])
+DRIFT_WINDOW_SAMPLES = Gauge("feature_drift_window_samples", "Number of requests in the last drift window")
+DRIFT_DROPPED = Counter("feature_drift_dropped_total", "Requests skipped by the drift monitor because its queue was full")
+
+PSI_EPSILON = 1e-4  # Smoothing for empty bins
+
+def population_stability_index(expected, actual):
+    """ PSI between two proportion vectors over the same bins """
+    expected = np.clip(np.asarray(expected, dtype=float), PSI_EPSILON, None)
+    actual = np.clip(np.asarray(actual, dtype=float), PSI_EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+class DriftMonitor:
+    """ Streaming drift monitor with fixed-size per-feature histograms
+
+    Requests only enqueue their feature vector (O(1), never blocking); a background
+    thread bins each vector against the training cut points and, every `interval`
+    seconds, publishes the PSI of the window against the training proportions.
+    """
+
+    def __init__(self, reference, interval=60, min_samples=100, max_queue=10000):
+        self.names = [f["name"] for f in reference["features"]]
+        self.cut_points = [np.asarray(f["cut_points"], dtype=float) for f in reference["features"]]
+        self.expected = [np.asarray(f["proportions"], dtype=float) for f in reference["features"]]
+        self.counts = [np.zeros(len(p), dtype=np.int64) for p in self.expected]
+        self.window_samples = 0
+        self.interval = interval
+        self.min_samples = min_samples
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="drift-monitor", daemon=True)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path) as f:
+            return cls(json.load(f), **kwargs)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def observe(self, values):
+        """ Queue one feature vector (ordered like the reference features) """
+        try:
+            self._queue.put_nowait(values)
+        except queue.Full:
+            DRIFT_DROPPED.inc()
+
+    def _update(self, values):
+        values = np.asarray(values, dtype=float)
+        for i, cut_points in enumerate(self.cut_points):
+            if not math.isnan(values[i]):
+                self.counts[i][np.searchsorted(cut_points, values[i], side="right")] += 1
+        self.window_samples += 1
+
+    def compute(self):
+        """ Publish PSI per feature for the current window and start a new one """
+        if self.window_samples < self.min_samples:
+            return None
+
+        scores = {}
+        for name, expected, counts in zip(self.names, self.expected, self.counts):
+            if counts.sum() == 0:
+                continue
+            scores[name] = population_stability_index(expected, counts / counts.sum())
+            DRIFT_PSI.labels(feature=name).set(scores[name])
+        DRIFT_WINDOW_SAMPLES.set(self.window_samples)
+
+        for counts in self.counts:
+            counts[:] = 0
+        self.window_samples = 0
+        return scores
+
+    def _run(self):
+        next_compute = time.monotonic() + self.interval
+        while True:
+            timeout = max(next_compute - time.monotonic(), 0)
+            try:
+                values = self._queue.get(timeout=timeout)
+                try:
+                    self._update(values)
+                except (TypeError, ValueError, IndexError):
+                    pass  # Non-numeric inputs are rejected by the model anyway
+            except queue.Empty:
+                pass
+
+            if time.monotonic() >= next_compute:
+                self.compute()
+                next_compute = time.monotonic() + self.interval
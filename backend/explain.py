@@ -0,0 +1,59 @@
+import numpy as np
+
+from compact_forest import CompactForest
+
+class PathExplainer:
+    """ Per-feature contributions of a random forest by tree path decomposition
+
+    Walking from the root to a leaf, each split changes the predicted positive-class
+    probability by `value[child] - value[parent]`; that change is credited to the
+    feature the parent split on. The change into every node is precomputed once when
+    the model loads (one float per node), and summed per split feature while each
+    sample walks its decision paths, so an explanation costs one forest traversal,
+    which also gives the class probabilities. For every sample:
+
+        bias + sum(contributions) == predicted probability
+    """
+
+    def __init__(self, forest, feature_names, positive_class_index=1):
+        if not isinstance(forest, CompactForest):
+            forest = CompactForest.from_sklearn(forest)
+        self.forest = forest
+        self.feature_names = list(feature_names)
+        self.positive_class_index = positive_class_index
+        node_value = np.asarray(forest.value[:, positive_class_index], dtype=np.float64)
+        self.bias = float(node_value[forest.tree_roots].mean())
+
+        # Change in probability from each node's parent into the node (0 at the roots)
+        parent = np.full(forest.node_count, -1, dtype=np.int64)
+        internal = np.nonzero(forest.children_left != -1)[0]
+        parent[forest.children_left[internal]] = internal
+        parent[forest.children_right[internal]] = internal
+        self.delta = np.where(parent >= 0, node_value - node_value[np.maximum(parent, 0)], 0.0)
+
+    def explain(self, X):
+        """ Return (class probabilities, contributions) with shapes (n, n_classes) and (n, n_features) """
+        forest = self.forest
+        X = np.asarray(X, dtype=np.float32)
+        n_samples, n_features = len(X), len(self.feature_names)
+        contributions = np.zeros(n_samples * n_features)
+
+        # Same traversal as CompactForest.apply, crediting each step to the split feature
+        nodes = np.broadcast_to(forest.tree_roots.astype(np.int64), (n_samples, forest.n_estimators)).copy()
+        active = forest.children_left[nodes] != -1
+        while active.any():
+            rows, trees = np.nonzero(active)
+            current = nodes[rows, trees]
+            split_feature = forest.feature[current].astype(np.int64)
+            go_left = X[rows, split_feature] <= forest.threshold[current]
+            children = np.where(go_left, forest.children_left[current], forest.children_right[current])
+            contributions += np.bincount(
+                rows * n_features + split_feature,
+                weights=self.delta[children],
+                minlength=len(contributions)
+            )
+            nodes[rows, trees] = children
+            active[rows, trees] = forest.children_left[children] != -1
+
+        contributions = contributions.reshape(n_samples, n_features) / forest.n_estimators
+        return forest.value[nodes].mean(axis=1), contributions
@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+POINTER_FILE = "CURRENT"
+
+class FeatureStore:
+    """ Read-only, memory-mapped view of the active feature store version
+
+    With `expected_features`, versions whose columns do not match the model are refused:
+    the previous version (if any) stays active and `error` explains why.
+    """
+
+    def __init__(self, store_dir, expected_features=None):
+        self.store_dir = store_dir
+        self.expected_features = expected_features
+        self.error = None
+        self._pointer_path = os.path.join(store_dir, POINTER_FILE)
+        self._pointer_mtime = None
+        self._snapshot = None  # (version, subject_ids, features)
+        self._lock = threading.Lock()
+
+    def _open_version(self, version):
+        """ Map the arrays of one version directory """
+        version_dir = os.path.join(self.store_dir, version)
+        with open(os.path.join(version_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        subject_ids = np.load(os.path.join(version_dir, "subject_ids.npy"))
+        features = np.load(os.path.join(version_dir, "features.npy"), mmap_mode="r")
+        if features.shape != (manifest["n_rows"], manifest["n_features"]):
+            raise ValueError(f"Feature store version {version} is inconsistent with its manifest")
+        self._check_columns(version, manifest["columns"])
+        return version, subject_ids, features
+
+    def _check_columns(self, version, columns):
+        """ Raise if the store columns do not match the model's expected features """
+        if self.expected_features is None:
+            return
+        expected = list(self.expected_features)
+        # Models trained on headerless CSV only know positions ("0", "1", ...), not names
+        positional = expected == [str(i) for i in range(len(expected))]
+        if len(columns) != len(expected) or (not positional and list(columns) != expected):
+            raise ValueError(
+                f"Feature store version {version} has {len(columns)} columns {columns}, "
+                f"but the model expects {len(expected)} features {expected}"
+            )
+
+    def refresh(self):
+        """ Swap in a newer version if `CURRENT` changed since the last check """
+        try:
+            mtime = os.stat(self._pointer_path).st_mtime_ns
+        except FileNotFoundError:
+            return self._snapshot
+        if mtime == self._pointer_mtime:
+            return self._snapshot
+
+        with self._lock:
+            if mtime != self._pointer_mtime:
+                with open(self._pointer_path) as f:
+                    version = f.read().strip()
+                if self._snapshot is None or self._snapshot[0] != version:
+                    try:
+                        # Readers holding the old snapshot keep using it until they finish
+                        self._snapshot = self._open_version(version)
+                        self.error = None
+                        print(f"Feature store version {version} loaded: {self._snapshot[2].shape}")
+                    except ValueError as e:
+                        self.error = str(e)
+                        print(f"Feature store version {version} refused: {e}")
+                self._pointer_mtime = mtime
+        return self._snapshot
+
+    @property
+    def version(self):
+        snapshot = self.refresh()
+        return snapshot[0] if snapshot else None
+
+    def lookup(self, subject_ids):
+        """ Return (features, found) for the requested subject IDs via binary search
+
+        `features` holds one row per found subject, in request order; `found` is a
+        boolean mask over the request.
+        """
+        snapshot = self.refresh()
+        if snapshot is None and self.error:
+            raise ValueError(self.error)
+        if snapshot is None:
+            raise FileNotFoundError(f"No feature store found in {self.store_dir}")
+        _, sorted_ids, features = snapshot
+
+        query = np.asarray(subject_ids, dtype=np.int64)
+        positions = np.searchsorted(sorted_ids, query)
+        positions = np.minimum(positions, max(len(sorted_ids) - 1, 0))
+        found = (sorted_ids[positions] == query) if len(sorted_ids) else np.zeros(len(query), dtype=bool)
+
+        return np.asarray(features[positions[found]]), found
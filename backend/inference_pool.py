@@ -0,0 +1,164 @@
+import mmap
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from prometheus_client import Counter, Histogram
+
+from compact_forest import CompactForest
+
+# Prometheus Metrics
+POOL_WAIT = Histogram(
+    "inference_pool_wait_seconds",
+    "Time a request waited for an idle inference worker",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+POOL_LATENCY = Histogram("inference_pool_latency_seconds", "Round trip of one batch through an inference worker")
+POOL_RESTARTS = Counter("inference_pool_worker_restarts_total", "Inference workers restarted after a failure or timeout")
+
+SHM_DIR = "/dev/shm"  # tmpfs, so buffer files never touch disk (falls back to the default temp dir)
+
+def _slot_views(buffer, slot, max_rows, n_features, n_classes):
+    """ (inputs, outputs) arrays of one worker's region of the shared buffer """
+    input_bytes = max_rows * n_features * 4
+    slot_bytes = input_bytes + max_rows * n_classes * 8
+    offset = slot * slot_bytes
+    inputs = np.ndarray((max_rows, n_features), dtype=np.float32, buffer=buffer, offset=offset)
+    outputs = np.ndarray((max_rows, n_classes), dtype=np.float64, buffer=buffer, offset=offset + input_bytes)
+    return inputs, outputs
+
+def _worker(model_dir, buffer_path, slot, max_rows, connection):
+    """ Worker loop: score `n` rows of this slot's input region on every message """
+    forest = CompactForest.load_arrays(model_dir, mmap_mode="r")
+    with open(buffer_path, "r+b") as f:
+        buffer = mmap.mmap(f.fileno(), 0)
+    inputs, outputs = _slot_views(buffer, slot, max_rows, forest.n_features_in_, forest.n_classes_)
+
+    while True:
+        n_rows = connection.recv()
+        if n_rows is None:
+            break
+        try:
+            outputs[:n_rows] = forest.predict_proba(inputs[:n_rows])
+            connection.send(n_rows)
+        except Exception as e:
+            connection.send(repr(e))
+
+class InferencePool:
+    """ Scores feature matrices in worker processes, outside the API process's GIL
+
+    The forest is written once as .npy files and memory-mapped read-only by every
+    worker, so all processes share one copy of the node arrays through the page
+    cache. Each worker owns a fixed region of a shared, file-backed mmap buffer:
+    the caller writes float32 features there and gets float64 probabilities back, so
+    only row counts go through the pipes (no pickled DataFrames). Batches larger than
+    `max_rows` are split. `predict_proba` blocks, so it is meant to be called from
+    the threadpool that runs FastAPI's sync endpoints; up to `n_workers` calls run
+    in parallel and the rest wait for an idle worker. A worker that dies, or does not
+    answer a batch within `timeout` seconds, is killed and replaced.
+    """
+
+    def __init__(self, forest, n_workers, max_rows=1024, timeout=10.0):
+        if not isinstance(forest, CompactForest):
+            forest = CompactForest.from_sklearn(forest)
+        self.n_workers = n_workers
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.n_features = forest.n_features_in_
+        self.n_classes = forest.n_classes_
+        self.classes_ = forest.classes_
+
+        self._dir = tempfile.mkdtemp(prefix="inference-pool-", dir=SHM_DIR if os.path.isdir(SHM_DIR) else None)
+        self._model_dir = os.path.join(self._dir, "model")
+        forest.save_arrays(self._model_dir)
+
+        self._buffer_path = os.path.join(self._dir, "buffer")
+        slot_bytes = max_rows * (self.n_features * 4 + self.n_classes * 8)
+        with open(self._buffer_path, "wb") as f:
+            f.truncate(slot_bytes * n_workers)
+        with open(self._buffer_path, "r+b") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0)
+
+        # Fork, so workers do not re-import the app module the way spawn would
+        self._context = multiprocessing.get_context("fork")
+        self._workers = [None] * n_workers
+        self._idle = queue.Queue()
+        for slot in range(n_workers):
+            self._start_worker(slot)
+            self._idle.put(slot)
+
+    def _start_worker(self, slot):
+        parent_end, child_end = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker,
+            args=(self._model_dir, self._buffer_path, slot, self.max_rows, child_end),
+            name=f"inference-worker-{slot}",
+            daemon=True
+        )
+        process.start()
+        child_end.close()
+        self._workers[slot] = (process, parent_end)
+
+    def _restart_worker(self, slot):
+        """ Replace a dead or hung worker so its slot stays usable """
+        process, connection = self._workers[slot]
+        POOL_RESTARTS.inc()
+        if process.is_alive():
+            process.kill()
+        process.join(timeout=1)
+        connection.close()
+        self._start_worker(slot)
+
+    def _score(self, slot, X):
+        _, connection = self._workers[slot]
+        inputs, outputs = _slot_views(self._buffer, slot, self.max_rows, self.n_features, self.n_classes)
+        inputs[:len(X)] = X
+        try:
+            connection.send(len(X))
+            if not connection.poll(self.timeout):
+                self._restart_worker(slot)
+                raise RuntimeError(f"Inference worker {slot} did not answer within {self.timeout}s")
+            reply = connection.recv()
+        except (EOFError, OSError):
+            self._restart_worker(slot)
+            raise RuntimeError(f"Inference worker {slot} exited unexpectedly")
+        if not isinstance(reply, int):
+            raise RuntimeError(f"Inference worker {slot} failed: {reply}")
+        return outputs[:len(X)].copy()
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected an array of shape (n, {self.n_features}), got {X.shape}")
+
+        start_time = time.time()
+        slot = self._idle.get()
+        POOL_WAIT.observe(time.time() - start_time)
+        try:
+            start_time = time.time()
+            probabilities = np.vstack([
+                self._score(slot, X[start:start + self.max_rows])
+                for start in range(0, len(X), self.max_rows)
+            ]) if len(X) else np.empty((0, self.n_classes))
+            POOL_LATENCY.observe(time.time() - start_time)
+            return probabilities
+        finally:
+            self._idle.put(slot)
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def close(self):
+        """ Stop the workers and remove the shared files """
+        for process, connection in self._workers:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            process.join(timeout=5)
+        self._buffer.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
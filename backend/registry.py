@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+# Prometheus Metrics
+REGISTRY_LOOKUPS = Counter("model_registry_lookups_total", "Model registry lookups", ["model", "result"])
+REGISTRY_LOADS = Counter("model_registry_loads_total", "Models loaded into the registry", ["model"])
+REGISTRY_LOAD_LATENCY = Histogram(
+    "model_registry_load_seconds",
+    "Time to download/load a model into the registry",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+REGISTRY_EVICTIONS = Counter("model_registry_evictions_total", "Models evicted from the registry", ["model"])
+REGISTRY_MEMORY = Gauge("model_registry_memory_bytes", "Estimated memory held by loaded models")
+REGISTRY_LOADED = Gauge("model_registry_loaded_models", "Number of models currently loaded")
+MODEL_LATENCY = Histogram("model_prediction_latency_seconds", "Prediction latency per model", ["model"])
+
+def feature_names(model):
+    """ Expected input feature names of a fitted model """
+    if hasattr(model, "feature_names_in_"):  # scikit-learn >= 1.0
+        return list(model.feature_names_in_)
+    if hasattr(model, "n_features_in_"):  # scikit-learn < 1.0
+        return [str(i) for i in range(model.n_features_in_)]
+    raise ValueError("Unable to determine expected feature names from the model!")
+
+def model_memory_bytes(model):
+    """ Estimated memory of a tree ensemble (node arrays dominate everything else) """
+    if hasattr(model, "children_left"):  # CompactForest
+        arrays = [model.children_left, model.children_right, model.feature, model.threshold, model.value, model.tree_roots]
+        return int(sum(a.nbytes for a in arrays))
+    if hasattr(model, "estimators_"):
+        return int(sum(
+            tree.tree_.__getstate__()["nodes"].nbytes + tree.tree_.value.nbytes
+            for tree in np.ravel(model.estimators_)
+        ))
+    raise ValueError(f"Cannot estimate the memory of a {type(model).__name__}")
+
+class ModelEntry:
+    """ A loaded model with its cached feature order """
+
+    def __init__(self, name, key, model):
+        self.name = name
+        self.key = key
+        self.model = model
+        self.expected_features = feature_names(model)
+        self.size = model_memory_bytes(model)
+
+class ModelRegistry:
+    """ Named models kept in an in-memory LRU cache under a memory budget
+
+    `sources` maps each servable name to its artifact key; `load_model(name, key)`
+    is called the first time a name is requested (or after it was evicted). When the
+    estimated memory of the loaded models exceeds `memory_budget` bytes, the least
+    recently used models are evicted, except pinned ones and the model just loaded.
+    Loads of different models run concurrently; concurrent requests for the same
+    model wait for a single load.
+    """
+
+    def __init__(self, sources, load_model, memory_budget):
+        self.sources = dict(sources)
+        self.memory_budget = memory_budget
+        self._load_model = load_model
+        self._entries = OrderedDict()
+        self._pinned = set()
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in self.sources}
+
+    def add(self, name, key, model, pinned=False):
+        """ Register an already loaded model (e.g. the default model at startup) """
+        with self._lock:
+            self.sources[name] = key
+            self._load_locks.setdefault(name, threading.Lock())
+            if pinned:
+                self._pinned.add(name)
+        entry = ModelEntry(name, key, model)
+        self._insert(entry)
+        return entry
+
+    def get(self, name):
+        """ Return the ModelEntry for `name`, loading it if needed (KeyError if unknown) """
+        if name not in self.sources:
+            raise KeyError(name)
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+                REGISTRY_LOOKUPS.labels(model=name, result="hit").inc()
+                return entry
+
+        with self._load_locks[name]:
+            # Another request may have loaded it while we waited
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    self._entries.move_to_end(name)
+                    REGISTRY_LOOKUPS.labels(model=name, result="hit").inc()
+                    return entry
+
+            REGISTRY_LOOKUPS.labels(model=name, result="miss").inc()
+            start_time = time.time()
+            entry = ModelEntry(name, self.sources[name], self._load_model(name, self.sources[name]))
+            REGISTRY_LOAD_LATENCY.observe(time.time() - start_time)
+            REGISTRY_LOADS.labels(model=name).inc()
+            self._insert(entry)
+            return entry
+
+    def _insert(self, entry):
+        with self._lock:
+            self._entries[entry.name] = entry
+            self._entries.move_to_end(entry.name)
+            used = sum(e.size for e in self._entries.values())
+            for name in list(self._entries):
+                if used <= self.memory_budget:
+                    break
+                if name in self._pinned or name == entry.name:
+                    continue
+                used -= self._entries.pop(name).size
+                REGISTRY_EVICTIONS.labels(model=name).inc()
+                print(f"Evicted model {name} from the registry")
+            REGISTRY_MEMORY.set(used)
+            REGISTRY_LOADED.set(len(self._entries))
+
+    def status(self):
+        """ Registered models, whether each is loaded and its estimated memory """
+        with self._lock:
+            loaded = {name: entry.size for name, entry in self._entries.items()}
+        return [
+            {"name": name, "key": key, "loaded": name in loaded, "memory_bytes": loaded.get(name)}
+            for name, key in self.sources.items()
+        ]
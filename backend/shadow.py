@@ -0,0 +1,93 @@
+import queue
+import threading
+import time
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+# Prometheus Metrics
+SHADOW_PREDICTIONS = Counter("shadow_predictions_total", "Shadow predictions by agreement with the primary model", ["outcome"])
+SHADOW_AGREEMENT_RATE = Gauge("shadow_agreement_rate", "Fraction of shadow predictions agreeing with the primary model")
+SHADOW_PROBABILITY_DELTA = Histogram(
+    "shadow_probability_delta",
+    "Absolute difference between shadow and primary positive-class probability",
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0)
+)
+SHADOW_LATENCY = Histogram("shadow_batch_latency_seconds", "Latency of shadow model scoring per micro-batch")
+SHADOW_BATCH_SIZE = Histogram("shadow_batch_size", "Number of requests per shadow micro-batch", buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+SHADOW_DROPPED = Counter("shadow_dropped_total", "Requests not shadow-scored because the shadow queue was full")
+SHADOW_ERRORS = Counter("shadow_errors_total", "Shadow micro-batches that failed to score")
+
+class ShadowScorer:
+    """ Scores copies of live requests with a candidate model in a background thread
+
+    The request path only calls `submit`, which never blocks: when the bounded queue
+    is full the shadow work is dropped (and counted) instead of slowing the primary
+    model down. The worker collects micro-batches of up to `batch_size` requests,
+    waiting at most `max_wait` seconds after the first one, so that the shadow model
+    runs a few large predictions instead of many small ones.
+    """
+
+    def __init__(self, model, name, max_queue=1000, batch_size=32, max_wait=0.05):
+        self.model = model
+        self.name = name
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._agreed = 0
+        self._scored = 0
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, features, primary_probability, primary_prediction):
+        """ Queue one scored request (feature row, primary P(class 1), primary label) """
+        try:
+            self._queue.put_nowait((features, primary_probability, primary_prediction))
+        except queue.Full:
+            SHADOW_DROPPED.inc()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _score(self, batch):
+        features = np.vstack([item[0] for item in batch])
+        primary_probability = np.array([item[1] for item in batch])
+        primary_prediction = np.array([item[2] for item in batch])
+
+        start_time = time.time()
+        probabilities = self.model.predict_proba(features)
+        SHADOW_LATENCY.observe(time.time() - start_time)
+        SHADOW_BATCH_SIZE.observe(len(batch))
+
+        shadow_prediction = self.model.classes_.take(np.argmax(probabilities, axis=1))
+        agreed = shadow_prediction == primary_prediction
+        for delta in np.abs(probabilities[:, 1] - primary_probability):
+            SHADOW_PROBABILITY_DELTA.observe(delta)
+
+        SHADOW_PREDICTIONS.labels(outcome="agree").inc(int(agreed.sum()))
+        SHADOW_PREDICTIONS.labels(outcome="disagree").inc(int((~agreed).sum()))
+        self._agreed += int(agreed.sum())
+        self._scored += len(batch)
+        SHADOW_AGREEMENT_RATE.set(self._agreed / self._scored)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._score(batch)
+            except Exception as e:
+                SHADOW_ERRORS.inc()
+                print(f"Shadow model {self.name} failed to score a batch: {e}")
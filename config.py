@@ -8,6 +8,8 @@ scalability and maintainability.
 Usage:
 - Import this module in other scripts to access file paths dynamically.
 - Example: from config import MODEL_FILES
+- Set PE_DATA_DIR to run the pipeline against another data directory, e.g.
+  PE_DATA_DIR=data/synthetic/x10 python scripts/preprocessing.py
 """
 
 import os
@@ -17,29 +19,39 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent
 
 # Define directories
-DATA_DIR = BASE_DIR / "data"
+# PE_DATA_DIR points the pipeline at another dataset (e.g. a synthetic cohort)
+DATA_DIR = Path(os.getenv("PE_DATA_DIR", BASE_DIR / "data"))
 RAW_DATA_DIR = DATA_DIR / "raw"
 PROCESSED_DATA_DIR = DATA_DIR / "processed"
 ENGINEERED_DATA_DIR = DATA_DIR / "engineered"
 MODEL_DATA_DIR = DATA_DIR / "model_data"
+FEATURE_STORE_DIR = DATA_DIR / "feature_store"
 MODEL_DIR = BASE_DIR / "models"
+SYNTHETIC_DATA_DIR = BASE_DIR / "data" / "synthetic"
+BENCHMARK_DIR = BASE_DIR / "benchmarks"
 
 # File paths for raw data
 RAW_FILES = {
     "comorbidities": RAW_DATA_DIR / "comorbidities.csv",
     "diagnosis": RAW_DATA_DIR / "diagnosis.csv",
+    "diagnoses_icd": RAW_DATA_DIR / "diagnoses_icd.csv",
     "labs": RAW_DATA_DIR / "labs.csv",
     "treatments": RAW_DATA_DIR / "treatments.csv",
 }
 
+# Daily extracts of new/changed raw rows, applied by incremental.py
+RAW_DELTA_DIR = RAW_DATA_DIR / "delta"
+
 # File paths for processed data
 PROCESSED_FILES = {
     "preprocessed": PROCESSED_DATA_DIR / "preprocessed.csv",
+    "watermark": PROCESSED_DATA_DIR / "watermark.json",
 }
 
 # File paths for engineered data
 ENGINEERED_FILES = {
     "engineered": ENGINEERED_DATA_DIR / "engineered.csv",
+    "watermark": ENGINEERED_DATA_DIR / "watermark.json",
 }
 
 # File paths for model preparation outputs
@@ -50,10 +62,16 @@ MODEL_FILES = {
     "y_val": MODEL_DATA_DIR / "y_val.csv",
     "X_test": MODEL_DATA_DIR / "X_test.csv",
     "y_test": MODEL_DATA_DIR / "y_test.csv",
+    "encoder": MODEL_DATA_DIR / "encoder.pkl",
+    "feature_ranking": MODEL_DATA_DIR / "feature_ranking.json",
 }
 
+# Permutation importance results, cached by model hash (see feature_importance.py)
+IMPORTANCE_CACHE_DIR = MODEL_DATA_DIR / "importance_cache"
+
 # Model Storage Paths
 MODEL_STORAGE = {
     "model_tar": MODEL_DIR / "model.tar.gz",
     "model_pkl": MODEL_DIR / "model.pkl",
+    "model_compact": BASE_DIR / "backend" / "model.npz",  # Served by backend/app.py
 }
\ No newline at end of file
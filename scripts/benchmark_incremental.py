@@ -0,0 +1,180 @@
+"""
+benchmark_incremental.py
+
+This script checks the delta mode (`incremental.py`) against a full rebuild and
+compares their cost for several delta sizes.
+
+Key Steps:
+1. For each delta size, split the raw tables of a cohort (`synthetic_cohort.py`) into a
+   history and a delta: the latest admissions by (`dischtime`, `hadm_id`) are held back
+   from every table, and the labs of a few older subjects are changed in the delta.
+2. Build the history with `preprocessing.py` and `engineering.py`.
+3. Apply the delta with `incremental.py`.
+4. Rebuild from the updated raw tables with `preprocessing.py` and `engineering.py`, and
+   check that both give the same `preprocessed.csv` and `engineered.csv` (the
+   incremental ones merged with their segments, see `segments.py`).
+5. Report the wall time and peak RSS of the delta run and of the full rebuild.
+
+Exits with an error if the incremental and full outputs differ.
+
+Usage:
+    python scripts/benchmark_incremental.py --scale 10
+    python scripts/benchmark_incremental.py --scale 100 --delta-fractions 0.001 0.01 0.1
+"""
+
+import argparse
+import filecmp
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Add project root directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmark_pipeline import run_stage
+from segments import write_merged
+from synthetic_cohort import cohort_dir, generate_cohort
+
+TABLES = ["diagnosis", "labs", "treatments", "comorbidities"]
+N_CORRECTIONS = 10
+
+
+def split_delta(source_dir, raw_dir, fraction, seed=0):
+    """Write history tables to `raw_dir` and delta tables to `raw_dir/delta`.
+
+    Returns (admissions held back, corrected lab rows).
+    """
+    admissions = (
+        pd.read_csv(
+            os.path.join(source_dir, "diagnosis.csv"),
+            usecols=["hadm_id", "dischtime"],
+            parse_dates=["dischtime"],
+        )
+        .drop_duplicates("hadm_id")
+        .sort_values(["dischtime", "hadm_id"])
+    )
+    n_delta = max(1, int(len(admissions) * fraction))
+    delta_hadm_ids = set(admissions["hadm_id"].astype(str).iloc[-n_delta:])
+
+    delta_dir = os.path.join(raw_dir, "delta")
+    os.makedirs(delta_dir, exist_ok=True)
+    for table in TABLES:
+        with open(os.path.join(source_dir, f"{table}.csv")) as src, open(
+            os.path.join(raw_dir, f"{table}.csv"), "w"
+        ) as history, open(os.path.join(delta_dir, f"{table}.csv"), "w") as delta:
+            header = src.readline()
+            history.write(header)
+            delta.write(header)
+            for line in src:
+                target = delta if line.split(",", 2)[1] in delta_hadm_ids else history
+                target.write(line)
+
+    # Corrections: flip `had_ddimer` of a few lab rows already in the history
+    labs_path = os.path.join(raw_dir, "labs.csv")
+    with open(labs_path) as f:
+        header = f.readline().rstrip("\n").split(",")
+        lines = f.readlines()
+    column = header.index("had_ddimer")
+    rng = np.random.default_rng(seed)
+    with open(os.path.join(delta_dir, "labs.csv"), "a") as delta:
+        for i in rng.choice(len(lines), size=N_CORRECTIONS, replace=False):
+            fields = lines[i].rstrip("\n").split(",")
+            fields[column] = "0" if fields[column] == "1" else "1"
+            delta.write(",".join(fields) + "\n")
+    return n_delta, N_CORRECTIONS
+
+
+def full_build(data_dir, log_dir):
+    """Run preprocessing + engineering; return (seconds, peak RSS in MB)."""
+    results = [
+        run_stage(stage, data_dir, os.path.join(log_dir, f"{stage}.log"))
+        for stage in ["preprocessing", "engineering"]
+    ]
+    return sum(seconds for seconds, _ in results), max(peak for _, peak in results)
+
+
+def benchmark_fraction(source_dir, fraction, work_dir):
+    """Build the history, apply the delta, rebuild; return a result row."""
+    data_dir = os.path.join(work_dir, f"delta-{fraction:g}")
+    raw_dir = os.path.join(data_dir, "raw")
+    os.makedirs(raw_dir)
+    # Split in a separate process: a stage's peak RSS includes this process's peak
+    spawn = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+        n_admissions, n_corrections = executor.submit(
+            split_delta, source_dir, raw_dir, fraction
+        ).result()
+
+    full_build(data_dir, data_dir)
+    delta_seconds, delta_mb = run_stage(
+        "incremental", data_dir, os.path.join(data_dir, "incremental.log")
+    )
+    outputs = {
+        "preprocessed": os.path.join(data_dir, "processed", "preprocessed.csv"),
+        "engineered": os.path.join(data_dir, "engineered", "engineered.csv"),
+    }
+    for path in outputs.values():
+        write_merged(path, f"{path}.incremental")
+
+    full_seconds, full_mb = full_build(data_dir, data_dir)
+    identical = all(
+        filecmp.cmp(path, f"{path}.incremental", shallow=False)
+        for path in outputs.values()
+    )
+    print(
+        f"  delta {fraction:g}: {n_admissions} admissions "
+        f"+ {n_corrections} corrections, "
+        f"incremental {delta_seconds:.2f}s / {delta_mb:.0f} MB, "
+        f"full rebuild {full_seconds:.2f}s / {full_mb:.0f} MB, "
+        f"{'identical' if identical else 'DIFFERENT'} outputs"
+    )
+    return {
+        "delta_fraction": fraction,
+        "delta_admissions": n_admissions,
+        "incremental_s": delta_seconds,
+        "incremental_rss_mb": delta_mb,
+        "full_rebuild_s": full_seconds,
+        "full_rebuild_rss_mb": full_mb,
+        "identical": identical,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark incremental updates.")
+    parser.add_argument("--scale", type=float, default=10)
+    parser.add_argument(
+        "--delta-fractions", type=float, nargs="+", default=[0.001, 0.01, 0.1]
+    )
+    parser.add_argument("--work-dir", type=str, default=None)
+    args = parser.parse_args()
+
+    data_dir = cohort_dir(args.scale)
+    if not (data_dir / "cohort.json").exists():
+        generate_cohort(args.scale, data_dir)
+    with open(data_dir / "cohort.json") as f:
+        print(f"Cohort x{args.scale:g}: {json.load(f)['subjects']} subjects")
+
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        rows = [
+            benchmark_fraction(str(data_dir / "raw"), fraction, work_dir)
+            for fraction in args.delta_fractions
+        ]
+
+    report = pd.DataFrame(rows)
+    report["speedup"] = report["full_rebuild_s"] / report["incremental_s"]
+    print("\nIncremental update vs full rebuild:")
+    print(
+        report.to_string(
+            index=False,
+            formatters={"delta_fraction": "{:g}".format},
+            float_format="{:.2f}".format,
+        )
+    )
+    if not report["identical"].all():
+        sys.exit(1)
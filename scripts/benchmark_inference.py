@@ -0,0 +1,142 @@
+"""
+benchmark_inference.py
+
+This script compares the throughput of the API's two inference backends:
+- in-process: concurrent requests share one process and its GIL (the default,
+  FastAPI's threadpool calling `model.predict_proba`);
+- process pool: requests are dispatched to `INFERENCE_WORKERS` worker processes
+  (`backend/inference_pool.py`) that memory-map the model and exchange inputs and
+  outputs through a shared buffer.
+
+Key Steps:
+1. Load the model (`model.npz` if present, else `model.pkl`) and sample request rows from `X_test`.
+2. Check that the pool returns the same probabilities as the in-process model.
+3. Send the same requests from a client thread pool to the in-process model and to
+   pools of 1..N workers.
+4. Report requests/second and the speedup over the in-process baseline. A pickled
+   sklearn model is also measured in-process after conversion to `CompactForest`,
+   the format the pool workers use.
+
+Throughput can only scale up to the number of available CPU cores.
+
+Usage:
+    python scripts/benchmark_inference.py
+    python scripts/benchmark_inference.py --batch-size 64 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Add project root and backend directories to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+)
+from compact_forest import CompactForest
+from inference_pool import InferencePool
+
+from config import MODEL_FILES, MODEL_STORAGE
+
+
+def load_model(path=None):
+    """Load the compact model when available, as the API does."""
+    if path is None:
+        compact = MODEL_STORAGE["model_compact"]
+        path = compact if os.path.exists(compact) else MODEL_STORAGE["model_pkl"]
+    print(f"Loading model from {path}...")
+    return CompactForest.load(path) if str(path).endswith(".npz") else joblib.load(path)
+
+
+def make_requests(n_requests, batch_size, seed=0):
+    """Request feature matrices sampled from X_test."""
+    X = pd.read_csv(MODEL_FILES["X_test"], header=None).to_numpy()
+    rng = np.random.default_rng(seed)
+    return [
+        X[rng.integers(0, len(X), size=batch_size)].astype(np.float32)
+        for _ in range(n_requests)
+    ]
+
+
+def throughput(predict_proba, requests, threads):
+    """Requests per second when `threads` clients send `requests` concurrently."""
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(predict_proba, requests[:threads]))  # Warm up
+        start = time.perf_counter()
+        list(executor.map(predict_proba, requests))
+        return len(requests) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark API inference backends.")
+    parser.add_argument("--model", type=str, default=None)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=1, help="Rows per request")
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent clients")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+    )
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    requests = make_requests(args.requests, args.batch_size)
+    print(
+        f"{args.requests} requests of {args.batch_size} row(s), {args.threads} client threads, "
+        f"{os.cpu_count()} CPU(s)"
+    )
+
+    # In-Process Baseline (one process, threads share the GIL)
+    rows = [
+        {
+            "backend": "in-process",
+            "workers": 0,
+            "requests_per_s": throughput(model.predict_proba, requests, args.threads),
+        }
+    ]
+
+    # The pool always scores a CompactForest; measure it in-process too to separate
+    # the effect of the conversion from that of the worker processes
+    if not isinstance(model, CompactForest):
+        compact = CompactForest.from_sklearn(model)
+        rows.append(
+            {
+                "backend": "in-process (compact)",
+                "workers": 0,
+                "requests_per_s": throughput(
+                    compact.predict_proba, requests, args.threads
+                ),
+            }
+        )
+
+    # Process Pools
+    for n_workers in args.workers:
+        pool = InferencePool(model, n_workers)
+        try:
+            expected = model.predict_proba(requests[0])
+            if not np.allclose(pool.predict_proba(requests[0]), expected, atol=1e-6):
+                raise AssertionError("Inference pool output differs from the model")
+            rows.append(
+                {
+                    "backend": "process pool",
+                    "workers": n_workers,
+                    "requests_per_s": throughput(
+                        pool.predict_proba, requests, args.threads
+                    ),
+                }
+            )
+        finally:
+            pool.close()
+
+    report = pd.DataFrame(rows)
+    report["speedup"] = report["requests_per_s"] / report["requests_per_s"].iloc[0]
+    print("\nThroughput:")
+    print(report.to_string(index=False, float_format="{:.2f}".format))
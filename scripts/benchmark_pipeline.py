@@ -0,0 +1,162 @@
+"""
+benchmark_pipeline.py
+
+This script measures how the offline pipeline scales with data volume. Each stage
+runs on synthetic cohorts from `synthetic_cohort.py` at several scales, and the
+results can be checked against a stored baseline.
+
+Key Steps:
+1. Generate the synthetic cohort of each requested scale (reused if already present).
+2. Run `preprocessing.py`, `engineering.py` and `model_prep.py` in order as separate
+   processes, with `PE_DATA_DIR` pointing at the cohort.
+3. Record the wall time and peak resident memory (max RSS) of every stage.
+4. Save the results, and optionally compare them with the baseline file to flag
+   regressions.
+
+Each stage is a separate process, so its peak memory is read from that process's
+own resource usage and is not inflated by earlier stages or by this script.
+
+Usage:
+    python scripts/benchmark_pipeline.py
+    python scripts/benchmark_pipeline.py --scales 10 --compare
+    python scripts/benchmark_pipeline.py --scales 1 10 100 --save-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Add project root directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from synthetic_cohort import cohort_dir, generate_cohort
+
+from config import BENCHMARK_DIR
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ["preprocessing", "engineering", "model_prep"]
+
+# Scales of the stored baseline; 1000x needs roughly 8-11 GB per stage (see README)
+DEFAULT_SCALES = [1, 10, 100]
+BASELINE_PATH = BENCHMARK_DIR / "pipeline_baseline.json"
+RESULTS_PATH = BENCHMARK_DIR / "pipeline_results.json"
+
+# A stage regresses when it is this much slower / larger than the baseline
+TIME_TOLERANCE = 0.5
+MEMORY_TOLERANCE = 0.2
+
+
+def run_stage(stage, data_dir, log_path):
+    """Run one pipeline stage; return (seconds, peak RSS in MB) of that process."""
+    env = dict(os.environ, PE_DATA_DIR=str(data_dir))
+    with open(log_path, "w") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(SCRIPTS_DIR, f"{stage}.py")],
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        # wait4 reports the resource usage of this child alone
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+    process.returncode = (
+        status  # Already reaped by wait4; keeps Popen from waiting again
+    )
+
+    if status != 0:
+        raise RuntimeError(f"{stage} failed at {data_dir}; see {log_path}")
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_kb = usage.ru_maxrss / 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    return elapsed, peak_kb / 1024
+
+
+def benchmark_scale(scale):
+    """Benchmark every stage on the cohort of one scale."""
+    data_dir = cohort_dir(scale)
+    manifest_path = data_dir / "cohort.json"
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        print(f"Reusing synthetic cohort in {data_dir}")
+    else:
+        manifest = generate_cohort(scale, data_dir)
+
+    results = {"subjects": manifest["subjects"], "rows": manifest["rows"], "stages": {}}
+    for stage in STAGES:
+        seconds, peak_mb = run_stage(stage, data_dir, data_dir / f"{stage}.log")
+        results["stages"][stage] = {
+            "seconds": round(seconds, 3),
+            "peak_rss_mb": round(peak_mb, 1),
+        }
+        print(f"  x{scale:g} {stage:<14} {seconds:8.2f}s {peak_mb:9.1f} MB")
+    return results
+
+
+def compare(results, baseline):
+    """Return a list of regressions of `results` relative to `baseline`."""
+    regressions = []
+    for scale, measured in results["scales"].items():
+        expected = baseline["scales"].get(scale)
+        if expected is None:
+            continue
+        for stage, metrics in measured["stages"].items():
+            reference = expected["stages"].get(stage)
+            if reference is None:
+                continue
+            for metric, tolerance in [
+                ("seconds", TIME_TOLERANCE),
+                ("peak_rss_mb", MEMORY_TOLERANCE),
+            ]:
+                limit = reference[metric] * (1 + tolerance)
+                if metrics[metric] > limit:
+                    regressions.append(
+                        f"x{scale} {stage} {metric}: {metrics[metric]} > {limit:.1f} "
+                        f"(baseline {reference[metric]})"
+                    )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the offline pipeline.")
+    parser.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help=f"Write the results to {BASELINE_PATH}",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Exit with an error if a stage regressed against the baseline",
+    )
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "scales": {},
+    }
+    for scale in args.scales:
+        print(f"\nBenchmarking x{scale:g}...")
+        results["scales"][f"{scale:g}"] = benchmark_scale(scale)
+
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    output_path = BASELINE_PATH if args.save_baseline else RESULTS_PATH
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output_path}")
+
+    if args.compare:
+        with open(BASELINE_PATH) as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            print("\nRegressions against baseline:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print("No regressions against baseline.")
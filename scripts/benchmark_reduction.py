@@ -0,0 +1,147 @@
+"""
+benchmark_reduction.py
+
+This script checks and benchmarks the subject-level reduction in `preprocessing.py`
+(`reduction.py`) against the legacy sort + `drop_duplicates` implementation.
+
+Key Steps:
+1. Load the raw tables (set `PE_DATA_DIR` to use a synthetic cohort from
+   `synthetic_cohort.py`).
+2. Run the legacy merge + reduction and the new one on the same inputs.
+3. Verify that both keep the same record for every subject, with the same values and
+   `days_to_init_treatment`. Also verify that `num_pe_events` equals the number of PE
+   diagnoses per subject; the legacy code assigned it by row index, not by subject.
+4. Report the median wall time and peak traced memory of both implementations.
+
+Exits with an error if the outputs differ.
+
+Usage:
+    python scripts/benchmark_reduction.py
+    PE_DATA_DIR=data/synthetic/x100 python scripts/benchmark_reduction.py
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Add project root directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from reduction import (EVENT_ID, TREATMENT_DAYS, first_treatment_days,
+                       reduce_to_subjects)
+from schema import RAW_SCHEMA, read_csv
+
+from config import RAW_FILES
+
+REPEATS = 3
+
+
+def legacy_reduction(comorbidities, diagnosis, labs, treatments):
+    """Merge and reduce exactly as `preprocessing.py` did before `reduction.py`."""
+    df = (
+        diagnosis.merge(comorbidities, on=["subject_id", "hadm_id"], how="left")
+        .merge(
+            labs[["subject_id", "had_ddimer", "had_o2_sat"]],
+            on="subject_id",
+            how="inner",
+        )
+        .merge(treatments, on="subject_id", how="left")
+    )
+    df["num_pe_events"] = df.groupby("subject_id")["pe_outcome"].sum()
+    df = df.sort_values(by=["subject_id", "pe_date"]).drop_duplicates(
+        subset="subject_id", keep="first"
+    )
+    df["days_to_init_treatment"] = df[TREATMENT_DAYS].min(axis=1, skipna=True)
+    return df.drop(columns=TREATMENT_DAYS)
+
+
+def grouped_reduction(comorbidities, diagnosis, labs, treatments):
+    """Merge and reduce as `preprocessing.py` does now."""
+    treatments = first_treatment_days(treatments)
+    diagnosis = diagnosis.assign(**{EVENT_ID: np.arange(len(diagnosis))})
+    df = (
+        diagnosis.merge(comorbidities, on=["subject_id", "hadm_id"], how="left")
+        .merge(
+            labs[["subject_id", "had_ddimer", "had_o2_sat"]],
+            on="subject_id",
+            how="inner",
+        )
+        .merge(treatments, on="subject_id", how="left")
+    )
+    return reduce_to_subjects(df)
+
+
+def measure(reduction, tables):
+    """Return (result, median seconds, peak traced MB) of a reduction."""
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        reduction(*tables)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = reduction(*tables)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, float(np.median(times)), peak / 1e6
+
+
+def check(legacy, grouped, diagnosis):
+    """Compare both reductions; return a list of mismatch descriptions."""
+    legacy = legacy.reset_index(drop=True)
+    grouped = grouped.reset_index(drop=True)
+    errors = []
+
+    if not legacy["subject_id"].equals(grouped["subject_id"]):
+        return ["Subjects differ"]
+
+    columns = legacy.columns.drop("num_pe_events")
+    try:
+        pd.testing.assert_frame_equal(legacy[columns], grouped[columns])
+    except AssertionError as e:
+        errors.append(f"Kept records differ: {e}")
+
+    expected = (
+        diagnosis.loc[diagnosis["pe_outcome"] == 1]
+        .groupby("subject_id")
+        .size()
+        .reindex(grouped["subject_id"], fill_value=0)
+        .to_numpy()
+    )
+    if not np.array_equal(grouped["num_pe_events"].to_numpy(), expected):
+        errors.append("num_pe_events does not match the PE diagnoses per subject")
+
+    misaligned = (legacy["num_pe_events"].fillna(-1).to_numpy() != expected).sum()
+    print(f"Legacy num_pe_events wrong for {misaligned} of {len(legacy)} subjects")
+    return errors
+
+
+if __name__ == "__main__":
+    print(f"Loading raw data from {os.path.dirname(RAW_FILES['diagnosis'])}...")
+    tables = [
+        read_csv(RAW_FILES[name], RAW_SCHEMA)
+        for name in ["comorbidities", "diagnosis", "labs", "treatments"]
+    ]
+    print(f"Diagnosis rows: {len(tables[1])}")
+
+    legacy, legacy_time, legacy_mb = measure(legacy_reduction, tables)
+    grouped, grouped_time, grouped_mb = measure(grouped_reduction, tables)
+
+    print("\nMerge + Reduction:")
+    print(
+        f"  legacy (sort + drop_duplicates): {legacy_time:.3f}s, peak {legacy_mb:.1f} MB"
+    )
+    print(
+        f"  grouped (groupby-aggregate):     {grouped_time:.3f}s, peak {grouped_mb:.1f} MB"
+    )
+    print(f"  speedup: {legacy_time / grouped_time:.2f}x\n")
+
+    errors = check(legacy, grouped, tables[1])
+    if errors:
+        print("\n".join(errors))
+        sys.exit(1)
+    print(f"Both reductions keep the same record for all {len(grouped)} subjects.")
@@ -0,0 +1,159 @@
+"""
+benchmark_training_io.py
+
+This script compares how fast `train_script.py` loads its training data, and at what
+peak memory, for each input format in `training_data.py`:
+- `csv`: headerless CSV parsed by pandas (the original path);
+- `npy`: memory-mapped `.npy` files described by `manifest.json`;
+- `pipe`: `.npy` files streamed through FIFOs fed by `feed_pipes`, a local stand-in
+  for SageMaker Pipe mode.
+
+Key Steps:
+1. Read the matrices written by `model_prep.py` (set `PE_DATA_DIR` to use a synthetic
+   cohort from `synthetic_cohort.py`).
+2. Load `X_train`/`y_train` in a fresh process per format, exactly as
+   `train_script.py` does, and read every value once (as training will).
+3. Record the load time and the peak resident memory (max RSS) of that process. An
+   `imports` row (load nothing) shows the baseline of the interpreter and libraries.
+4. Check that every format returns the same data as the CSV files.
+
+Usage:
+    python scripts/benchmark_training_io.py
+    PE_DATA_DIR=data/synthetic/x100 python scripts/benchmark_training_io.py --repeats 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add project root directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from training_data import TRAINING_MATRICES, feed_pipes, load_training_data
+
+from config import MODEL_DATA_DIR
+
+FORMATS = ["imports", "csv", "npy", "pipe"]
+
+
+def load_once(data_format, data_dir, pipe_dir):
+    """Child process: load the training data and print the load time as JSON."""
+    start = time.perf_counter()
+    if data_format != "imports":
+        X, y, _ = load_training_data(data_dir, pipe_dir, data_format)
+        # Touch every value, so memory-mapped pages are actually read
+        X.to_numpy().sum(), y.to_numpy().sum()
+    print(json.dumps({"seconds": time.perf_counter() - start}))
+
+
+def run_load(data_format, data_dir):
+    """Load in a fresh process; return (seconds, peak RSS in MB)."""
+    with tempfile.TemporaryDirectory() as pipe_dir:
+        if data_format == "pipe":
+            feed_pipes(data_dir, pipe_dir)
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--load",
+                data_format,
+                "--data-dir",
+                str(data_dir),
+                "--pipe-dir",
+                pipe_dir,
+            ],
+            stdout=subprocess.PIPE,
+        )
+        output = process.stdout.read()
+        # wait4 reports the resource usage of this child alone
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = status
+    if status != 0:
+        raise RuntimeError(f"Loading {data_format} data failed")
+    result = json.loads(output.decode().strip().splitlines()[-1])
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_kb = usage.ru_maxrss / 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    return result["seconds"], peak_kb / 1024
+
+
+def check_formats(data_dir):
+    """Compare the npy and pipe loaders with the CSV files; return a list of errors."""
+    X_csv, y_csv, _ = load_training_data(data_dir, data_format="csv")
+    errors = []
+    for data_format in ["npy", "pipe"]:
+        with tempfile.TemporaryDirectory() as pipe_dir:
+            if data_format == "pipe":
+                feed_pipes(data_dir, pipe_dir)
+            X, y, _ = load_training_data(data_dir, pipe_dir, data_format)
+        if X.shape != X_csv.shape or not np.array_equal(y, y_csv):
+            errors.append(f"{data_format}: shapes or targets differ from CSV")
+            continue
+        max_diff = np.abs(X.to_numpy() - X_csv.to_numpy()).max()
+        if max_diff > 1e-12:
+            errors.append(f"{data_format}: features differ from CSV by {max_diff}")
+    return errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare training data formats.")
+    parser.add_argument("--data-dir", type=str, default=str(MODEL_DATA_DIR))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--load", choices=FORMATS, help=argparse.SUPPRESS)
+    parser.add_argument("--pipe-dir", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        load_once(args.load, args.data_dir, args.pipe_dir)
+        sys.exit(0)
+
+    missing = [
+        name
+        for name in TRAINING_MATRICES
+        for ext in ["csv", "npy"]
+        if not os.path.exists(os.path.join(args.data_dir, f"{name}.{ext}"))
+    ]
+    if missing:
+        sys.exit(f"Missing inputs in {args.data_dir}; run model_prep.py first")
+
+    sizes = {
+        ext: sum(
+            os.path.getsize(os.path.join(args.data_dir, f"{name}.{ext}"))
+            for name in TRAINING_MATRICES
+        )
+        / 1e6
+        for ext in ["csv", "npy"]
+    }
+    print(
+        f"Training data in {args.data_dir}: "
+        f"CSV {sizes['csv']:.1f} MB, .npy {sizes['npy']:.1f} MB"
+    )
+
+    rows = []
+    for data_format in FORMATS:
+        runs = [run_load(data_format, args.data_dir) for _ in range(args.repeats)]
+        rows.append(
+            {
+                "format": data_format,
+                "load_s": float(np.median([seconds for seconds, _ in runs])),
+                "peak_rss_mb": float(np.median([peak for _, peak in runs])),
+            }
+        )
+
+    report = pd.DataFrame(rows)
+    csv_row = report.loc[report["format"] == "csv"].iloc[0]
+    report["speedup"] = csv_row["load_s"] / report["load_s"]
+    report.loc[report["format"] == "imports", "speedup"] = np.nan
+    print("\nLoad time and peak RSS (median of runs):")
+    print(report.to_string(index=False, float_format="{:.3f}".format))
+
+    errors = check_formats(args.data_dir)
+    if errors:
+        print("\n".join(errors))
+        sys.exit(1)
+    print("\nAll formats load the same data as the CSV files.")
@@ -0,0 +1,440 @@
+"""
+comorbidity.py
+
+This script computes the Charlson Comorbidity Index (CCI) locally, replacing the
+BigQuery-only `data/sql_queries/comorbidities.sql`. The ICD-9/ICD-10 prefix and
+range rules from that query are compiled once into a prefix-lookup table, and a
+diagnoses table of (hadm_id, icd_version, icd_code) rows is classified with
+vectorized string-prefix operations.
+
+Key Steps:
+1. Compile the Charlson rules into a lookup table keyed by (icd_version, prefix length).
+2. Stream the diagnoses table in chunks and classify only the unique ICD codes in each
+   chunk.
+3. Reduce matching rows to one set of comorbidity flags per `hadm_id`.
+4. Join admission ages and compute `charlson_comorbidity_index` with the original
+   weights.
+5. Save the comorbidities dataset expected by `preprocessing.py`.
+
+Memory is bounded by the chunk size and the number of admissions, not by the
+number of diagnosis rows.
+
+Usage:
+    python scripts/comorbidity.py
+    python scripts/comorbidity.py --diagnoses path/to/diagnoses_icd.csv \
+        --admissions path/to/ages.csv
+
+`--diagnoses` defaults to `RAW_FILES["diagnoses_icd"]` (an export of
+`mimiciv_hosp.diagnoses_icd`). `--admissions` must hold `subject_id`, `hadm_id`
+and `age`; when omitted, the DVT admissions in `RAW_FILES["diagnosis"]` are used
+with `anchor_age` as the age.
+"""
+
+import argparse
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Add project root directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from segments import merged
+
+from config import RAW_FILES
+
+# Rule Definitions (mirrors data/sql_queries/comorbidities.sql)
+# `In` matches SUBSTR(code, 1, length) IN (...);
+# `Between` matches SUBSTR(code, 1, length) BETWEEN low AND high.
+In = namedtuple("In", ["icd_version", "length", "codes"])
+Between = namedtuple("Between", ["icd_version", "length", "low", "high"])
+
+CHARLSON_RULES = {
+    "myocardial_infarct": [
+        In(9, 3, ["410", "412"]),
+        In(10, 3, ["I21", "I22"]),
+        In(10, 4, ["I252"]),
+    ],
+    "congestive_heart_failure": [
+        In(9, 3, ["428"]),
+        In(
+            9,
+            5,
+            ["39891", "40201", "40211", "40291", "40401"]
+            + ["40403", "40411", "40413", "40491", "40493"],
+        ),
+        Between(9, 4, "4254", "4259"),
+        In(10, 3, ["I43", "I50"]),
+        In(
+            10,
+            4,
+            ["I099", "I110", "I130", "I132", "I255", "I420"]
+            + ["I425", "I426", "I427", "I428", "I429", "P290"],
+        ),
+    ],
+    "peripheral_vascular_disease": [
+        In(9, 3, ["440", "441"]),
+        In(9, 4, ["0930", "4373", "4471", "5571", "5579", "V434"]),
+        Between(9, 4, "4431", "4439"),
+        In(10, 3, ["I70", "I71"]),
+        In(
+            10,
+            4,
+            ["I731", "I738", "I739", "I771", "I790", "I792"]
+            + ["K551", "K558", "K559", "Z958", "Z959"],
+        ),
+    ],
+    "cerebrovascular_disease": [
+        Between(9, 3, "430", "438"),
+        In(9, 5, ["36234"]),
+        In(10, 3, ["G45", "G46"]),
+        Between(10, 3, "I60", "I69"),
+        In(10, 4, ["H340"]),
+    ],
+    "dementia": [
+        In(9, 3, ["290"]),
+        In(9, 4, ["2941", "3312"]),
+        In(10, 3, ["F00", "F01", "F02", "F03", "G30"]),
+        In(10, 4, ["F051", "G311"]),
+    ],
+    "chronic_pulmonary_disease": [
+        Between(9, 3, "490", "505"),
+        In(9, 4, ["4168", "4169", "5064", "5081", "5088"]),
+        Between(10, 3, "J40", "J47"),
+        Between(10, 3, "J60", "J67"),
+        In(10, 4, ["I278", "I279", "J684", "J701", "J703"]),
+    ],
+    "rheumatic_disease": [
+        In(9, 3, ["725"]),
+        In(
+            9,
+            4,
+            ["4465", "7100", "7101", "7102", "7103"]
+            + ["7104", "7140", "7141", "7142", "7148"],
+        ),
+        In(10, 3, ["M05", "M06", "M32", "M33", "M34"]),
+        In(10, 4, ["M315", "M351", "M353", "M360"]),
+    ],
+    "peptic_ulcer_disease": [
+        In(9, 3, ["531", "532", "533", "534"]),
+        In(10, 3, ["K25", "K26", "K27", "K28"]),
+    ],
+    "mild_liver_disease": [
+        In(9, 3, ["570", "571"]),
+        In(9, 4, ["0706", "0709", "5733", "5734", "5738", "5739", "V427"]),
+        In(9, 5, ["07022", "07023", "07032", "07033", "07044", "07054"]),
+        In(10, 3, ["B18", "K73", "K74"]),
+        In(
+            10,
+            4,
+            ["K700", "K701", "K702", "K703", "K709", "K713", "K714", "K715"]
+            + ["K717", "K760", "K762", "K763", "K764", "K768", "K769", "Z944"],
+        ),
+    ],
+    "diabetes_without_cc": [
+        In(9, 4, ["2500", "2501", "2502", "2503", "2508", "2509"]),
+        In(
+            10,
+            4,
+            ["E100", "E101", "E106", "E108", "E109", "E110", "E111", "E116"]
+            + ["E118", "E119", "E120", "E121", "E126", "E128", "E129", "E130"]
+            + ["E131", "E136", "E138", "E139", "E140", "E141", "E146", "E148"]
+            + ["E149"],
+        ),
+    ],
+    "diabetes_with_cc": [
+        In(9, 4, ["2504", "2505", "2506", "2507"]),
+        In(
+            10,
+            4,
+            ["E102", "E103", "E104", "E105", "E107", "E112", "E113", "E114"]
+            + ["E115", "E117", "E122", "E123", "E124", "E125", "E127", "E132"]
+            + ["E133", "E134", "E135", "E137", "E142", "E143", "E144", "E145"]
+            + ["E147"],
+        ),
+    ],
+    "paraplegia": [
+        In(9, 3, ["342", "343"]),
+        In(
+            9,
+            4,
+            ["3341", "3440", "3441", "3442", "3443"] + ["3444", "3445", "3446", "3449"],
+        ),
+        In(10, 3, ["G81", "G82"]),
+        In(
+            10,
+            4,
+            ["G041", "G114", "G801", "G802", "G830"]
+            + ["G831", "G832", "G833", "G834", "G839"],
+        ),
+    ],
+    "renal_disease": [
+        In(9, 3, ["582", "585", "586", "V56"]),
+        In(9, 4, ["5880", "V420", "V451"]),
+        Between(9, 4, "5830", "5837"),
+        In(
+            9,
+            5,
+            ["40301", "40311", "40391", "40402", "40403"]
+            + ["40412", "40413", "40492", "40493"],
+        ),
+        In(10, 3, ["N18", "N19"]),
+        In(
+            10,
+            4,
+            ["I120", "I131", "N032", "N033", "N034", "N035", "N036", "N037"]
+            + ["N052", "N053", "N054", "N055", "N056", "N057", "N250", "Z490"]
+            + ["Z491", "Z492", "Z940", "Z992"],
+        ),
+    ],
+    "malignant_cancer": [
+        Between(9, 3, "140", "172"),
+        Between(9, 4, "1740", "1958"),
+        Between(9, 3, "200", "208"),
+        In(9, 4, ["2386"]),
+        In(10, 3, ["C43", "C88"]),
+        Between(10, 3, "C00", "C26"),
+        Between(10, 3, "C30", "C34"),
+        Between(10, 3, "C37", "C41"),
+        Between(10, 3, "C45", "C58"),
+        Between(10, 3, "C60", "C76"),
+        Between(10, 3, "C81", "C85"),
+        Between(10, 3, "C90", "C97"),
+    ],
+    "severe_liver_disease": [
+        In(9, 4, ["4560", "4561", "4562"]),
+        Between(9, 4, "5722", "5728"),
+        In(
+            10,
+            4,
+            ["I850", "I859", "I864", "I982", "K704", "K711"]
+            + ["K721", "K729", "K765", "K766", "K767"],
+        ),
+    ],
+    "metastatic_solid_tumor": [
+        In(9, 3, ["196", "197", "198", "199"]),
+        In(10, 3, ["C77", "C78", "C79", "C80"]),
+    ],
+    "aids": [
+        In(9, 3, ["042", "043", "044"]),
+        In(10, 3, ["B20", "B21", "B22", "B24"]),
+    ],
+}
+
+COMORBIDITY_COLUMNS = list(CHARLSON_RULES)
+ICD_VERSIONS = (9, 10)
+CHUNK_SIZE = 1_000_000
+
+
+def compile_rules(rules=CHARLSON_RULES):
+    """Compile Charlson rules into prefix-lookup tables and range checks.
+
+    Every condition is assigned one bit of a uint32 mask. `IN` rules become a
+    dict per (icd_version, length) mapping a code prefix to the OR of the bits
+    it sets; `BETWEEN` rules are kept as (length, low, high, bit) per version.
+    """
+    prefix_tables = {}
+    range_rules = {version: [] for version in ICD_VERSIONS}
+
+    for bit, (condition, condition_rules) in enumerate(rules.items()):
+        flag = np.uint32(1 << bit)
+        for rule in condition_rules:
+            if isinstance(rule, Between):
+                range_rules[rule.icd_version].append(
+                    (rule.length, rule.low, rule.high, flag)
+                )
+                continue
+            table = prefix_tables.setdefault((rule.icd_version, rule.length), {})
+            for code in rule.codes:
+                table[code] = table.get(code, np.uint32(0)) | flag
+
+    return prefix_tables, range_rules
+
+
+PREFIX_TABLES, RANGE_RULES = compile_rules()
+
+
+def classify_codes(codes, icd_version):
+    """Return the comorbidity bitmask for each ICD code of a single version.
+
+    `codes` is expected to hold unique values, so the cost depends on the ICD
+    vocabulary size rather than on the number of diagnosis rows.
+    """
+    codes = pd.Series(codes, dtype=object).fillna("").astype(str).str.strip()
+    mask = np.zeros(len(codes), dtype=np.uint32)
+
+    for (version, length), table in PREFIX_TABLES.items():
+        if version != icd_version:
+            continue
+        hits = codes.str[:length].map(table)
+        mask |= hits.fillna(0).to_numpy(dtype=np.uint32)
+
+    for length, low, high, flag in RANGE_RULES[icd_version]:
+        prefixes = codes.str[:length].to_numpy(dtype=str)
+        in_range = (prefixes >= low) & (prefixes <= high)
+        mask[in_range] |= flag
+
+    return mask
+
+
+def classify_diagnoses(diagnoses):
+    """Return a bitmask per diagnosis row.
+
+    ICD codes are factorized first, so each distinct code is classified once
+    per ICD version and the row masks are gathered from the unique results.
+    """
+    code_index, unique_codes = pd.factorize(diagnoses["icd_code"])
+    versions = pd.to_numeric(diagnoses["icd_version"], errors="coerce").to_numpy()
+
+    mask = np.zeros(len(diagnoses), dtype=np.uint32)
+    valid = code_index >= 0
+    for version in ICD_VERSIONS:
+        rows = valid & (versions == version)
+        if rows.any():
+            mask[rows] = classify_codes(unique_codes, version)[code_index[rows]]
+    return mask
+
+
+def unpack_flags(hadm_ids, masks):
+    """Expand per-row bitmasks into one int8 column per comorbidity."""
+    bits = np.arange(len(COMORBIDITY_COLUMNS), dtype=np.uint32)
+    flags = ((masks[:, None] >> bits) & 1).astype(np.int8)
+    return pd.DataFrame(flags, columns=COMORBIDITY_COLUMNS).assign(hadm_id=hadm_ids)
+
+
+def aggregate_comorbidities(diagnosis_chunks, hadm_ids=None):
+    """Aggregate comorbidity flags per `hadm_id` over an iterable of chunks.
+
+    Only rows matching at least one condition are kept after classification,
+    and duplicate (hadm_id, mask) pairs are dropped before unpacking, so the
+    per-chunk partial results stay small. If `hadm_ids` is given, diagnoses of
+    other admissions are skipped.
+    """
+    partials = []
+    seen = []
+    keep = None if hadm_ids is None else pd.Index(pd.unique(hadm_ids))
+
+    for chunk in diagnosis_chunks:
+        if keep is not None:
+            chunk = chunk[chunk["hadm_id"].isin(keep)]
+        seen.append(pd.unique(chunk["hadm_id"]))
+
+        masks = classify_diagnoses(chunk)
+        matched = pd.DataFrame(
+            {
+                "hadm_id": chunk["hadm_id"].to_numpy()[masks > 0],
+                "mask": masks[masks > 0],
+            }
+        ).drop_duplicates()
+        if not matched.empty:
+            partials.append(
+                unpack_flags(matched["hadm_id"].to_numpy(), matched["mask"].to_numpy())
+                .groupby("hadm_id")
+                .max()
+            )
+
+    all_hadm_ids = (
+        keep if keep is not None else pd.Index(pd.unique(np.concatenate(seen or [[]])))
+    )
+    if partials:
+        flags = pd.concat(partials).groupby(level=0).max()
+    else:
+        flags = pd.DataFrame(columns=COMORBIDITY_COLUMNS, dtype=np.int8)
+
+    flags = flags.reindex(all_hadm_ids, fill_value=0).astype(np.int8)
+    flags.index.name = "hadm_id"
+    return flags
+
+
+def age_score(age):
+    """Charlson age points: 0 (<=50), 1 (<=60), 2 (<=70), 3 (<=80), 4 (>80)."""
+    score = pd.cut(age, bins=[-np.inf, 50, 60, 70, 80, np.inf], labels=False)
+    return pd.Series(score, index=age.index, dtype="float64")
+
+
+def charlson_index(flags, age):
+    """Compute `charlson_comorbidity_index` using the original 1987 weights.
+
+    As in the SQL, a missing age propagates to a missing index.
+    """
+    return (
+        age_score(age)
+        + flags["myocardial_infarct"]
+        + flags["congestive_heart_failure"]
+        + flags["peripheral_vascular_disease"]
+        + flags["cerebrovascular_disease"]
+        + flags["dementia"]
+        + flags["chronic_pulmonary_disease"]
+        + flags["rheumatic_disease"]
+        + flags["peptic_ulcer_disease"]
+        + np.maximum(flags["mild_liver_disease"], 3 * flags["severe_liver_disease"])
+        + np.maximum(2 * flags["diabetes_with_cc"], flags["diabetes_without_cc"])
+        + np.maximum(2 * flags["malignant_cancer"], 6 * flags["metastatic_solid_tumor"])
+        + 2 * flags["paraplegia"]
+        + 2 * flags["renal_disease"]
+        + 6 * flags["aids"]
+    )
+
+
+def compute_comorbidities(diagnosis_chunks, admissions):
+    """Build the comorbidities table for `admissions` (subject_id, hadm_id, age).
+
+    Mirrors the final SELECT of comorbidities.sql: one row per admission with
+    its age, the 17 comorbidity flags and `charlson_comorbidity_index`.
+    Admissions without any recorded diagnosis get all-zero flags.
+    """
+    admissions = admissions[["subject_id", "hadm_id", "age"]].drop_duplicates(
+        subset="hadm_id"
+    )
+    flags = aggregate_comorbidities(diagnosis_chunks, admissions["hadm_id"])
+    df = admissions.merge(flags, left_on="hadm_id", right_index=True, how="left")
+    df[COMORBIDITY_COLUMNS] = df[COMORBIDITY_COLUMNS].fillna(0).astype(np.int8)
+    df["charlson_comorbidity_index"] = charlson_index(df, df["age"])
+    return df.reset_index(drop=True)
+
+
+def read_diagnoses(path, chunksize=CHUNK_SIZE):
+    """Stream a diagnoses_icd export, keeping ICD codes as strings (e.g. '042')."""
+    return pd.read_csv(
+        path,
+        usecols=["hadm_id", "icd_version", "icd_code"],
+        dtype={"icd_code": str},
+        chunksize=chunksize,
+    )
+
+
+def load_admissions(path=None):
+    """Load admissions with ages, defaulting to the DVT admissions extract."""
+    if path is not None:
+        return pd.read_csv(path, usecols=["subject_id", "hadm_id", "age"])
+    with merged(RAW_FILES["diagnosis"]) as source:
+        diagnosis = pd.read_csv(source, usecols=["subject_id", "hadm_id", "anchor_age"])
+    return diagnosis.rename(columns={"anchor_age": "age"})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compute Charlson comorbidities from ICD diagnoses."
+    )
+    parser.add_argument(
+        "--diagnoses", type=str, default=str(RAW_FILES["diagnoses_icd"])
+    )
+    parser.add_argument("--admissions", type=str, default=None)
+    parser.add_argument("--output", type=str, default=str(RAW_FILES["comorbidities"]))
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    print("Loading admissions...")
+    admissions = load_admissions(args.admissions)
+
+    print(f"Classifying diagnoses from {args.diagnoses}...")
+    comorbidities = compute_comorbidities(
+        read_diagnoses(args.diagnoses, args.chunksize), admissions
+    )
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    print(f"Saving comorbidities to {args.output}...")
+    comorbidities.to_csv(args.output, index=False)
+    print("Comorbidity computation complete!")
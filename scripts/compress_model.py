@@ -0,0 +1,269 @@
+"""
+compress_model.py
+
+This script compresses the trained RandomForest produced by `train_script.py` into a
+compact artifact that is smaller and loads faster than `model.pkl`.
+
+Key Steps:
+1. Load the trained model (`model.pkl`) and the validation/test datasets.
+2. Convert the forest to flat node arrays: float32 thresholds (rounded so no split
+   changes), float64 class distributions, uint8/uint16 feature indices and the
+   smallest integer type for children. Without pruning the conversion is lossless.
+3. Only with `--auc-budget` > 0: collapse subtrees below the shallowest depth that
+   fits the validation-AUC budget, then drop trailing trees within the same budget.
+4. Save the result as an uncompressed `.npz` (no pickle) and report size, load time
+   and accuracy/AUC deltas on `X_val` and `X_test` against the original model.
+5. Copy `drift_reference.json` from the SageMaker archive (`models/model.tar.gz`), if
+   it has one, next to the output.
+
+The API (`backend/app.py`) serves `backend/model.npz` (the default output) when it is
+present, and the Docker image ships only that file. The default budget is 0, a
+lossless conversion. Write pruned forests elsewhere (`--output`) and review their
+report before serving them.
+
+Usage:
+    python scripts/compress_model.py                    # Lossless conversion
+    python scripts/compress_model.py --auc-budget 0.01 --output models/pruned.npz
+"""
+
+import argparse
+import os
+import sys
+import tarfile
+import time
+from collections import deque
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, roc_auc_score
+
+# Add project root and backend directories to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+)
+from compact_forest import CompactForest
+
+from config import MODEL_FILES, MODEL_STORAGE
+
+DRIFT_REFERENCE = "drift_reference.json"  # Written by train_script.py
+DEFAULT_AUC_BUDGET = 0.0
+DEFAULT_MIN_TREES = 20
+LOAD_TIME_REPEATS = 5
+
+
+def rebuild_forest(forest, trees=None, max_depth=None):
+    """Restrict a forest to `trees` and collapse nodes deeper than `max_depth`.
+
+    A collapsed node becomes a leaf predicting its own class distribution, and
+    unreachable nodes are dropped, so both operations shrink the artifact.
+    """
+    trees = range(forest.n_estimators) if trees is None else trees
+    left, right = forest.children_left, forest.children_right
+    old_nodes, roots = [], []
+
+    for tree in trees:
+        roots.append(len(old_nodes))
+        queue = deque([(int(forest.tree_roots[tree]), 0)])
+        while queue:
+            node, depth = queue.popleft()
+            old_nodes.append((node, depth))
+            if left[node] != -1 and (max_depth is None or depth < max_depth):
+                queue.append((int(left[node]), depth + 1))
+                queue.append((int(right[node]), depth + 1))
+
+    old_index = np.array([node for node, _ in old_nodes], dtype=np.int64)
+    depths = np.array([depth for _, depth in old_nodes], dtype=np.int64)
+    new_index = np.full(forest.node_count, -1, dtype=np.int64)
+    new_index[old_index] = np.arange(len(old_index))
+
+    is_leaf = left[old_index] == -1
+    if max_depth is not None:
+        is_leaf |= depths >= max_depth
+    new_left = np.where(is_leaf, -1, new_index[np.maximum(left[old_index], 0)])
+    new_right = np.where(is_leaf, -1, new_index[np.maximum(right[old_index], 0)])
+
+    return CompactForest.from_arrays(
+        new_left,
+        new_right,
+        np.where(is_leaf, 0, forest.feature[old_index]),
+        np.where(is_leaf, 0.0, forest.threshold[old_index]),
+        forest.value[old_index],
+        np.array(roots),
+        forest.classes_,
+        forest.n_features_in_,
+    )
+
+
+def max_tree_depth(forest):
+    """Depth of the deepest tree in the forest."""
+    depth = np.zeros(forest.node_count, dtype=np.int64)
+    for root in forest.tree_roots:
+        stack = [int(root)]
+        while stack:
+            node = stack.pop()
+            if forest.children_left[node] != -1:
+                for child in (forest.children_left[node], forest.children_right[node]):
+                    depth[child] = depth[node] + 1
+                    stack.append(int(child))
+    return int(depth.max())
+
+
+def collapse_depth(forest, X_val, y_val, min_auc):
+    """Collapse subtrees below the shallowest depth that keeps val AUC >= `min_auc`.
+
+    Depths are tried from the deepest up, and the search stops at the first depth
+    below the budget. The result can be very shallow, down to stumps at depth 1,
+    when the validation set does not tell the depths apart.
+    """
+    chosen = None
+    for depth in range(max_tree_depth(forest) - 1, 0, -1):
+        candidate = rebuild_forest(forest, max_depth=depth)
+        auc = roc_auc_score(y_val, candidate.predict_proba(X_val)[:, 1])
+        if auc < min_auc:
+            break
+        chosen = (depth, candidate, auc)
+
+    if chosen is None:
+        print("No depth limit fits the AUC budget; keeping full-depth trees")
+        return forest
+    depth, candidate, auc = chosen
+    print(f"Collapsing subtrees below depth {depth} (val AUC {auc:.4f})")
+    return candidate
+
+
+def drop_trees(forest, X_val, y_val, min_auc, min_trees=DEFAULT_MIN_TREES):
+    """Keep the smallest number of trees whose validation AUC stays >= `min_auc`.
+
+    Trees of a random forest are exchangeable, so the first k trees are kept
+    rather than cherry-picking trees that happen to suit the validation set.
+    Per-tree validation probabilities are computed once and accumulated.
+    """
+    tree_proba = forest.value[forest.apply(X_val), 1].astype(np.float64)
+    running_mean = np.cumsum(tree_proba, axis=1) / np.arange(1, forest.n_estimators + 1)
+
+    n_trees = forest.n_estimators
+    for k in range(forest.n_estimators, min(min_trees, forest.n_estimators) - 1, -1):
+        if roc_auc_score(y_val, running_mean[:, k - 1]) < min_auc:
+            break
+        n_trees = k
+
+    print(f"Keeping {n_trees} of {forest.n_estimators} trees")
+    return rebuild_forest(forest, trees=range(n_trees))
+
+
+def copy_drift_reference(archive, output_dir):
+    """Extract the drift reference from the model archive into `output_dir`."""
+    if not os.path.exists(archive):
+        return
+    with tarfile.open(archive, "r:gz") as tar:
+        members = [m for m in tar.getmembers() if m.name.endswith(DRIFT_REFERENCE)]
+        if not members:
+            print(f"No {DRIFT_REFERENCE} in {archive}")
+            return
+        with tar.extractfile(members[0]) as src:
+            data = src.read()
+    with open(os.path.join(output_dir, DRIFT_REFERENCE), "wb") as f:
+        f.write(data)
+    print(f"Drift reference copied to {os.path.join(output_dir, DRIFT_REFERENCE)}")
+
+
+def median_load_time(load, path, repeats=LOAD_TIME_REPEATS):
+    """Median wall time of loading `path` with `load`."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        load(path)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def evaluate(model, X, y):
+    """AUC and accuracy of a model on one dataset."""
+    proba = model.predict_proba(X)
+    prediction = model.classes_.take(np.argmax(proba, axis=1))
+    return roc_auc_score(y, proba[:, 1]), accuracy_score(y, prediction)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compress a trained RandomForest model."
+    )
+    parser.add_argument("--model", type=str, default=str(MODEL_STORAGE["model_pkl"]))
+    parser.add_argument(
+        "--output", type=str, default=str(MODEL_STORAGE["model_compact"])
+    )
+    parser.add_argument(
+        "--auc-budget",
+        type=float,
+        default=DEFAULT_AUC_BUDGET,
+        help="Maximum validation-AUC loss allowed by pruning (0 disables pruning)",
+    )
+    parser.add_argument("--min-trees", type=int, default=DEFAULT_MIN_TREES)
+    parser.add_argument(
+        "--archive",
+        type=str,
+        default=str(MODEL_STORAGE["model_tar"]),
+        help=f"SageMaker model archive to copy {DRIFT_REFERENCE} from",
+    )
+    args = parser.parse_args()
+
+    # Load Model & Data
+    print(f"Loading model from {args.model}...")
+    model = joblib.load(args.model)
+
+    print("Loading validation and test datasets...")
+    X_val = pd.read_csv(MODEL_FILES["X_val"], header=None).to_numpy()
+    y_val = pd.read_csv(MODEL_FILES["y_val"], header=None).squeeze().to_numpy()
+    X_test = pd.read_csv(MODEL_FILES["X_test"], header=None).to_numpy()
+    y_test = pd.read_csv(MODEL_FILES["y_test"], header=None).squeeze().to_numpy()
+
+    # Convert & Prune
+    print("Converting forest to compact node arrays...")
+    compact = CompactForest.from_sklearn(model)
+    base_auc = roc_auc_score(y_val, model.predict_proba(X_val)[:, 1])
+    min_auc = base_auc - args.auc_budget
+    print(f"Original val AUC: {base_auc:.4f}, minimum allowed: {min_auc:.4f}")
+
+    if args.auc_budget > 0:
+        compact = collapse_depth(compact, X_val, y_val, min_auc)
+        compact = drop_trees(compact, X_val, y_val, min_auc, args.min_trees)
+
+    # Save Compact Artifact
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    compact.save(args.output)
+    print(f"Compact model saved to {args.output}")
+    copy_drift_reference(args.archive, os.path.dirname(os.path.abspath(args.output)))
+
+    # Report
+    rows = []
+    for name, artifact, n_trees, path, load in [
+        ("original (pickle)", model, len(model.estimators_), args.model, joblib.load),
+        (
+            "compact (npz)",
+            compact,
+            compact.n_estimators,
+            args.output,
+            CompactForest.load,
+        ),
+    ]:
+        val_auc, val_acc = evaluate(artifact, X_val, y_val)
+        test_auc, test_acc = evaluate(artifact, X_test, y_test)
+        rows.append(
+            {
+                "artifact": name,
+                "trees": n_trees,
+                "size_kb": os.path.getsize(path) / 1024,
+                "load_ms": median_load_time(load, path) * 1000,
+                "val_auc": val_auc,
+                "val_acc": val_acc,
+                "test_auc": test_auc,
+                "test_acc": test_acc,
+            }
+        )
+    report = pd.DataFrame(rows).set_index("artifact")
+    report.loc["delta"] = report.iloc[1] - report.iloc[0]
+
+    print("\nCompression Report:")
+    print(report.to_string(float_format="{:.4f}".format))
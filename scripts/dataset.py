@@ -0,0 +1,55 @@
+"""
+dataset.py
+
+This module defines the modeling dataset shared by `model_prep.py` and
+`feature_importance.py`: the target, the columns that are never modeled and the
+train/validation/test split. Both scripts must see the same split, otherwise the
+importance ranking would be computed on rows the model is later trained on.
+
+Usage:
+    from dataset import split_dataset
+    X, y, (X_train, X_val, X_test), (y_train, y_val, y_test) = split_dataset(df)
+"""
+
+from sklearn.model_selection import train_test_split
+
+# Define Target Variable & Columns to Drop
+TARGET = "pe_outcome"
+NOT_INCLUDING = [
+    "subject_id",
+    "hadm_id_x",
+    "dvt_date_x",
+    "dvt_date_y",
+    "pe_date",
+    "dischtime",
+    "pe_outcome",
+    "length_of_stay",
+    "dvt_icd_code",
+    "dvt_icd_version",
+    "dvt_diagnosis",
+    "pe_icd_code",
+    "pe_icd_version",
+    "pe_diagnosis",
+    "num_dvt_diagnoses",
+    "hx_dvt",
+    "num_pe_events",
+    "hadm_id_y",
+    "days_to_pe",  # Only defined for PE cases, so it leaks the target
+]  # Excluding IDs, target, redundant, and non-modeled features
+
+
+def split_dataset(df):
+    """Separate features and target, then split 70/15/15 (stratified, seed 8).
+
+    Returns (X, y, (X_train, X_val, X_test), (y_train, y_val, y_test)).
+    """
+    X = df.drop(columns=NOT_INCLUDING, axis=1, errors="ignore")
+    y = df[[TARGET]]
+
+    X_train, X_temp, y_train, y_temp = train_test_split(
+        X, y, test_size=0.3, stratify=y, random_state=8
+    )
+    X_val, X_test, y_val, y_test = train_test_split(
+        X_temp, y_temp, test_size=0.5, stratify=y_temp, random_state=8
+    )
+    return X, y, (X_train, X_val, X_test), (y_train, y_val, y_test)
@@ -0,0 +1,188 @@
+"""
+dtype_report.py
+
+This script reports the memory footprint and runtime of each pipeline stage with
+pandas default dtypes versus the compact schema in `schema.py`.
+
+For every stage input it prints:
+- Load time (seconds) with default dtypes and with the schema.
+- In-memory size (MB, deep) with default dtypes and with the schema.
+
+For every stage (`preprocess`, `engineer`, and the split + encoding of `model_prep.py`)
+it runs the whole stage, from loading its inputs to its output frame, once per dtype
+setting and prints:
+- Runtime (seconds).
+- Peak memory allocated during the stage (MB, traced by `tracemalloc` in a second
+  run, so that tracing does not slow down the timed one).
+
+Usage:
+    python scripts/dtype_report.py
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+# Add project root directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dataset import split_dataset
+from encoding import SelectedFeatureEncoder
+from engineering import engineer
+from preprocessing import preprocess
+from schema import ENGINEERED_SCHEMA, PREPROCESSED_SCHEMA, RAW_SCHEMA, read_csv
+from segments import merged
+
+from config import ENGINEERED_FILES, MODEL_FILES, PROCESSED_FILES, RAW_FILES
+
+# Raw tables read by `preprocess`, in its argument order
+RAW_TABLES = ["comorbidities", "diagnosis", "labs", "treatments"]
+
+# Stage inputs and the schema each stage applies at load time
+STAGE_INPUTS = [
+    ("preprocessing", "comorbidities", RAW_FILES["comorbidities"], RAW_SCHEMA),
+    ("preprocessing", "diagnosis", RAW_FILES["diagnosis"], RAW_SCHEMA),
+    ("preprocessing", "labs", RAW_FILES["labs"], RAW_SCHEMA),
+    ("preprocessing", "treatments", RAW_FILES["treatments"], RAW_SCHEMA),
+    (
+        "engineering",
+        "preprocessed",
+        PROCESSED_FILES["preprocessed"],
+        PREPROCESSED_SCHEMA,
+    ),
+    ("model_prep", "engineered", ENGINEERED_FILES["engineered"], ENGINEERED_SCHEMA),
+]
+
+
+def measure(load):
+    """Return (seconds, megabytes) for a DataFrame loader."""
+    start = time.perf_counter()
+    df = load()
+    elapsed = time.perf_counter() - start
+    return elapsed, df.memory_usage(deep=True).sum() / 1e6
+
+
+def build_report():
+    """Measure every available stage input with and without the schema."""
+    rows = []
+    for stage, name, path, schema in STAGE_INPUTS:
+        if not os.path.exists(path):
+            print(f"Skipping {name}: {path} not found")
+            continue
+        with merged(path) as source:
+            default_time, default_mb = measure(lambda: pd.read_csv(source))
+        schema_time, schema_mb = measure(lambda: read_csv(path, schema))
+        rows.append(
+            {
+                "stage": stage,
+                "input": name,
+                "default_mb": default_mb,
+                "schema_mb": schema_mb,
+                "memory_ratio": default_mb / schema_mb,
+                "default_s": default_time,
+                "schema_s": schema_time,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def load(path, schema, use_schema):
+    """Load a stage input with the schema, or with pandas default dtypes."""
+    if use_schema:
+        return read_csv(path, schema)
+    with merged(path) as source:
+        return pd.read_csv(source)
+
+
+def run_preprocessing(use_schema):
+    tables = [load(RAW_FILES[name], RAW_SCHEMA, use_schema) for name in RAW_TABLES]
+    return preprocess(*tables)
+
+
+def run_engineering(use_schema):
+    return engineer(
+        load(PROCESSED_FILES["preprocessed"], PREPROCESSED_SCHEMA, use_schema)
+    )
+
+
+def run_model_prep(use_schema):
+    """Split and encode like `model_prep.py`.
+
+    Without a `feature_importance.py` ranking, every candidate feature is encoded.
+    """
+    df = load(ENGINEERED_FILES["engineered"], ENGINEERED_SCHEMA, use_schema)
+    _, _, (X_train, X_val, X_test), _ = split_dataset(df)
+    selected_features = None
+    if os.path.exists(MODEL_FILES["feature_ranking"]):
+        with open(MODEL_FILES["feature_ranking"]) as f:
+            selected_features = json.load(f)["selected_features"]
+    encoder = SelectedFeatureEncoder(selected_features, variance_threshold=0.01)
+    encoder.fit(X_train)
+    return [encoder.transform(X) for X in (X_train, X_val, X_test)]
+
+
+# Whole stages and the inputs they need
+STAGES = [
+    ("preprocessing", run_preprocessing, [RAW_FILES[name] for name in RAW_TABLES]),
+    ("engineering", run_engineering, [PROCESSED_FILES["preprocessed"]]),
+    ("model_prep", run_model_prep, [ENGINEERED_FILES["engineered"]]),
+]
+
+
+def measure_stage(run, use_schema):
+    """Return (seconds, peak traced megabytes) of one stage run."""
+    with contextlib.redirect_stdout(io.StringIO()):  # Stages print their progress
+        start = time.perf_counter()
+        run(use_schema)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        run(use_schema)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def build_stage_report():
+    """Run every stage whose inputs exist with default dtypes and with the schema."""
+    rows = []
+    for stage, run, inputs in STAGES:
+        missing = [path for path in inputs if not os.path.exists(path)]
+        if missing:
+            print(f"Skipping {stage}: {missing[0]} not found")
+            continue
+        default_s, default_mb = measure_stage(run, use_schema=False)
+        schema_s, schema_mb = measure_stage(run, use_schema=True)
+        rows.append(
+            {
+                "stage": stage,
+                "default_s": default_s,
+                "schema_s": schema_s,
+                "speedup": default_s / schema_s,
+                "default_peak_mb": default_mb,
+                "schema_peak_mb": schema_mb,
+                "memory_ratio": default_mb / schema_mb,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    report = build_report()
+    print("\nMemory and Load Time per Stage (default dtypes vs schema):")
+    print(report.to_string(index=False, float_format="{:.3f}".format))
+
+    totals = report.groupby("stage", sort=False)[
+        ["default_mb", "schema_mb", "default_s", "schema_s"]
+    ].sum()
+    print("\nTotals per Stage:")
+    print(totals.to_string(float_format="{:.3f}".format))
+
+    stage_report = build_stage_report()
+    print("\nRuntime and Peak Memory per Stage Run (default dtypes vs schema):")
+    print(stage_report.to_string(index=False, float_format="{:.3f}".format))
@@ -0,0 +1,153 @@
+"""
+encoding.py
+
+This module encodes only the model's selected features. `model_prep.py` names the
+features it keeps after encoding (e.g. `race_grouped_White`, `hx_ac`). A generic
+`OneHotEncoder` would expand every level of every categorical column, only for most
+of those columns to be dropped. `SelectedFeatureEncoder` instead resolves each
+selected name to its source column (and category level) when it is fitted, and
+builds just those columns.
+
+Encoded values match the generic pipeline exactly:
+- Numeric features are standardized like `StandardScaler` (fitted on training data).
+- `<column>_<level>` features are 0/1 indicators of that level. A level absent from
+  the training data is reported as missing, like a level `OneHotEncoder` never saw.
+- Features whose training variance is at or below `variance_threshold` are dropped,
+  like `VarianceThreshold`.
+
+Indicators are computed on category codes, so no string or dense one-hot matrix is
+built. Memory and runtime scale with the number of selected features instead of the
+total number of category levels.
+
+With `selected_features=None` the encoder produces every candidate feature (each
+numeric column and each category level seen in training), which is what
+`feature_importance.py` ranks.
+
+Usage:
+    from encoding import SelectedFeatureEncoder
+    encoder = SelectedFeatureEncoder(selected_features).fit(X_train)
+    X_train_encoded = encoder.transform(X_train)
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_selection import VarianceThreshold
+from sklearn.preprocessing import StandardScaler
+
+
+def resolve_feature(name, numeric_columns, categorical_columns):
+    """Map an encoded feature name to (source column, level or None).
+
+    Returns None when no source column produces `name`. When several categorical
+    columns prefix the name, the longest column name wins.
+    """
+    if name in numeric_columns:
+        return name, None
+    candidates = [col for col in categorical_columns if name.startswith(f"{col}_")]
+    if not candidates:
+        return None
+    column = max(candidates, key=len)
+    return column, name[len(column) + 1 :]
+
+
+def candidate_features(X, numeric_columns, categorical_columns):
+    """{feature: (source column, level or None)} for every column and training level.
+
+    Numeric columns come first, then each categorical column's levels in sorted
+    order, like `ColumnTransformer([StandardScaler, OneHotEncoder])`.
+    """
+    candidates = {col: (col, None) for col in numeric_columns}
+    for col in categorical_columns:
+        values = X[col].dropna()
+        if hasattr(values, "cat"):
+            values = values.cat.remove_unused_categories().cat.categories
+        for level in sorted({str(value) for value in values.unique()}):
+            candidates[f"{col}_{level}"] = (col, level)
+    return candidates
+
+
+def level_indicator(series, level):
+    """0/1 float indicator of `series == level`, comparing values as strings."""
+    if hasattr(series, "cat"):
+        matches = [
+            code
+            for code, value in enumerate(series.cat.categories)
+            if str(value) == level
+        ]
+        if not matches:
+            return np.zeros(len(series))
+        return (series.cat.codes.to_numpy() == matches[0]).astype(np.float64)
+    return (series.astype(str).to_numpy() == level).astype(np.float64)
+
+
+class SelectedFeatureEncoder(BaseEstimator, TransformerMixin):
+    """Fitted encoder producing only the selected (and sufficiently varying) features.
+
+    Fitted attributes:
+    - `sources_`: {feature: (source column, level or None)} for every available feature.
+    - `missing_features_`: selected features that no training column/level produces.
+    - `low_variance_features_`: available features dropped by the variance threshold.
+    - `feature_names_`: output columns, in `selected_features` order (candidate order
+      when `selected_features` is None).
+    - `source_columns_`: input columns the encoder reads.
+    """
+
+    def __init__(self, selected_features, variance_threshold=0.01):
+        self.selected_features = selected_features
+        self.variance_threshold = variance_threshold
+
+    def fit(self, X, y=None):
+        numeric_columns = X.select_dtypes(include="number").columns
+        categorical_columns = X.select_dtypes(include=["object", "category"]).columns
+
+        self.sources_ = {}
+        self.missing_features_ = []
+        if self.selected_features is None:
+            self.sources_ = candidate_features(X, numeric_columns, categorical_columns)
+        for name in self.selected_features or []:
+            source = resolve_feature(name, numeric_columns, categorical_columns)
+            if source is not None and source[1] is not None:
+                # Like OneHotEncoder, only levels seen in training become features
+                if not level_indicator(X[source[0]], source[1]).any():
+                    source = None
+            if source is None:
+                self.missing_features_.append(name)
+            else:
+                self.sources_[name] = source
+
+        self.numeric_features_ = [
+            name for name, (_, level) in self.sources_.items() if level is None
+        ]
+        self.scaler_ = StandardScaler().fit(self._numeric(X))
+
+        # Variance filter on the encoded training data
+        self.feature_names_ = list(self.sources_)
+        encoded = self._encode(X)
+        support = VarianceThreshold(self.variance_threshold).fit(encoded).get_support()
+        self.low_variance_features_ = encoded.columns[~support].tolist()
+        self.feature_names_ = encoded.columns[support].tolist()
+        self.source_columns_ = sorted(
+            {self.sources_[name][0] for name in self.feature_names_}
+        )
+        return self
+
+    def _numeric(self, X):
+        """Numeric sources in float64, so scaling does not depend on storage dtypes."""
+        return X[self.numeric_features_].astype("float64")
+
+    def _encode(self, X):
+        scaled = dict(
+            zip(self.numeric_features_, self.scaler_.transform(self._numeric(X)).T)
+        )
+        columns = {}
+        for name in self.feature_names_:
+            column, level = self.sources_[name]
+            columns[name] = (
+                scaled[name] if level is None else level_indicator(X[column], level)
+            )
+        return pd.DataFrame(columns, columns=self.feature_names_)
+
+    def transform(self, X):
+        """Encode `X` into a float64 DataFrame with columns `feature_names_`."""
+        return self._encode(X)
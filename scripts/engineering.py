@@ -1,15 +1,18 @@
 """
 engineering.py
 
-This script performs feature engineering on the preprocessed dataset. 
+This script performs feature engineering on the preprocessed dataset.
 It applies transformations, creates new features, and prepares the final dataset for modeling.
 
 Key Steps:
-1. Load the preprocessed dataset.
+1. Load the preprocessed dataset using the compact dtype schema in `schema.py`.
 2. Create categorical and numerical features.
 3. Consolidate related features.
 4. Remove unnecessary fields.
-5. Save the engineered dataset.
+5. Save the engineered dataset, and copy the watermark of the preprocessed data
+   (`watermark.py`) next to it.
+
+`engineer` works row by row; `incremental.py` reuses it for changed subjects.
 
 Usage:
 Run this script as:
@@ -25,18 +28,11 @@ import pandas as pd
 # Add project root directory to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from config import ENGINEERED_FILES, PROCESSED_FILES
-
-# Load Preprocessed Data
-print("Loading preprocessed data...")
-df = pd.read_csv(PROCESSED_FILES["preprocessed"])
-
-# Convert Data Types
-print("Converting data types...")
-df["dvt_icd_version"] = df["dvt_icd_version"].astype("object")
+from schema import DATE_FORMAT, PREPROCESSED_SCHEMA, map_categories, read_csv
+from segments import drop
+from watermark import read_watermark, write_watermark
 
-# Create `treatment_grouped` Field
-print("Creating treatment group categories...")
+from config import ENGINEERED_FILES, PROCESSED_FILES
 
 # Define treatment labels
 treatment_labels = {
@@ -46,13 +42,14 @@ treatment_labels = {
     "us_cdt_flag": "CDT",
 }
 
-# Create treatment column by joining multiple active treatments
-df["treatment"] = df.apply(
-    lambda row: ", ".join(
-        [name for col, name in treatment_labels.items() if row[col] == 1]
-    ),
-    axis=1,
-)
+# Treatment column labels: every combination of active treatments, by 4-bit code
+treatment_combinations = [
+    ", ".join(
+        [name for bit, name in enumerate(treatment_labels.values()) if code >> bit & 1]
+    )
+    for code in range(2 ** len(treatment_labels))
+]
+
 
 # Consolidate treatment categories
 def consolidate_treatment(treatment):
@@ -72,12 +69,7 @@ def consolidate_treatment(treatment):
         return "Other"
 
 
-# Apply the function to create a new consolidated column
-df["treatment_grouped"] = df["treatment"].apply(consolidate_treatment)
-
-# Consolidate `race` Field
-print("Consolidating race categories...")
-
+# Consolidated `race` values
 race_mapping = {
     "BLACK/AFRICAN AMERICAN": "Black",
     "BLACK/CARIBBEAN ISLAND": "Black",
@@ -114,11 +106,7 @@ race_mapping = {
     "OTHER": "Unknown",
 }
 
-df["race_grouped"] = df["race"].map(race_mapping)
-
-# Consolidate `discharge_location`
-print("Grouping discharge locations...")
-
+# Consolidated `discharge_location` values
 discharge_location_mapping = {
     "HOME": "Home/Community-Based Care",
     "HOME HEALTH CARE": "Home/Community-Based Care",
@@ -135,13 +123,7 @@ discharge_location_mapping = {
     "Unknown": "Unknown",
 }
 
-df["discharge_location_grouped"] = df["discharge_location"].map(
-    discharge_location_mapping
-)
-
-# Consolidate `admission_location`
-print("Grouping admission locations...")
-
+# Consolidated `admission_location` values
 admission_location_mapping = {
     "EMERGENCY ROOM": "Emergency/Urgent Care",
     "WALK-IN/SELF REFERRAL": "Emergency/Urgent Care",
@@ -156,33 +138,86 @@ admission_location_mapping = {
     "INFORMATION NOT AVAILABLE": "Unknown",
 }
 
-df["admission_location_grouped"] = df["admission_location"].map(
-    admission_location_mapping
-)
-
-# Drop Unnecessary Columns
-print("Dropping unnecessary columns...")
-df = df.drop(
-    columns=[
-        "race",
-        "admission_type",
-        "admission_location",
-        "discharge_location",
-        "ac_flag",
-        "lytics_flag",
-        "mt_flag",
-        "us_cdt_flag",
-        "treatment",
-    ],
-    axis=1,
-)
-
-# Save Engineered Data
-# Ensure engineered directory exists before saving
-engineered_dir = os.path.dirname(ENGINEERED_FILES["engineered"])
-if not os.path.exists(engineered_dir):
-    print(f"Creating directory: {engineered_dir}")
-    os.makedirs(engineered_dir, exist_ok=True)
-print(f"Saving engineered data to {ENGINEERED_FILES['engineered']}...")
-df.to_csv(ENGINEERED_FILES["engineered"], index=False)
-print("Feature engineering complete!")
+
+def engineer(df):
+    """Create the model's features from preprocessed subject records (row by row)."""
+    # Convert Data Types
+    print("Converting data types...")
+    df["dvt_icd_version"] = df["dvt_icd_version"].astype("object")
+
+    # Create `treatment_grouped` Field
+    print("Creating treatment group categories...")
+
+    # Encode the active treatments of each row as a 4-bit category code
+    treatment_codes = np.zeros(len(df), dtype=np.int8)
+    for bit, col in enumerate(treatment_labels):
+        treatment_codes |= (df[col] == 1).to_numpy().astype(np.int8) << bit
+    df["treatment"] = pd.Categorical.from_codes(
+        treatment_codes, categories=treatment_combinations
+    )
+
+    # Apply the function to each treatment combination to create a new consolidated
+    # column
+    df["treatment_grouped"] = map_categories(
+        df["treatment"],
+        {
+            treatment: consolidate_treatment(treatment)
+            for treatment in treatment_combinations
+        },
+    )
+
+    # Consolidate `race` Field
+    print("Consolidating race categories...")
+    df["race_grouped"] = map_categories(df["race"], race_mapping)
+
+    # Consolidate `discharge_location`
+    print("Grouping discharge locations...")
+    df["discharge_location_grouped"] = map_categories(
+        df["discharge_location"], discharge_location_mapping
+    )
+
+    # Consolidate `admission_location`
+    print("Grouping admission locations...")
+    df["admission_location_grouped"] = map_categories(
+        df["admission_location"], admission_location_mapping
+    )
+
+    # Drop Unnecessary Columns
+    print("Dropping unnecessary columns...")
+    df = df.drop(
+        columns=[
+            "race",
+            "admission_type",
+            "admission_location",
+            "discharge_location",
+            "ac_flag",
+            "lytics_flag",
+            "mt_flag",
+            "us_cdt_flag",
+            "treatment",
+        ],
+        axis=1,
+    )
+    return df
+
+
+if __name__ == "__main__":
+    # Load Preprocessed Data
+    print("Loading preprocessed data...")
+    df = engineer(read_csv(PROCESSED_FILES["preprocessed"], PREPROCESSED_SCHEMA))
+
+    # Save Engineered Data
+    # Ensure engineered directory exists before saving
+    engineered_dir = os.path.dirname(ENGINEERED_FILES["engineered"])
+    if not os.path.exists(engineered_dir):
+        print(f"Creating directory: {engineered_dir}")
+        os.makedirs(engineered_dir, exist_ok=True)
+    print(f"Saving engineered data to {ENGINEERED_FILES['engineered']}...")
+    df.to_csv(ENGINEERED_FILES["engineered"], index=False, date_format=DATE_FORMAT)
+    drop(ENGINEERED_FILES["engineered"])  # Segments of earlier incremental runs
+
+    # The engineered data now holds the admissions of the preprocessed data
+    watermark = read_watermark(PROCESSED_FILES["watermark"])
+    if watermark is not None:
+        write_watermark(watermark, ENGINEERED_FILES["watermark"])
+    print("Feature engineering complete!")
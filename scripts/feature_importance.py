@@ -0,0 +1,250 @@
+"""
+feature_importance.py
+
+This script ranks every candidate feature by permutation importance and writes the
+ranked selection that `model_prep.py` uses instead of its hard-coded feature list.
+
+Key Steps:
+1. Load the engineered data and split it exactly like `model_prep.py` (`dataset.py`).
+2. Encode every candidate feature (each numeric column and each category level seen in
+   training, minus low-variance ones) with `SelectedFeatureEncoder(None)`.
+3. Fit one random forest on the training set. Permutation importance never refits it.
+4. Compute permutation importance on `X_val` (drop in ROC AUC when one column is
+   shuffled), in parallel across features and repeats:
+   - The per-tree predictions on the intact `X_val` are computed once into a single
+     base buffer shared by all workers. A permuted column only changes the trees that
+     split on it, so only those trees are re-scored; the other trees' predictions
+     come from the buffer.
+   - Each worker permutes one column at a time in its own copy of `X_val` and
+     restores it afterwards, instead of copying the matrix for every permutation.
+5. Cache the importances under `IMPORTANCE_CACHE_DIR`, keyed by a hash of the fitted
+   model, the validation data and the settings. Reruns with the same data and model
+   skip step 4.
+6. Save the ranking and the selected features (mean importance above
+   `--min-importance`, optionally capped by `--max-features`) to
+   `MODEL_FILES["feature_ranking"]`.
+
+Usage:
+    python scripts/feature_importance.py
+    python scripts/feature_importance.py --n-repeats 10 --n-jobs 4 --max-features 25
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+
+# Add project root directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dataset import TARGET, split_dataset
+from encoding import SelectedFeatureEncoder
+from schema import ENGINEERED_SCHEMA, read_csv
+
+from config import ENGINEERED_FILES, IMPORTANCE_CACHE_DIR, MODEL_FILES
+
+# Same forest as BEST_PARAMS in train_script.py; class weights stand in for the
+# SMOTE + undersampling step, which only matters for ranking through class balance
+MODEL_PARAMS = {
+    "n_estimators": 100,
+    "min_samples_leaf": 5,
+    "min_samples_split": 5,
+    "class_weight": "balanced",
+    "random_state": 8,
+}
+
+
+def tree_probabilities(forest, X):
+    """Positive-class probability of every tree on `X`, shape (n_trees, n_samples)."""
+    return np.stack(
+        [tree.predict_proba(X, check_input=False)[:, 1] for tree in forest.estimators_]
+    )
+
+
+def trees_using_features(forest, n_features):
+    """Boolean matrix (n_features, n_trees): whether each tree splits on each feature."""
+    used = np.zeros((n_features, len(forest.estimators_)), dtype=bool)
+    for t, tree in enumerate(forest.estimators_):
+        split_features = tree.tree_.feature
+        used[split_features[split_features >= 0], t] = True
+    return used
+
+
+def score_permutations(forest, X, y, base, used, tasks, seed):
+    """ROC AUC for each (feature, repeat) in `tasks` with that column permuted.
+
+    `base` holds the per-tree predictions on the intact `X` and is only read. The
+    permutation of (feature, repeat) depends on `seed` alone, so results do not depend
+    on how tasks are split between workers.
+    """
+    X_work = X.copy()
+    base_total = base.sum(axis=0)
+    results = []
+    for feature, repeat in tasks:
+        rng = np.random.default_rng([seed, feature, repeat])
+        X_work[:, feature] = X[rng.permutation(len(X)), feature]
+
+        trees = np.flatnonzero(used[feature])
+        total = base_total - base[trees].sum(axis=0)
+        for t in trees:
+            tree = forest.estimators_[t]
+            total += tree.predict_proba(X_work, check_input=False)[:, 1]
+        results.append((feature, repeat, roc_auc_score(y, total / len(base))))
+
+        X_work[:, feature] = X[:, feature]
+    return results
+
+
+def permutation_importance(forest, X, y, n_repeats=5, n_jobs=-1, seed=8):
+    """Mean and std of the ROC AUC drop per feature; returns (base AUC, means, stds).
+
+    Tasks run on threads: tree prediction releases the GIL, and the threads share the
+    model and the base prediction buffer without copying them.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y).ravel()
+    base = tree_probabilities(forest, X)
+    base_score = roc_auc_score(y, base.mean(axis=0))
+    used = trees_using_features(forest, X.shape[1])
+
+    tasks = [(f, r) for f in range(X.shape[1]) for r in range(n_repeats)]
+    n_chunks = min(len(tasks), 4 * joblib.effective_n_jobs(n_jobs))
+    chunks = [tasks[i::n_chunks] for i in range(n_chunks)]
+    results = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(score_permutations)(forest, X, y, base, used, chunk, seed)
+        for chunk in chunks
+    )
+
+    drops = np.empty((X.shape[1], n_repeats))
+    for feature, repeat, score in (r for chunk in results for r in chunk):
+        drops[feature, repeat] = base_score - score
+    return base_score, drops.mean(axis=1), drops.std(axis=1)
+
+
+def cache_key(forest, X, y, n_repeats, seed):
+    """Hash of the fitted model plus everything else the importances depend on."""
+    return joblib.hash(
+        (joblib.hash(forest), joblib.hash((X, np.asarray(y))), n_repeats, seed)
+    )
+
+
+def cached_importance(forest, X, y, feature_names, n_repeats, n_jobs, seed):
+    """Permutation importance, read from `IMPORTANCE_CACHE_DIR` when already computed."""
+    key = cache_key(forest, X, y, n_repeats, seed)
+    path = IMPORTANCE_CACHE_DIR / f"{key}.json"
+    if path.exists():
+        print(f"Using cached permutation importance ({path.name})")
+        with open(path) as f:
+            return json.load(f)
+
+    print(
+        f"Computing permutation importance of {len(feature_names)} features "
+        f"x {n_repeats} repeats..."
+    )
+    start = time.perf_counter()
+    base_score, means, stds = permutation_importance(
+        forest, X, y, n_repeats=n_repeats, n_jobs=n_jobs, seed=seed
+    )
+    print(f"Permutation importance took {time.perf_counter() - start:.1f}s")
+
+    result = {
+        "model_hash": key,
+        "metric": "roc_auc",
+        "base_score": float(base_score),
+        "n_repeats": n_repeats,
+        "importances": [
+            {"feature": name, "mean": float(mean), "std": float(std)}
+            for name, mean, std in zip(feature_names, means, stds)
+        ],
+    }
+    os.makedirs(IMPORTANCE_CACHE_DIR, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+def rank_features(result, min_importance=0.0, max_features=None):
+    """Add `ranking` (by mean importance) and `selected_features` to `result`."""
+    ranking = sorted(result["importances"], key=lambda item: -item["mean"])
+    selected = [item["feature"] for item in ranking if item["mean"] > min_importance]
+    if max_features is not None:
+        selected = selected[:max_features]
+    return {
+        **{k: v for k, v in result.items() if k != "importances"},
+        "min_importance": min_importance,
+        "max_features": max_features,
+        "ranking": [{"rank": i + 1, **item} for i, item in enumerate(ranking)],
+        "selected_features": selected,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rank features by permutation importance."
+    )
+    parser.add_argument("--n-repeats", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--seed", type=int, default=8)
+    parser.add_argument(
+        "--min-importance",
+        type=float,
+        default=0.0,
+        help="Select features whose mean AUC drop exceeds this value",
+    )
+    parser.add_argument("--max-features", type=int, default=None)
+    args = parser.parse_args()
+
+    # Load & Split Engineered Data
+    print("Loading engineered data...")
+    df = read_csv(ENGINEERED_FILES["engineered"], ENGINEERED_SCHEMA)
+    _, _, (X_train, X_val, _), (y_train, y_val, _) = split_dataset(df)
+
+    # Encode Every Candidate Feature
+    print("Encoding candidate features...")
+    encoder = SelectedFeatureEncoder(None, variance_threshold=0.01).fit(X_train)
+    feature_names = encoder.feature_names_
+    X_train_encoded = encoder.transform(X_train).to_numpy(dtype=np.float32)
+    X_val_encoded = encoder.transform(X_val).to_numpy(dtype=np.float32)
+    print(
+        f"Candidate features: {len(feature_names)} "
+        f"({len(encoder.low_variance_features_)} low-variance dropped)"
+    )
+
+    # Fit Once
+    print("Fitting random forest...")
+    forest = RandomForestClassifier(n_jobs=args.n_jobs, **MODEL_PARAMS)
+    forest.fit(X_train_encoded, y_train[TARGET].to_numpy())
+
+    # Permutation Importance on the Validation Set
+    result = cached_importance(
+        forest,
+        X_val_encoded,
+        y_val[TARGET].to_numpy(),
+        feature_names,
+        args.n_repeats,
+        args.n_jobs,
+        args.seed,
+    )
+    ranking = rank_features(result, args.min_importance, args.max_features)
+
+    # Save Ranked Selection
+    os.makedirs(os.path.dirname(MODEL_FILES["feature_ranking"]), exist_ok=True)
+    with open(MODEL_FILES["feature_ranking"], "w") as f:
+        json.dump(ranking, f, indent=2)
+
+    print(f"\nValidation ROC AUC: {ranking['base_score']:.4f}")
+    print("Top features:")
+    for item in ranking["ranking"][:10]:
+        print(
+            f"  {item['rank']:>3}. {item['feature']}: {item['mean']:.4f} ± {item['std']:.4f}"
+        )
+    print(
+        f"Selected {len(ranking['selected_features'])} features, saved to "
+        f"{MODEL_FILES['feature_ranking']}"
+    )
@@ -0,0 +1,126 @@
+"""
+feature_store.py
+
+This module writes the precomputed feature store served by `backend/app.py`.
+`model_prep.py` calls `build_feature_store` with the encoded feature vector of
+every `subject_id`, so clients can be scored by ID without rebuilding features.
+
+Layout of FEATURE_STORE_DIR:
+- `<version>/subject_ids.npy`: sorted int64 subject IDs (binary-search index).
+- `<version>/features.npy`: float64 matrix aligned with `subject_ids.npy`,
+  loaded by the API with `np.load(..., mmap_mode="r")`.
+- `<version>/manifest.json`: version, shape and column order.
+- `CURRENT`: name of the active version directory.
+
+Each build is written to a fresh version directory and published by atomically
+replacing `CURRENT`, so readers always see either the old or the new store.
+
+Usage:
+    from feature_store import build_feature_store
+    build_feature_store(subject_ids, features, columns)
+"""
+
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+# Add project root directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import FEATURE_STORE_DIR
+
+POINTER_FILE = "CURRENT"
+KEEP_VERSIONS = 2  # Previous version stays on disk for readers still mapping it
+
+
+def _write_atomic(path, text):
+    """Write a small text file so that readers never see a partial write."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _new_version(store_dir):
+    """Create the staging directory of a new version; return the version name.
+
+    Names are zero-padded nanosecond timestamps, so they are unique and sort in
+    creation order. A name already taken (a build in the same tick) is bumped.
+    """
+    stamp = time.time_ns()
+    while True:
+        version = f"{stamp:020d}"
+        if not os.path.exists(os.path.join(store_dir, version)):
+            try:
+                os.makedirs(os.path.join(store_dir, f".{version}"))
+                return version
+            except FileExistsError:
+                pass
+        stamp += 1
+
+
+def _prune_versions(store_dir, keep=KEEP_VERSIONS):
+    """Remove all but the newest `keep` version directories, never the active one."""
+    with open(os.path.join(store_dir, POINTER_FILE)) as f:
+        current = f.read().strip()
+    # Names from before nanosecond versions (`<date>-<pid>`) sort first
+    versions = sorted(
+        (
+            name
+            for name in os.listdir(store_dir)
+            if os.path.isdir(os.path.join(store_dir, name)) and not name.startswith(".")
+        ),
+        key=lambda name: (name.isdigit(), name),
+    )
+    for name in versions[:-keep]:
+        if name != current:
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+
+
+def build_feature_store(subject_ids, features, columns, store_dir=FEATURE_STORE_DIR):
+    """Write a new feature store version and make it the active one.
+
+    Rows are sorted by `subject_id` so the API can locate them by binary search.
+    Returns the name of the published version.
+    """
+    subject_ids = np.asarray(subject_ids, dtype=np.int64)
+    features = np.asarray(features, dtype=np.float64)
+
+    if features.shape != (len(subject_ids), len(columns)):
+        raise ValueError(
+            f"Feature matrix shape {features.shape} does not match "
+            f"{len(subject_ids)} subjects and {len(columns)} columns"
+        )
+
+    order = np.argsort(subject_ids, kind="stable")
+    sorted_ids = subject_ids[order]
+    if len(sorted_ids) and (np.diff(sorted_ids) == 0).any():
+        raise ValueError("Feature store requires one row per subject_id")
+
+    os.makedirs(store_dir, exist_ok=True)
+    version = _new_version(store_dir)
+    staging_dir = os.path.join(store_dir, f".{version}")
+
+    # Write into a hidden staging directory, then publish it in two renames
+    np.save(os.path.join(staging_dir, "subject_ids.npy"), sorted_ids)
+    np.save(os.path.join(staging_dir, "features.npy"), features[order])
+    manifest = {
+        "version": version,
+        "n_rows": int(len(sorted_ids)),
+        "n_features": int(len(columns)),
+        "columns": [str(col) for col in columns],
+    }
+    with open(os.path.join(staging_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    os.rename(staging_dir, os.path.join(store_dir, version))
+    _write_atomic(os.path.join(store_dir, POINTER_FILE), version)
+    _prune_versions(store_dir)
+
+    print(f"Feature store version {version} published: {features.shape}")
+    return version
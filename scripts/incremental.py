@@ -0,0 +1,274 @@
+"""
+incremental.py
+
+This script is the delta mode of `preprocessing.py` and `engineering.py`. Instead of
+rebuilding `preprocessed.csv` and `engineered.csv` from every raw row, it applies the
+daily extracts of new and changed raw rows and recomputes only the subjects they touch.
+
+Inputs: `RAW_DELTA_DIR/<table>.csv` for any of `diagnosis`, `labs`, `treatments` and
+`comorbidities`, with the same columns (and formatting) as the raw tables. The rows of
+an admission (`hadm_id`) in a delta replace all rows of that admission in the table.
+
+Key Steps:
+1. Read the delta files and the (`dischtime`, `hadm_id`) watermark (`watermark.py`).
+2. Look up the current raw rows of the delta's subjects through the subject index of
+   each table (`segments.py`). Admissions above the watermark are new; the others are
+   compared with their stored rows, and admissions whose delta rows are all identical
+   are skipped.
+3. Run `preprocess` and `engineer` on the changed subjects only. Both work subject by
+   subject, so these records equal the ones a full rebuild would produce.
+4. Append the records to `preprocessed.csv` and `engineered.csv` as segments that
+   replace the changed subjects (including subjects that no longer qualify, e.g.
+   expired), then append the changed admissions to the raw tables the same way.
+5. Advance the watermarks and move the delta files to `RAW_DELTA_DIR/applied/`. A run
+   that fails before the end can be repeated with the same delta.
+6. Fold the segments of a table back into it once they exceed `COMPACT_RATIO` of its
+   size (or always, with `--compact`).
+
+Reads and writes scale with the delta and the rows of its subjects: the history is
+neither scanned nor rewritten, except by the (amortized) compaction.
+
+Usage:
+    python scripts/preprocessing.py && python scripts/engineering.py  # Full build
+    python scripts/incremental.py                                     # Daily update
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+# Add project root directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from engineering import engineer
+from preprocessing import preprocess
+from schema import DATE_FORMAT, PREPROCESSED_SCHEMA, RAW_SCHEMA, read_csv
+from segments import append, compact, lookup, needs_compaction, segment_files
+from watermark import (above_watermark, advance_watermark, read_watermark,
+                       write_watermark)
+
+from config import ENGINEERED_FILES, PROCESSED_FILES, RAW_DELTA_DIR, RAW_FILES
+
+TABLES = ["diagnosis", "labs", "treatments", "comorbidities"]
+
+
+def _ids(line):
+    """(subject_id, hadm_id) of a raw CSV line, from its first two fields."""
+    subject_id, hadm_id = line.split(",", 2)[:2]
+    return subject_id, hadm_id
+
+
+def _lines(f):
+    """Non-empty lines of an open text file, without line endings."""
+    for line in f:
+        line = line.rstrip("\r\n")
+        if line:
+            yield line
+
+
+def read_delta(path):
+    """Header and {hadm_id: [lines]} (in file order) of a delta extract."""
+    delta = {}
+    with open(path) as f:
+        header = f.readline().rstrip("\r\n")
+        for line in _lines(f):
+            delta.setdefault(_ids(line)[1], []).append(line)
+    return header, delta
+
+
+def read_header(path):
+    """Header line of a CSV file."""
+    with open(path) as f:
+        return f.readline().rstrip("\r\n")
+
+
+def changed_admissions(stored, delta, new_hadm_ids):
+    """hadm_ids of `delta` (in file order) whose rows differ from the `stored` lines."""
+    stored_rows = {}
+    for line in stored:
+        stored_rows.setdefault(_ids(line)[1], []).append(line)
+    return [
+        hadm_id
+        for hadm_id, lines in delta.items()
+        if hadm_id in new_hadm_ids
+        or Counter(lines) != Counter(stored_rows.get(hadm_id, []))
+    ]
+
+
+def compact_tables(force=False):
+    """Fold the segments of each table into it once they outgrow `COMPACT_RATIO`."""
+    paths = [PROCESSED_FILES["preprocessed"], ENGINEERED_FILES["engineered"]]
+    for path in paths + [RAW_FILES[table] for table in TABLES]:
+        if segment_files(path) and (force or needs_compaction(path)):
+            print(f"Compacting {os.path.basename(path)}...")
+            compact(path)
+
+
+def apply_delta(delta_dir=RAW_DELTA_DIR):
+    """Apply the delta files in `delta_dir`; return a summary (None without delta)."""
+    deltas = {
+        table: read_delta(os.path.join(delta_dir, f"{table}.csv"))
+        for table in TABLES
+        if os.path.exists(os.path.join(delta_dir, f"{table}.csv"))
+    }
+    if not deltas:
+        print(f"No delta files in {delta_dir}")
+        return None
+    for output in [PROCESSED_FILES["preprocessed"], ENGINEERED_FILES["engineered"]]:
+        if not os.path.exists(output):
+            raise FileNotFoundError(
+                f"{output} is missing; run preprocessing.py and engineering.py first"
+            )
+    watermark = read_watermark()
+    if watermark != read_watermark(PROCESSED_FILES["watermark"]):
+        raise ValueError(
+            f"{ENGINEERED_FILES['engineered']} is older than "
+            f"{PROCESSED_FILES['preprocessed']}; run engineering.py first"
+        )
+    for table, (header, _) in deltas.items():
+        if header != read_header(RAW_FILES[table]):
+            raise ValueError(
+                f"Columns of the {table} delta differ from {RAW_FILES[table]}"
+            )
+
+    delta_subjects = {
+        _ids(line)[0]
+        for _, delta in deltas.values()
+        for lines in delta.values()
+        for line in lines
+    }
+    print(
+        f"Delta: {sum(len(lines) for _, d in deltas.values() for lines in d.values())} "
+        f"rows of {len(delta_subjects)} subjects in {sorted(deltas)}"
+    )
+
+    # Admissions Above the Watermark are New
+    new_hadm_ids, new_watermark = set(), watermark
+    if "diagnosis" in deltas:
+        diagnosis = read_csv(os.path.join(delta_dir, "diagnosis.csv"), RAW_SCHEMA)
+        new_hadm_ids = set(
+            diagnosis.loc[above_watermark(diagnosis, watermark), "hadm_id"].astype(str)
+        )
+        new_watermark = advance_watermark(diagnosis, watermark)
+
+    # Compare the Delta With the Stored Rows of Its Subjects
+    print("Looking up stored rows of the delta subjects...")
+    stored, changed_hadm_ids, changed = {}, {}, set()
+    for table in TABLES:
+        stored[table] = lookup(RAW_FILES[table], delta_subjects)
+        delta = deltas.get(table, (None, {}))[1]
+        changed_hadm_ids[table] = changed_admissions(stored[table], delta, new_hadm_ids)
+        changed |= {_ids(delta[hadm_id][0])[0] for hadm_id in changed_hadm_ids[table]}
+    print(f"Changed subjects: {len(changed)}")
+
+    if changed:
+        with tempfile.TemporaryDirectory() as staging_dir:
+            # Recompute the Changed Subjects (preprocessing + engineering)
+            # Rows of changed admissions move behind the others, as in the merged table
+            tables = {}
+            for table in TABLES:
+                delta = deltas.get(table, (None, {}))[1]
+                replaced = set(changed_hadm_ids[table])
+                lines = [
+                    line
+                    for line in stored[table]
+                    if _ids(line)[0] in changed and _ids(line)[1] not in replaced
+                ]
+                for hadm_id in changed_hadm_ids[table]:
+                    lines.extend(delta[hadm_id])
+                staged = os.path.join(staging_dir, f"{table}.csv")
+                with open(staged, "w") as f:
+                    f.write(read_header(RAW_FILES[table]) + "\n")
+                    f.writelines(line + "\n" for line in lines)
+                tables[table] = read_csv(staged, RAW_SCHEMA)
+
+            staged_preprocessed = os.path.join(staging_dir, "preprocessed.csv")
+            staged_engineered = os.path.join(staging_dir, "engineered.csv")
+            preprocess(
+                tables["comorbidities"],
+                tables["diagnosis"],
+                tables["labs"],
+                tables["treatments"],
+            ).to_csv(staged_preprocessed, index=False, date_format=DATE_FORMAT)
+            engineer(read_csv(staged_preprocessed, PREPROCESSED_SCHEMA)).to_csv(
+                staged_engineered, index=False, date_format=DATE_FORMAT
+            )
+
+            # Append the Records, Replacing the Changed Subjects
+            print("Appending updated subjects...")
+            for path, records in [
+                (PROCESSED_FILES["preprocessed"], staged_preprocessed),
+                (ENGINEERED_FILES["engineered"], staged_engineered),
+            ]:
+                with open(records) as f:
+                    header = f.readline().rstrip("\r\n")
+                    lines = list(_lines(f))
+                append(
+                    path, header, lines, changed, key_field=0, sorted_by_subject=True
+                )
+                print(f"  {os.path.basename(path)}: {len(lines)} records")
+
+        # Append the Changed Admissions to the Raw Tables
+        for table in TABLES:
+            if changed_hadm_ids[table]:
+                delta = deltas[table][1]
+                append(
+                    RAW_FILES[table],
+                    deltas[table][0],
+                    [
+                        line
+                        for hadm_id in changed_hadm_ids[table]
+                        for line in delta[hadm_id]
+                    ],
+                    changed_hadm_ids[table],
+                    key_field=1,
+                )
+
+    # Advance the Watermarks
+    if new_watermark is not None:
+        write_watermark(new_watermark, PROCESSED_FILES["watermark"])
+        write_watermark(new_watermark, ENGINEERED_FILES["watermark"])
+
+    # Archive the Applied Delta Files
+    applied_dir = os.path.join(delta_dir, "applied", time.strftime("%Y%m%d%H%M%S"))
+    os.makedirs(applied_dir, exist_ok=True)
+    for table in deltas:
+        shutil.move(os.path.join(delta_dir, f"{table}.csv"), applied_dir)
+
+    compact_tables()
+    return {
+        "delta_subjects": len(delta_subjects),
+        "changed_subjects": len(changed),
+        "new_admissions": len(new_hadm_ids),
+        "watermark": new_watermark,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply raw delta extracts.")
+    parser.add_argument("--delta-dir", type=str, default=str(RAW_DELTA_DIR))
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Fold all segments back into their tables.",
+    )
+    args = parser.parse_args()
+
+    summary = apply_delta(args.delta_dir)
+    if summary is not None:
+        print(
+            f"{summary['changed_subjects']} subjects updated "
+            f"({summary['new_admissions']} new admissions)"
+        )
+        if summary["watermark"] is not None:
+            print(
+                f"Watermark: dischtime {summary['watermark']['dischtime']}, "
+                f"hadm_id {summary['watermark']['hadm_id']}"
+            )
+    if args.compact:
+        compact_tables(force=True)
+    print("Incremental update complete!")
@@ -3,30 +3,36 @@ model_prep.py
 
 This script prepares the dataset for machine learning by:
 1. Removing unnecessary columns before preprocessing.
-2. Splitting the data into train, validation, and test sets.
-3. Applying standardization for numeric features and one-hot encoding for categorical features.
-4. Keeping only the specified features.
+2. Splitting the data into train, validation, and test sets (`dataset.py`).
+3. Loading the ranked selection written by `feature_importance.py` (falling back to
+   a hard-coded list) and resolving the selected features to their source columns
+   and category levels.
+4. Standardizing the selected numeric features and one-hot encoding only the
+   selected category levels (see `encoding.py`).
 5. Removing low-variance features.
-6. Saving the processed datasets for modeling.
+6. Saving the processed datasets (CSV, plus `.npy` files and a manifest, see
+   `training_data.py`) and the fitted encoder for modeling.
+7. Publishing the encoded features of every subject to the feature store.
 
 Usage:
     python scripts/model_prep.py
 """
 
+import json
 import os
 import sys
 
-import numpy as np
-import pandas as pd
-from sklearn.compose import ColumnTransformer
-from sklearn.feature_selection import VarianceThreshold
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+import joblib
 
 # Add project root directory to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from config import (ENGINEERED_FILES,  # Import file paths from config.py
-                    MODEL_FILES)
+from dataset import split_dataset
+from encoding import SelectedFeatureEncoder
+from feature_store import build_feature_store
+from schema import ENGINEERED_SCHEMA, read_csv
+from training_data import save_matrices
+
+from config import ENGINEERED_FILES, MODEL_FILES  # Import file paths from config.py
 
 # Ensure model_data directory exists
 model_dir = os.path.dirname(MODEL_FILES["X_train"])
@@ -36,86 +42,13 @@ if not os.path.exists(model_dir):
 
 # Load Engineered Data
 print("Loading engineered data...")
-df = pd.read_csv(ENGINEERED_FILES["engineered"])
-
-# Define Target Variable & Columns to Drop
-target = "pe_outcome"
-not_including = [
-    "subject_id",
-    "hadm_id_x",
-    "dvt_date_x",
-    "dvt_date_y",
-    "pe_date",
-    "dischtime",
-    "pe_outcome",
-    "length_of_stay",
-    "dvt_icd_code",
-    "dvt_icd_version",
-    "dvt_diagnosis",
-    "pe_icd_code",
-    "pe_icd_version",
-    "pe_diagnosis",
-    "num_dvt_diagnoses",
-    "hx_dvt",
-    "num_pe_events",
-]  # Excluding IDs, target, redundant, and non-modeled features
-
-# Separate Features and Target
-X = df.drop(columns=not_including, axis=1, errors="ignore")
-y = df[[target]]
-
-# Split Data Into Train, Validation, and Test Sets
-X_train, X_temp, y_train, y_temp = train_test_split(
-    X, y, test_size=0.3, stratify=y, random_state=8
-)
-X_val, X_test, y_val, y_test = train_test_split(
-    X_temp, y_temp, test_size=0.5, stratify=y_temp, random_state=8
-)
-
-# Identify Numeric and Categorical Features
-numeric_features = X.select_dtypes(include=["int64", "float64"]).columns.tolist()
-categorical_features = X.select_dtypes(include=["object", "category"]).columns.tolist()
-
-# Define Preprocessing Pipeline (Standardization & One-Hot Encoding)
-preprocessor = ColumnTransformer(
-    [
-        ("num", StandardScaler(), numeric_features),
-        (
-            "cat",
-            OneHotEncoder(handle_unknown="ignore", sparse=False),
-            categorical_features,
-        ),  # Pass categorical_features
-    ]
-)
-
-# Apply Pipeline to Training Data
-print("Applying preprocessing pipeline...")
-X_train_preprocessed = preprocessor.fit_transform(X_train)
+df = read_csv(ENGINEERED_FILES["engineered"], ENGINEERED_SCHEMA)
 
-# Manually Extract Feature Names for Older Sklearn Versions
-num_feature_names = numeric_features
-cat_feature_names = list(preprocessor.named_transformers_["cat"].categories_)
-
-# Flatten categorical feature names (since categories_ is a list of lists)
-cat_feature_names = [
-    f"{col}_{val}"
-    for col, vals in zip(categorical_features, cat_feature_names)
-    for val in vals
-]
-
-# Combine Numeric and Categorical Feature Names
-feature_names = num_feature_names + cat_feature_names
-
-# Convert processed data into a DataFrame
-X_train_preprocessed = pd.DataFrame(X_train_preprocessed, columns=feature_names)
-
-# Apply Same Preprocessing to Validation & Test Sets
-X_val_preprocessed = pd.DataFrame(preprocessor.transform(X_val), columns=feature_names)
-X_test_preprocessed = pd.DataFrame(
-    preprocessor.transform(X_test), columns=feature_names
-)
+# Separate Features & Target, Split Into Train, Validation, and Test Sets
+X, y, (X_train, X_val, X_test), (y_train, y_val, y_test) = split_dataset(df)
 
 # Define Final Selected Features After Encoding & Standardization
+# `feature_importance.py` writes a ranked selection; without it, fall back to this list
 selected_features = [
     "race_grouped_White",
     "aids",
@@ -141,37 +74,28 @@ selected_features = [
     "admission_location_grouped_Scheduled/Procedure-Based Admissions",
     "charlson_comorbidity_index",
 ]
-
-# Ensure Only Available Features Are Selected
-available_features = [
-    col for col in selected_features if col in X_train_preprocessed.columns
-]
-
-if len(available_features) < len(selected_features):
-    missing_features = set(selected_features) - set(available_features)
+if os.path.exists(MODEL_FILES["feature_ranking"]):
+    with open(MODEL_FILES["feature_ranking"]) as f:
+        selected_features = json.load(f)["selected_features"]
+    print(f"Using {len(selected_features)} features ranked by feature_importance.py")
+
+# Fit the Encoder on Training Data
+# Only the source columns and category levels behind `selected_features` are
+# encoded (standardized numerics, one-hot levels), then low-variance features are dropped
+print("Fitting selected-feature encoder...")
+encoder = SelectedFeatureEncoder(selected_features, variance_threshold=0.01)
+encoder.fit(X_train)
+
+if encoder.missing_features_:
     print(
-        f"Warning: The following selected features are missing and will be ignored: {missing_features}"
+        f"Warning: The following selected features are missing and will be ignored: {set(encoder.missing_features_)}"
     )
+print(f"Low-Variance Features Identified: {len(encoder.low_variance_features_)}")
 
-# Filter Processed Data to Keep Only Selected Features
-X_train_preprocessed = X_train_preprocessed[available_features]
-X_val_preprocessed = X_val_preprocessed[available_features]
-X_test_preprocessed = X_test_preprocessed[available_features]
-
-# Variance-Based Feature Selection (Drop Low-Variance Features)
-print("Identifying low-variance features...")
-variance_threshold = 0.01
-selector = VarianceThreshold(threshold=variance_threshold)
-selector.fit(X_train_preprocessed)
-
-# Identify Low-Variance Features to Drop
-low_variance_features = X_train_preprocessed.columns[~selector.get_support()].tolist()
-print(f"Low-Variance Features Identified: {len(low_variance_features)}")
-
-# Drop Low-Variance Features
-X_train_preprocessed.drop(columns=low_variance_features, inplace=True)
-X_val_preprocessed.drop(columns=low_variance_features, inplace=True, errors="ignore")
-X_test_preprocessed.drop(columns=low_variance_features, inplace=True, errors="ignore")
+# Encode Train, Validation & Test Sets
+X_train_preprocessed = encoder.transform(X_train)
+X_val_preprocessed = encoder.transform(X_val)
+X_test_preprocessed = encoder.transform(X_test)
 
 # Save Processed Data
 print("Saving processed datasets...")
@@ -184,6 +108,33 @@ y_val.to_csv(MODEL_FILES["y_val"], index=False, header=False)
 X_test_preprocessed.to_csv(MODEL_FILES["X_test"], index=False, header=False)
 y_test.to_csv(MODEL_FILES["y_test"], index=False, header=False)
 
+# Save the same matrices as .npy files + manifest, which train_script.py memory-maps
+# (or streams in Pipe mode) instead of parsing the CSV files
+save_matrices(
+    model_dir,
+    {
+        "X_train": X_train_preprocessed,
+        "y_train": y_train,
+        "X_val": X_val_preprocessed,
+        "y_val": y_val,
+        "X_test": X_test_preprocessed,
+        "y_test": y_test,
+    },
+    X_train_preprocessed.columns,
+)
+
+# Save the fitted encoder so other jobs can encode new data the same way
+joblib.dump(encoder, MODEL_FILES["encoder"])
+
+# Publish Encoded Features of All Subjects to the Feature Store
+print("Building feature store...")
+X_all_preprocessed = encoder.transform(X)
+build_feature_store(
+    df["subject_id"].to_numpy(),
+    X_all_preprocessed.to_numpy(),
+    X_train_preprocessed.columns,
+)
+
 # Show Dataset Shapes
 print("\nFinal Dataset Shapes:")
 print(f"X_train: {X_train_preprocessed.shape}, y_train: {y_train.shape}")
@@ -1,16 +1,23 @@
 """
 preprocessing.py
 
-This script performs data preprocessing for the pe_predictions_app project. 
-It loads raw datasets, merges them into a single dataframe, handles missing 
+This script performs data preprocessing for the pe_predictions_app project.
+It loads raw datasets, merges them into a single dataframe, handles missing
 values, applies transformations, and saves the cleaned dataset for modeling.
 
 Key Steps:
-1. Load raw data from CSV files.
+1. Load raw data from CSV files using the compact dtype schema in `schema.py`.
 2. Merge data from different sources into a single dataset.
-3. Convert data types and handle missing values.
-4. Create categorical features for better model interpretation.
-5. Save preprocessed datasets for downstream modeling.
+3. Reduce the merged data to one record per subject in a single groupby-aggregate
+   (see `reduction.py`).
+4. Convert data types and handle missing values.
+5. Create categorical features for better model interpretation.
+6. Save preprocessed datasets for downstream modeling, and record the
+   (`dischtime`, `hadm_id`) watermark of the processed admissions (`watermark.py`).
+7. Index the raw tables by subject for `incremental.py` (`segments.py`).
+
+`preprocess` works subject by subject; `incremental.py` reuses it to update only
+the subjects with new or changed raw rows.
 
 Usage:
 Run this script from the command line or another Python script:
@@ -21,14 +28,17 @@ Run this script from the command line or another Python script:
 import os
 import sys
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import seaborn as sns
 
 # Add project root directory to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from reduction import EVENT_ID, first_treatment_days, reduce_to_subjects
+from schema import DATE_FORMAT, RAW_SCHEMA, fill_category, read_csv
+from segments import drop, load_index, segment_files
+from watermark import advance_watermark, write_watermark
+
 from config import PROCESSED_FILES, RAW_FILES
 
 # Set pandas display options
@@ -37,94 +47,104 @@ pd.set_option("display.max_columns", None)
 pd.set_option("display.width", 0)
 pd.set_option("display.float_format", "{:.2f}".format)
 
-# Load Data
-print("Loading data...")
-comorbidities = pd.read_csv(RAW_FILES["comorbidities"])
-diagnosis = pd.read_csv(RAW_FILES["diagnosis"])
-labs = pd.read_csv(RAW_FILES["labs"])
-treatments = pd.read_csv(RAW_FILES["treatments"])
-
-# Merge Data
-print("Merging data...")
-df = (
-    diagnosis.merge(comorbidities, on=["subject_id", "hadm_id"], how="left")
-    .merge(
-        labs[["subject_id", "had_ddimer", "had_o2_sat"]], on="subject_id", how="inner"
+
+def preprocess(comorbidities, diagnosis, labs, treatments):
+    """Merge the raw tables and clean them into one record per subject.
+
+    Every step only looks at the rows of one subject, so running it on a subset
+    of subjects gives exactly their records of the full run (see `incremental.py`).
+    """
+    # Earliest Treatment Day (row-wise min of `days_to_*`, taken before the fan-out
+    # merge)
+    print("Creating 'days_to_init_treatment'...")
+    treatments = first_treatment_days(treatments)
+
+    # Merge Data
+    print("Merging data...")
+    # Number the diagnosis rows (on a copy), to identify PE events across the fan-out
+    diagnosis = diagnosis.assign(**{EVENT_ID: np.arange(len(diagnosis))})
+    df = (
+        diagnosis.merge(comorbidities, on=["subject_id", "hadm_id"], how="left")
+        .merge(
+            labs[["subject_id", "had_ddimer", "had_o2_sat"]],
+            on="subject_id",
+            how="inner",
+        )
+        .merge(treatments, on="subject_id", how="left")
+    )
+
+    # Convert Data Types
+    print("Converting data types...")
+    df["dvt_icd_version"] = df["dvt_icd_version"].astype("object")
+    df["pe_icd_version"] = df["pe_icd_version"].astype("object")
+
+    # Ensure Subject-Level Data
+    # One groupby-aggregate keeps each subject's first record by `pe_date` and counts
+    # its PE events
+    print("Ensuring unique subjects...")
+    df = reduce_to_subjects(df)
+
+    # Handle Missing Values
+    print("Handling missing values...")
+    df["discharge_location"] = fill_category(df["discharge_location"], "Unknown")
+    df["insurance"] = fill_category(df["insurance"], "Unknown")
+    df["marital_status"] = fill_category(df["marital_status"], "Unknown")
+
+    df["pe_icd_code"] = fill_category(df["pe_icd_code"], "No PE")
+    df["pe_icd_version"] = fill_category(df["pe_icd_version"], "No PE")
+    df["pe_diagnosis"] = fill_category(df["pe_diagnosis"], "No PE")
+
+    # Categorize `days_to_init_treatment`
+    print("Categorizing treatment times...")
+    bins = [-0.1, 0, 3, 7, np.inf]  # Open-ended, so any subset gets the same labels
+    labels = ["Same day", "1-3 days", "4-7 days", "More than 7 days"]
+    df["cat_days_to_init_treatment"] = pd.cut(
+        df["days_to_init_treatment"], bins=bins, labels=labels
+    )
+
+    # Fill in NaN values with "No Treatment"
+    df["cat_days_to_init_treatment"] = fill_category(
+        df["cat_days_to_init_treatment"], "No Treatment"
     )
-    .merge(treatments, on="subject_id", how="left")
-)
-
-# Convert Data Types
-print("Converting data types...")
-df["dvt_icd_version"] = df["dvt_icd_version"].astype("object")
-df["pe_icd_version"] = df["pe_icd_version"].astype("object")
-
-# Ensure Subject-Level Data
-print("Ensuring unique subjects...")
-df["num_pe_events"] = df.groupby("subject_id")["pe_outcome"].sum()
-df = df.sort_values(by=["subject_id", "pe_date"]).drop_duplicates(
-    subset="subject_id", keep="first"
-)
-
-# Handle Missing Values
-print("Handling missing values...")
-df["discharge_location"].fillna("Unknown", inplace=True)
-df["insurance"].fillna("Unknown", inplace=True)
-df["marital_status"].fillna("Unknown", inplace=True)
-
-df["pe_icd_code"].fillna("No PE", inplace=True)
-df["pe_icd_version"].fillna("No PE", inplace=True)
-df["pe_diagnosis"].fillna("No PE", inplace=True)
-
-# Create `days_to_init_treatment`
-print("Creating 'days_to_init_treatment'...")
-treatment_days = ["days_to_ac", "days_to_lytics", "days_to_mt", "days_to_cdt"]
-df["days_to_init_treatment"] = df[treatment_days].min(axis=1, skipna=True)
-
-# Categorize `days_to_init_treatment`
-print("Categorizing treatment times...")
-bins = [-0.1, 0, 3, 7, df["days_to_init_treatment"].max()]
-labels = ["Same day", "1-3 days", "4-7 days", "More than 7 days"]
-df["cat_days_to_init_treatment"] = pd.cut(
-    df["days_to_init_treatment"], bins=bins, labels=labels
-)
-
-# Ensure "No Treatment" is a valid category
-df["cat_days_to_init_treatment"] = df["cat_days_to_init_treatment"].astype("category")
-df["cat_days_to_init_treatment"] = df["cat_days_to_init_treatment"].cat.add_categories(
-    "No Treatment"
-)
-
-# Fill in NaN values with "No Treatment"
-df["cat_days_to_init_treatment"].fillna("No Treatment", inplace=True)
-
-# Drop Unnecessary Columns
-print("Dropping unnecessary columns...")
-df.drop(
-    columns=[
-        "days_to_ac",
-        "days_to_lytics",
-        "days_to_mt",
-        "days_to_cdt",
-        "days_to_init_treatment",
-    ],
-    inplace=True,
-)
-
-# Filter Out Expired Patients
-print("Filtering expired patients...")
-expired = df[
-    ((df["hospital_expire_flag"] == 1) | (df["discharge_location"] == "DIED"))
-    & df["days_to_pe"].isna()
-]
-df = df[(df["hospital_expire_flag"] == 0) & (df["discharge_location"] != "DIED")]
-
-# Save Processed Data
-# Ensure processed directory exists before saving
-processed_dir = os.path.dirname(PROCESSED_FILES["preprocessed"])
-if not os.path.exists(processed_dir):
-    print(f"Creating directory: {processed_dir}")
-    os.makedirs(processed_dir, exist_ok=True)
-print(f"Saving processed data to {PROCESSED_FILES['preprocessed']}...")
-df.to_csv(PROCESSED_FILES["preprocessed"], index=False)
-print("Preprocessing complete!")
+
+    # Drop Unnecessary Columns
+    print("Dropping unnecessary columns...")
+    df.drop(columns=["days_to_init_treatment"], inplace=True)
+
+    # Filter Out Expired Patients
+    print("Filtering expired patients...")
+    df = df[(df["hospital_expire_flag"] == 0) & (df["discharge_location"] != "DIED")]
+    return df
+
+
+if __name__ == "__main__":
+    # Load Data
+    print("Loading data...")
+    comorbidities = read_csv(RAW_FILES["comorbidities"], RAW_SCHEMA)
+    diagnosis = read_csv(RAW_FILES["diagnosis"], RAW_SCHEMA)
+    labs = read_csv(RAW_FILES["labs"], RAW_SCHEMA)
+    treatments = read_csv(RAW_FILES["treatments"], RAW_SCHEMA)
+    df = preprocess(comorbidities, diagnosis, labs, treatments)
+
+    # Save Processed Data
+    # Ensure processed directory exists before saving
+    processed_dir = os.path.dirname(PROCESSED_FILES["preprocessed"])
+    if not os.path.exists(processed_dir):
+        print(f"Creating directory: {processed_dir}")
+        os.makedirs(processed_dir, exist_ok=True)
+    print(f"Saving processed data to {PROCESSED_FILES['preprocessed']}...")
+    df.to_csv(PROCESSED_FILES["preprocessed"], index=False, date_format=DATE_FORMAT)
+    drop(PROCESSED_FILES["preprocessed"])  # Segments of earlier incremental runs
+
+    # Record the last processed admission (copied next to the engineered data by
+    # `engineering.py`); without admissions, the previous mark stays
+    watermark = advance_watermark(diagnosis)
+    if watermark is not None:
+        write_watermark(watermark, PROCESSED_FILES["watermark"])
+
+    # Index the Raw Tables for `incremental.py`
+    print("Indexing raw tables...")
+    for table in ["comorbidities", "diagnosis", "labs", "treatments"]:
+        for path in [RAW_FILES[table]] + segment_files(RAW_FILES[table]):
+            load_index(path)
+    print("Preprocessing complete!")
@@ -0,0 +1,65 @@
+"""
+reduction.py
+
+This module reduces the merged preprocessing frame to one record per subject.
+
+`preprocessing.py` merges every DVT diagnosis of a subject with all of that
+subject's lab and treatment rows, so a subject can appear many times. One
+hash-based groupby-aggregate over `subject_id` yields, in a single pass:
+- the first record of each subject by `pe_date` (missing dates last, ties in merge
+  order), the same row a stable sort on (`subject_id`, `pe_date`) followed by
+  `drop_duplicates(keep="first")` would keep;
+- `num_pe_events`: the number of distinct diagnosis rows with a PE, aligned by
+  subject and unaffected by the lab/treatment fan-out.
+
+The row-wise minimum over `days_to_*` is taken on the treatments table before the
+merge (`first_treatment_days`), so the fan-out carries one column instead of four.
+
+Usage:
+    from reduction import first_treatment_days, reduce_to_subjects
+"""
+
+import numpy as np
+import pandas as pd
+
+TREATMENT_DAYS = ["days_to_ac", "days_to_lytics", "days_to_mt", "days_to_cdt"]
+
+# Diagnosis row number carried through the merge to count distinct PE events
+EVENT_ID = "diagnosis_row"
+
+
+def first_treatment_days(treatments, columns=TREATMENT_DAYS):
+    """Replace the `days_to_*` columns by their row-wise minimum, `days_to_init_treatment`."""
+    treatments = treatments.copy()
+    treatments["days_to_init_treatment"] = treatments[columns].min(axis=1, skipna=True)
+    return treatments.drop(columns=columns)
+
+
+def reduce_to_subjects(df, event_id=EVENT_ID):
+    """Keep the first record per subject by `pe_date` and add `num_pe_events`.
+
+    `df[event_id]` identifies the diagnosis row each merged row came from; it is
+    dropped from the result. Subjects are returned in `subject_id` order.
+    """
+    # Rank pe_date (missing dates last) and append the row position, so the
+    # per-subject minimum of one integer key picks the earliest date, first row among ties
+    date_rank, dates = pd.factorize(df["pe_date"], sort=True)
+    date_rank[date_rank == -1] = len(dates)
+    order_key = date_rank.astype(np.int64) * len(df) + np.arange(len(df))
+
+    subjects = (
+        pd.DataFrame(
+            {
+                "subject_id": df["subject_id"].to_numpy(),
+                "order_key": order_key,
+                "pe_event": df[event_id].where(df["pe_outcome"] == 1).to_numpy(),
+            }
+        )
+        .groupby("subject_id")
+        .agg(first_row=("order_key", "min"), num_pe_events=("pe_event", "nunique"))
+    )
+
+    reduced = df.take(subjects["first_row"].to_numpy() % len(df))
+    del reduced[event_id]
+    reduced["num_pe_events"] = subjects["num_pe_events"].to_numpy()
+    return reduced
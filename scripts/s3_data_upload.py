@@ -45,6 +45,13 @@ dataset_files = [
     "y_train.csv",
     "y_val.csv",
     "y_test.csv",
+    "X_train.npy",
+    "X_val.npy",
+    "X_test.npy",
+    "y_train.npy",
+    "y_val.npy",
+    "y_test.npy",
+    "manifest.json",  # Written last by model_prep.py, so upload it last too
 ]
 
 
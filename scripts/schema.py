@@ -0,0 +1,193 @@
+"""
+schema.py
+
+This module declares the compact column dtypes used by the offline pipeline.
+`preprocessing.py`, `engineering.py` and `model_prep.py` load their inputs through
+`read_csv`, so every stage works on the same memory-efficient representation:
+
+- Binary flags are stored as int8.
+- High-repetition strings (race, insurance, locations, diagnoses, ...) are categories.
+- Timestamps are parsed to datetime64.
+- Remaining numerics are downcast to the smallest type that holds them.
+
+Integer columns that contain missing values (e.g. after a left merge) fall back
+to a float type instead of failing.
+
+Usage:
+    from schema import PREPROCESSED_SCHEMA, read_csv
+    df = read_csv(PROCESSED_FILES["preprocessed"], PREPROCESSED_SCHEMA)
+"""
+
+import numpy as np
+import pandas as pd
+from segments import merged
+
+# Timestamps are written back in the same ISO format as the BigQuery extracts
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# Column Groups
+ID_COLUMNS = ["subject_id", "hadm_id", "hadm_id_x", "hadm_id_y"]
+
+DATE_COLUMNS = ["dvt_date", "dvt_date_x", "dvt_date_y", "pe_date", "dischtime"]
+
+FLAG_COLUMNS = [
+    "hospital_expire_flag",
+    "had_dvt_as_pri_diagnosis",
+    "had_icu_stay",
+    "hx_ac",
+    "hx_dvt",
+    "hx_pe",
+    "hx_vte",
+    "pe_outcome",
+    "had_ddimer",
+    "had_o2_sat",
+    "ac_flag",
+    "lytics_flag",
+    "mt_flag",
+    "us_cdt_flag",
+    "myocardial_infarct",
+    "congestive_heart_failure",
+    "peripheral_vascular_disease",
+    "cerebrovascular_disease",
+    "dementia",
+    "chronic_pulmonary_disease",
+    "rheumatic_disease",
+    "peptic_ulcer_disease",
+    "mild_liver_disease",
+    "diabetes_without_cc",
+    "diabetes_with_cc",
+    "paraplegia",
+    "renal_disease",
+    "malignant_cancer",
+    "severe_liver_disease",
+    "metastatic_solid_tumor",
+    "aids",
+]
+
+CATEGORY_COLUMNS = [
+    "admission_type",
+    "admission_location",
+    "discharge_location",
+    "insurance",
+    "marital_status",
+    "race",
+    "gender",
+    "dvt_icd_code",
+    "dvt_diagnosis",
+    "dvt_chronicity",
+    "dvt_location",
+    "pe_icd_code",
+    "pe_diagnosis",
+    "cat_days_to_init_treatment",
+    "treatment_grouped",
+    "race_grouped",
+    "discharge_location_grouped",
+    "admission_location_grouped",
+]
+
+SMALL_INT_COLUMNS = {
+    "anchor_age": "int16",
+    "age": "int16",
+    "length_of_stay": "int16",
+    "num_dvt_admissions": "int16",
+    "num_dvt_diagnoses": "int16",
+    "charlson_comorbidity_index": "int16",
+    "dvt_icd_version": "int8",
+}
+
+FLOAT_COLUMNS = [
+    "days_to_pe",
+    "days_to_ac",
+    "days_to_lytics",
+    "days_to_mt",
+    "days_to_cdt",
+    "num_pe_events",
+]
+
+
+def _build_schema(**overrides):
+    """Combine the column groups into a single {column: dtype} mapping."""
+    schema = {}
+    schema.update({col: "int32" for col in ID_COLUMNS})
+    schema.update({col: "datetime64[ns]" for col in DATE_COLUMNS})
+    schema.update({col: "int8" for col in FLAG_COLUMNS})
+    schema.update({col: "category" for col in CATEGORY_COLUMNS})
+    schema.update(SMALL_INT_COLUMNS)
+    schema.update({col: "float32" for col in FLOAT_COLUMNS})
+    schema.update(overrides)
+    return schema
+
+
+# Stage Schemas
+# `pe_icd_version` is numeric in the raw extract and becomes a label
+# ("No PE", 9.0, 10.0) once preprocessing fills missing values.
+RAW_SCHEMA = _build_schema(pe_icd_version="float32")
+PREPROCESSED_SCHEMA = _build_schema(pe_icd_version="category")
+ENGINEERED_SCHEMA = PREPROCESSED_SCHEMA
+
+
+def _fallback_dtype(dtype):
+    """Float type used when an integer column contains missing values."""
+    # float32 holds small integers exactly; IDs need float64
+    return "float32" if np.dtype(dtype).itemsize <= 2 else "float64"
+
+
+def apply_schema(df, schema):
+    """Cast the columns of `df` that appear in `schema` to their declared dtypes."""
+    for col in df.columns.intersection(list(schema)):
+        dtype = schema[col]
+        if dtype == "category" or str(df[col].dtype) == dtype:
+            df[col] = df[col].astype(dtype)
+        elif dtype.startswith("datetime"):
+            df[col] = pd.to_datetime(df[col])
+        elif np.dtype(dtype).kind == "i" and df[col].isna().any():
+            df[col] = df[col].astype(_fallback_dtype(dtype))
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def read_csv(path, schema, **kwargs):
+    """Read a pipeline CSV and apply `schema` at load time.
+
+    Categorical and date columns are converted by the CSV parser itself, so
+    the intermediate object columns are never materialized in full. Rows that
+    `incremental.py` appended as segments are included (see `segments.py`).
+    """
+    with merged(path) as source:
+        columns = pd.read_csv(source, nrows=0, **kwargs).columns
+        categories = {
+            col: "category" for col in columns if schema.get(col) == "category"
+        }
+        dates = [col for col in columns if str(schema.get(col)).startswith("datetime")]
+        df = pd.read_csv(source, dtype=categories, parse_dates=dates, **kwargs)
+    return apply_schema(df, schema)
+
+
+def fill_category(series, value):
+    """Fill missing values of a categorical column, adding `value` if needed."""
+    if not hasattr(series, "cat"):
+        return series.fillna(value)
+    if value not in series.cat.categories:
+        series = series.cat.add_categories(value)
+    return series.fillna(value)
+
+
+def map_categories(series, mapping):
+    """Map a categorical column through `mapping` using its category codes.
+
+    Only the (few) categories are looked up in `mapping`; rows are relabeled by
+    indexing the resulting code table, so the cost does not depend on string
+    lengths. Unmapped values become missing, as with `Series.map`.
+    """
+    series = series.astype("category")
+    mapped = series.cat.categories.map(mapping)
+    new_categories = pd.Index(mapped.dropna().unique())
+    # Append -1 so that missing values (code -1) stay missing
+    lookup = np.append(new_categories.get_indexer(mapped), -1)
+    codes = lookup[series.cat.codes.to_numpy()]
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=new_categories),
+        index=series.index,
+        name=series.name,
+    )
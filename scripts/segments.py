@@ -0,0 +1,278 @@
+"""
+segments.py
+
+This module stores the updates that `incremental.py` makes to a pipeline CSV as
+append-only segments next to it, so that a daily run only writes the rows it
+changes instead of rewriting the whole table.
+
+Layout of a table `<name>.csv`:
+- `<name>.csv`: the base table, written by a full run.
+- `<name>.csv.segments/NNNNNN.csv`: rows appended by one update, same header.
+- `<name>.csv.segments/NNNNNN.keys`: the keys (one per line) the segment replaces.
+  Rows of earlier files with one of these keys are superseded, even when the
+  segment has no row left for the key (e.g. a subject that no longer qualifies).
+- `<name>.csv.segments/meta.json`: the key column (0 = `subject_id`, 1 = `hadm_id`)
+  and whether the files are sorted by `subject_id`.
+- `<file>.index/`: `subject_id.npy`, `offset.npy` and `length.npy` of every row of a
+  base or segment file, sorted by `subject_id`, so the rows of a few subjects are
+  read with a binary search and one seek per row (`lookup`). `meta.json` holds
+  the size and mtime of the indexed file; a stale index is rebuilt.
+
+`merged` gives readers the logical table (`schema.read_csv` goes through it), and
+`compact` folds the segments back into the base table.
+
+Usage:
+    from segments import append, lookup, merged
+    append(path, header, lines, keys, key_field=1)
+    with merged(path) as source:
+        df = pd.read_csv(source)
+"""
+
+import glob
+import heapq
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+# Segments are folded into the base table once they exceed this fraction of it
+COMPACT_RATIO = 0.25
+
+
+def segment_dir(path):
+    """Directory holding the segments of the table at `path`."""
+    return f"{path}.segments"
+
+
+def index_dir(path):
+    """Directory holding the subject index of a base or segment file."""
+    return f"{path}.index"
+
+
+def segment_files(path):
+    """Segment CSV files of the table at `path`, oldest first."""
+    return sorted(glob.glob(os.path.join(segment_dir(path), "[0-9]*.csv")))
+
+
+def _read_meta(path):
+    with open(os.path.join(segment_dir(path), "meta.json")) as f:
+        return json.load(f)
+
+
+def _fields(line, n):
+    """First `n` comma-separated fields of a CSV line."""
+    return line.split(",", n)[:n]
+
+
+def _lines(f):
+    """Non-empty lines of an open text file, without line endings."""
+    for line in f:
+        line = line.rstrip("\r\n")
+        if line:
+            yield line
+
+
+def _read_keys(segment):
+    with open(segment[: -len(".csv")] + ".keys") as f:
+        return set(_lines(f))
+
+
+def _superseded(path):
+    """[(file, keys replaced by later files)] for the base table and its segments."""
+    files = [path] + segment_files(path)
+    later, runs = set(), []
+    for file in reversed(files):
+        runs.append((file, later))
+        if file != path:
+            later = later | _read_keys(file)
+    return runs[::-1]
+
+
+def _file_state(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def build_index(path):
+    """Index the rows of a CSV file by `subject_id` (its first column)."""
+    subject_ids, offsets, lengths = [], [], []
+    with open(path, "rb") as f:
+        offset = len(f.readline())
+        for line in f:
+            if line.strip():
+                subject_ids.append(int(line.split(b",", 1)[0]))
+                offsets.append(offset)
+                lengths.append(len(line))
+            offset += len(line)
+
+    # A stable sort keeps the rows of each subject in file order
+    order = np.argsort(np.asarray(subject_ids, dtype=np.int64), kind="stable")
+    directory = index_dir(path)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    for name, values in [
+        ("subject_id", subject_ids),
+        ("offset", offsets),
+        ("length", lengths),
+    ]:
+        np.save(
+            os.path.join(directory, f"{name}.npy"),
+            np.asarray(values, dtype=np.int64)[order],
+        )
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(_file_state(path), f)
+
+
+def load_index(path):
+    """(subject_id, offset, length) arrays of a file, memory-mapped.
+
+    The index is (re)built when it is missing or older than the file.
+    """
+    directory = index_dir(path)
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            fresh = json.load(f) == _file_state(path)
+    except (FileNotFoundError, ValueError):
+        fresh = False
+    if not fresh:
+        build_index(path)
+    return tuple(
+        np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        for name in ["subject_id", "offset", "length"]
+    )
+
+
+def lookup(path, subject_ids):
+    """Current rows of `subject_ids` in the table at `path`.
+
+    Returns the lines in the order `merged` would give them (base table first,
+    then the segments, each in file order), without reading any other rows.
+    """
+    wanted = np.unique(np.asarray([int(s) for s in subject_ids], dtype=np.int64))
+    key_field = _read_meta(path)["key_field"] if segment_files(path) else 0
+    lines = []
+    for file, superseded in _superseded(path):
+        index_ids, offsets, lengths = load_index(file)
+        starts = np.searchsorted(index_ids, wanted, side="left")
+        ends = np.searchsorted(index_ids, wanted, side="right")
+        rows = np.concatenate(
+            [np.arange(start, end) for start, end in zip(starts, ends)] or [[]]
+        ).astype(np.int64)
+        rows = rows[np.argsort(offsets[rows], kind="stable")]
+        with open(file, "rb") as f:
+            for row in rows:
+                f.seek(offsets[row])
+                line = f.read(lengths[row]).decode().rstrip("\r\n")
+                if _fields(line, key_field + 1)[key_field] not in superseded:
+                    lines.append(line)
+    return lines
+
+
+def _current_lines(file, superseded, key_field):
+    with open(file) as f:
+        f.readline()
+        for line in _lines(f):
+            if _fields(line, key_field + 1)[key_field] not in superseded:
+                yield line
+
+
+def write_merged(path, out_path):
+    """Write the logical table at `path` (base table plus segments) to `out_path`."""
+    with open(path) as f:
+        header = f.readline().rstrip("\r\n")
+    with open(out_path, "w") as out:
+        out.write(header + "\n")
+        if not segment_files(path):
+            with open(path) as f:
+                f.readline()
+                out.writelines(line + "\n" for line in _lines(f))
+            return
+        meta = _read_meta(path)
+        runs = [
+            _current_lines(file, superseded, meta["key_field"])
+            for file, superseded in _superseded(path)
+        ]
+        if meta["sorted"]:
+            lines = heapq.merge(*runs, key=lambda line: int(_fields(line, 1)[0]))
+        else:
+            lines = (line for run in runs for line in run)
+        out.writelines(line + "\n" for line in lines)
+
+
+@contextmanager
+def merged(path):
+    """Path of a file with the logical table at `path`.
+
+    Without segments this is `path` itself; otherwise the merge is written to a
+    temporary file that is removed on exit.
+    """
+    if not segment_files(path):
+        yield path
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        out_path = os.path.join(tmp_dir, os.path.basename(path))
+        write_merged(path, out_path)
+        yield out_path
+
+
+def append(path, header, lines, keys, key_field, sorted_by_subject=False):
+    """Add a segment replacing the rows of `keys` with `lines`.
+
+    The segment becomes visible when its CSV file is renamed into place, after
+    its keys and before its index, so an interrupted write leaves no segment.
+    """
+    with open(path) as f:
+        if f.readline().rstrip("\r\n") != header:
+            raise ValueError(f"Columns of the new rows differ from {path}")
+
+    directory = segment_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    meta_path = os.path.join(directory, "meta.json")
+    if not os.path.exists(meta_path):
+        with open(meta_path, "w") as f:
+            json.dump({"key_field": key_field, "sorted": sorted_by_subject}, f)
+
+    existing = segment_files(path)
+    number = int(os.path.basename(existing[-1])[:-4]) + 1 if existing else 1
+    segment = os.path.join(directory, f"{number:06d}.csv")
+    if sorted_by_subject:
+        lines = sorted(lines, key=lambda line: int(_fields(line, 1)[0]))
+    with open(segment[: -len(".csv")] + ".keys", "w") as f:
+        f.writelines(f"{key}\n" for key in keys)
+    with open(f"{segment}.tmp", "w") as f:
+        f.write(header + "\n")
+        f.writelines(line + "\n" for line in lines)
+    os.replace(f"{segment}.tmp", segment)
+    build_index(segment)
+
+
+def segment_bytes(path):
+    """Total size of the segments of the table at `path`."""
+    return sum(os.path.getsize(file) for file in segment_files(path))
+
+
+def needs_compaction(path, ratio=COMPACT_RATIO):
+    """Whether the segments of `path` exceed `ratio` times its base table."""
+    return segment_bytes(path) > ratio * os.path.getsize(path)
+
+
+def compact(path):
+    """Fold the segments into the base table.
+
+    The merged table replaces the base before the segments are removed; a run
+    interrupted in between only re-applies segments the base already contains.
+    """
+    if not segment_files(path):
+        return
+    write_merged(path, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+    drop(path)
+
+
+def drop(path):
+    """Remove the segments and index of the table at `path` (after a full rewrite)."""
+    shutil.rmtree(segment_dir(path), ignore_errors=True)
+    shutil.rmtree(index_dir(path), ignore_errors=True)
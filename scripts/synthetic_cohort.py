@@ -0,0 +1,292 @@
+"""
+synthetic_cohort.py
+
+This script generates a schema-faithful synthetic cohort at a multiple of the size of
+the raw extracts, so the offline pipeline can be profiled on hospital-system volumes.
+
+Synthetic patients are drawn by resampling whole source patients: every row a source
+`subject_id` has in `diagnosis`, `labs`, `treatments` and the comorbidity tables is
+copied together. The repo ships no comorbidity source (it needs a `diagnoses_icd`
+export), so when `comorbidities.csv` is missing a `diagnoses_icd` table is drawn for
+the source DVT admissions (`synthesize_diagnoses_icd`) and classified by
+`comorbidity.py`, like a real export would be. Column distributions, cross-table
+correlations and join fan-out (rows per subject, the many-to-one `subject_id` merges,
+shared `hadm_id`s) are therefore preserved, while each copy is a distinct patient.
+
+Key Steps:
+1. Load the source raw tables (synthesizing the comorbidity tables if there are none)
+   and index their rows by `subject_id`.
+2. Number each subject's admissions, so a copied `hadm_id` stays consistent across
+   tables.
+3. Draw `scale` x (number of source subjects) patients with replacement, in blocks.
+4. Give every synthetic patient a new `subject_id`/`hadm_id` range and shift all of
+   its timestamps by one random number of days (intervals such as `days_to_pe` are
+   kept).
+5. Append each block to the output CSVs and write a `cohort.json` manifest.
+
+The output mirrors the layout of `data/`, so any stage can run on it through the
+`PE_DATA_DIR` environment variable read by `config.py`.
+
+Usage:
+    python scripts/synthetic_cohort.py --scale 10
+    PE_DATA_DIR=data/synthetic/x10 python scripts/preprocessing.py
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add project root directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from comorbidity import compute_comorbidities
+from schema import DATE_COLUMNS, DATE_FORMAT
+from segments import merged
+
+from config import RAW_FILES, SYNTHETIC_DATA_DIR
+
+# Tables resampled per subject (the comorbidity tables are synthesized when missing)
+COHORT_TABLES = ["diagnosis", "labs", "treatments", "comorbidities", "diagnoses_icd"]
+
+# Without a diagnoses_icd export: approximate prevalence of each Charlson condition in
+# DVT admissions, drawn independently with one representative ICD-10 code each
+SYNTHETIC_COMORBIDITIES = {
+    "myocardial_infarct": ("I214", 0.08),
+    "congestive_heart_failure": ("I5023", 0.18),
+    "peripheral_vascular_disease": ("I7025", 0.09),
+    "cerebrovascular_disease": ("I639", 0.10),
+    "dementia": ("F0390", 0.04),
+    "chronic_pulmonary_disease": ("J449", 0.19),
+    "rheumatic_disease": ("M069", 0.04),
+    "peptic_ulcer_disease": ("K259", 0.03),
+    "mild_liver_disease": ("K7460", 0.10),
+    "diabetes_without_cc": ("E119", 0.20),
+    "diabetes_with_cc": ("E1122", 0.09),
+    "paraplegia": ("G8220", 0.04),
+    "renal_disease": ("N184", 0.21),
+    "malignant_cancer": ("C3490", 0.25),
+    "severe_liver_disease": ("I8500", 0.05),
+    "metastatic_solid_tumor": ("C7951", 0.15),
+    "aids": ("B20", 0.01),
+}
+
+# Synthetic IDs start above the MIMIC-IV ranges so they never collide with real ones
+SUBJECT_ID_BASE = 30_000_000
+HADM_ID_BASE = 40_000_000
+
+DEFAULT_SEED = 42
+DEFAULT_MAX_SHIFT_DAYS = 365
+
+
+def cohort_dir(scale):
+    """Output directory of a synthetic cohort, e.g. data/synthetic/x10."""
+    return SYNTHETIC_DATA_DIR / f"x{scale:g}"
+
+
+def synthesize_diagnoses_icd(diagnosis, seed=DEFAULT_SEED):
+    """Draw a `diagnoses_icd` table for the DVT admissions in `diagnosis`.
+
+    Every admission keeps its own DVT code (first `seq_num`) and gets each condition
+    of `SYNTHETIC_COMORBIDITIES` with its prevalence.
+    """
+    admissions = diagnosis.drop_duplicates("hadm_id")
+    codes, rates = zip(*SYNTHETIC_COMORBIDITIES.values())
+    rng = np.random.default_rng(seed)
+    has_code = rng.random((len(admissions), len(codes))) < np.array(rates)
+    admission, code = np.nonzero(has_code)
+
+    dvt = pd.DataFrame(
+        {
+            "subject_id": admissions["subject_id"].to_numpy(),
+            "hadm_id": admissions["hadm_id"].to_numpy(),
+            "icd_code": admissions["dvt_icd_code"].astype(str).to_numpy(),
+            "icd_version": admissions["dvt_icd_version"].to_numpy(),
+        }
+    )
+    comorbid = pd.DataFrame(
+        {
+            "subject_id": admissions["subject_id"].to_numpy()[admission],
+            "hadm_id": admissions["hadm_id"].to_numpy()[admission],
+            "icd_code": np.array(codes)[code],
+            "icd_version": 10,
+        }
+    )
+    df = pd.concat([dvt, comorbid]).sort_values("hadm_id", kind="mergesort")
+    df.insert(2, "seq_num", df.groupby("hadm_id").cumcount() + 1)
+    return df.reset_index(drop=True)
+
+
+def load_sources(tables=COHORT_TABLES, seed=DEFAULT_SEED):
+    """Read every available source table, parsing its timestamp columns.
+
+    Without a comorbidities table, it is computed from `diagnoses_icd` (drawn by
+    `synthesize_diagnoses_icd` when there is no export either).
+    """
+    sources = {}
+    for name in tables:
+        path = RAW_FILES[name]
+        if not os.path.exists(path):
+            print(f"Skipping {name}: {path} not found")
+            continue
+        with merged(path) as source:
+            columns = pd.read_csv(source, nrows=0).columns
+            dates = [col for col in columns if col in DATE_COLUMNS]
+            dtype = {"icd_code": str} if "icd_code" in columns else None
+            sources[name] = pd.read_csv(source, parse_dates=dates, dtype=dtype)
+
+    missing = "comorbidities" in tables and "comorbidities" not in sources
+    if missing and "diagnosis" in sources:
+        if "diagnoses_icd" not in sources:
+            print("Synthesizing diagnoses_icd for the source DVT admissions...")
+            sources["diagnoses_icd"] = synthesize_diagnoses_icd(
+                sources["diagnosis"], seed
+            )
+        print("Computing comorbidities from diagnoses_icd...")
+        admissions = sources["diagnosis"].rename(columns={"anchor_age": "age"})
+        sources["comorbidities"] = compute_comorbidities(
+            [sources["diagnoses_icd"]], admissions
+        )
+    return sources
+
+
+def admission_slots(sources):
+    """Number the admissions of every subject across all tables.
+
+    Returns a (subject_id, hadm_id, slot) frame and the number of slots per subject;
+    synthetic patient `i` maps slot `s` to hadm_id `HADM_ID_BASE + i * n_slots + s`.
+    """
+    pairs = pd.concat(
+        [df[["subject_id", "hadm_id"]] for df in sources.values() if "hadm_id" in df]
+    )
+    pairs = pairs.dropna().drop_duplicates().sort_values(["subject_id", "hadm_id"])
+    pairs["slot"] = pairs.groupby("subject_id").cumcount()
+    return pairs, int(pairs["slot"].max()) + 1
+
+
+class SubjectIndex:
+    """Rows of one table grouped by subject, for gathering many subjects at once."""
+
+    def __init__(self, df, subjects, slots):
+        df = df.sort_values("subject_id", kind="mergesort").reset_index(drop=True)
+        if "hadm_id" in df:
+            slot = df[["subject_id", "hadm_id"]].merge(
+                slots, on=["subject_id", "hadm_id"], how="left"
+            )["slot"]
+            self.slot = slot.to_numpy(dtype=np.float64)
+        else:
+            self.slot = None
+
+        position = np.searchsorted(subjects, df["subject_id"].to_numpy())
+        self.starts = np.searchsorted(position, np.arange(len(subjects)))
+        self.counts = np.bincount(position, minlength=len(subjects))
+        self.df = df
+
+    def gather(self, samples):
+        """Return (row indices, owning sample) for every row of the sampled subjects."""
+        counts = self.counts[samples]
+        owner = np.repeat(np.arange(len(samples)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        return self.starts[samples][owner] + offsets, owner
+
+
+def synthesize_block(index, samples, sample_ids, shifts, n_slots):
+    """Copy the rows of the sampled subjects under new IDs and shifted timestamps."""
+    rows, owner = index.gather(samples)
+    block = index.df.iloc[rows].reset_index(drop=True)
+    ids = sample_ids[owner]
+
+    block["subject_id"] = SUBJECT_ID_BASE + ids
+    if index.slot is not None:
+        hadm_id = HADM_ID_BASE + ids * n_slots + index.slot[rows]
+        block["hadm_id"] = (
+            hadm_id.astype(np.int64) if not np.isnan(hadm_id).any() else hadm_id
+        )
+
+    shift = pd.to_timedelta(shifts[owner], unit="D")
+    for col in block.columns.intersection(DATE_COLUMNS):
+        block[col] = block[col] + shift
+    return block
+
+
+def generate_cohort(
+    scale, output_dir, seed=DEFAULT_SEED, max_shift_days=DEFAULT_MAX_SHIFT_DAYS
+):
+    """Write a synthetic cohort `scale` times the size of the source tables."""
+    print("Loading source tables...")
+    sources = load_sources(seed=seed)
+    if not sources:
+        raise FileNotFoundError("No source tables found in the raw data directory")
+
+    subjects = np.unique(
+        np.concatenate([df["subject_id"].to_numpy() for df in sources.values()])
+    )
+    slots, n_slots = admission_slots(sources)
+    indexes = {name: SubjectIndex(df, subjects, slots) for name, df in sources.items()}
+
+    n_total = int(round(len(subjects) * scale))
+    print(
+        f"Generating {n_total} subjects ({scale:g}x {len(subjects)}) "
+        f"into {output_dir}..."
+    )
+    raw_dir = output_dir / "raw"
+    os.makedirs(raw_dir, exist_ok=True)
+    paths = {name: raw_dir / os.path.basename(RAW_FILES[name]) for name in sources}
+
+    rng = np.random.default_rng(seed)
+    rows_written = dict.fromkeys(sources, 0)
+    for first in range(0, n_total, len(subjects)):
+        sample_ids = np.arange(first, min(first + len(subjects), n_total))
+        samples = rng.integers(0, len(subjects), size=len(sample_ids))
+        shifts = rng.integers(-max_shift_days, max_shift_days + 1, size=len(sample_ids))
+
+        for name, index in indexes.items():
+            block = synthesize_block(index, samples, sample_ids, shifts, n_slots)
+            block.to_csv(
+                paths[name],
+                mode="w" if first == 0 else "a",
+                header=first == 0,
+                index=False,
+                date_format=DATE_FORMAT,
+            )
+            rows_written[name] += len(block)
+
+    # Fan-out check: rows per subject of the source vs the synthetic tables
+    print("\nRows per subject (source vs synthetic):")
+    for name, df in sources.items():
+        source_rows = len(df) / len(subjects)
+        synthetic_rows = rows_written[name] / n_total
+        print(f"  {name:<14} {source_rows:.3f} vs {synthetic_rows:.3f}")
+
+    manifest = {
+        "scale": scale,
+        "seed": seed,
+        "max_shift_days": max_shift_days,
+        "source_subjects": int(len(subjects)),
+        "subjects": n_total,
+        "rows": rows_written,
+    }
+    with open(output_dir / "cohort.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic PE cohort.")
+    parser.add_argument("--scale", type=float, required=True)
+    parser.add_argument("--output", type=str, default=None)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--max-shift-days", type=int, default=DEFAULT_MAX_SHIFT_DAYS)
+    args = parser.parse_args()
+
+    output_dir = cohort_dir(args.scale) if args.output is None else Path(args.output)
+    start_time = time.perf_counter()
+    generate_cohort(args.scale, output_dir, args.seed, args.max_shift_days)
+    print(f"\nSynthetic cohort written in {time.perf_counter() - start_time:.1f}s")
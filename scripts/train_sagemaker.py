@@ -14,6 +14,9 @@ S3_BUCKET = os.getenv("S3_BUCKET")
 S3_TRAINING_DATA = f"s3://{S3_BUCKET}/data/"
 S3_MODEL_OUTPUT_PATH = f"s3://{S3_BUCKET}/models/"
 SAGEMAKER_ROLE = os.getenv("SAGEMAKER_ROLE")
+# "File" copies the data into the container; "Pipe" streams the .npy matrices
+# written by model_prep.py through one channel per matrix
+TRAINING_INPUT_MODE = os.getenv("TRAINING_INPUT_MODE", "File")
 
 # Initialize SageMaker session
 sagemaker_session = sagemaker.Session()
@@ -21,18 +24,24 @@ sagemaker_session = sagemaker.Session()
 # Define SageMaker SKLearn Estimator
 sklearn_estimator = SKLearn(
     entry_point="train_script.py",
+    source_dir=os.path.dirname(os.path.abspath(__file__)),  # Ships training_data.py
     role=SAGEMAKER_ROLE,
     instance_count=1,
     instance_type="ml.m5.large",
     framework_version="0.23-1",
     sagemaker_session=sagemaker_session,
-    input_mode="File",
+    input_mode=TRAINING_INPUT_MODE,
     output_path=S3_MODEL_OUTPUT_PATH,
 )
 
 # Start training job
 print(f"Starting training job with data from: {S3_TRAINING_DATA}")
-sklearn_estimator.fit({"training": S3_TRAINING_DATA})
+if TRAINING_INPUT_MODE == "Pipe":
+    sklearn_estimator.fit(
+        {name: f"{S3_TRAINING_DATA}{name}.npy" for name in ["X_train", "y_train"]}
+    )
+else:
+    sklearn_estimator.fit({"training": S3_TRAINING_DATA})
 
 # Save trained model path
 model_path = sklearn_estimator.model_data
@@ -21,12 +21,14 @@ subprocess.call(
 print("Dependencies installed!")
 
 import argparse
+import json
 
 import joblib
-import pandas as pd
+import numpy as np
 from imblearn.over_sampling import SMOTE
 from imblearn.under_sampling import RandomUnderSampler
 from sklearn.ensemble import RandomForestClassifier
+from training_data import PIPE_DIR, load_training_data
 
 # Best Model Hyperparameters
 BEST_PARAMS = {
@@ -38,27 +40,57 @@ BEST_PARAMS = {
 }
 SMOTE_SAMPLING_STRATEGY = 0.2
 UNDERSAMPLING_STRATEGY = 0.7
+DRIFT_REFERENCE_BINS = 10
 
-# Parse input arguments (SageMaker provides `/opt/ml/input/data/training/`)
+
+def build_drift_reference(X, n_bins=DRIFT_REFERENCE_BINS):
+    """Summarize each training feature as a fixed-size histogram for drift monitoring.
+
+    Features with few distinct values (flags, one-hot columns) get one bin per
+    value; continuous features get quantile bins. Bins are defined by cut points,
+    and a value v falls in bin `searchsorted(cut_points, v, side="right")`.
+    """
+    features = []
+    for col in X.columns:
+        values = X[col].to_numpy(dtype=float)
+        unique_values = np.unique(values)
+        if len(unique_values) <= n_bins:
+            cut_points = (unique_values[:-1] + unique_values[1:]) / 2
+        else:
+            quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+            cut_points = np.unique(np.quantile(values, quantiles))
+        bins = np.searchsorted(cut_points, values, side="right")
+        counts = np.bincount(bins, minlength=len(cut_points) + 1)
+        features.append(
+            {
+                "name": str(col),
+                "cut_points": cut_points.tolist(),
+                "proportions": (counts / counts.sum()).tolist(),
+            }
+        )
+    return {"n_samples": int(len(X)), "features": features}
+
+
+# Parse input arguments (SageMaker provides `/opt/ml/input/data/training/` in File
+# mode, or one FIFO per channel in `/opt/ml/input/data/` in Pipe mode)
 parser = argparse.ArgumentParser()
 parser.add_argument("--train", type=str, default="/opt/ml/input/data/training/")
+parser.add_argument("--pipe_dir", type=str, default=PIPE_DIR)
 parser.add_argument(
     "--model_dir", type=str, default="/opt/ml/model/"
 )  # SageMaker's default model directory
 args = parser.parse_args()
 
 # Check available files in the container
-print(f"Checking files in {args.train}...")
-available_files = os.listdir(args.train)
-print(f"Available files: {available_files}")
-
-# Load Training Data
-X_train_path = os.path.join(args.train, "X_train.csv")
-y_train_path = os.path.join(args.train, "y_train.csv")
+if os.path.isdir(args.train):
+    print(f"Checking files in {args.train}...")
+    available_files = os.listdir(args.train)
+    print(f"Available files: {available_files}")
 
+# Load Training Data (Pipe-mode stream, memory-mapped .npy or CSV; see training_data.py)
 print("Loading training data...")
-X_train = pd.read_csv(X_train_path, header=None)
-y_train = pd.read_csv(y_train_path, header=None).squeeze()  # Ensure 1D target array
+X_train, y_train, data_format = load_training_data(args.train, args.pipe_dir)
+print(f"Loaded training data from {data_format} input")
 
 # Debug: Print dataset shapes before preprocessing
 print(f"X_train shape BEFORE resampling: {X_train.shape}")
@@ -85,3 +117,9 @@ model_path = os.path.join(args.model_dir, "model.pkl")
 
 joblib.dump(model, model_path)
 print(f"Model trained and saved to {model_path}")
+
+# Save the training distribution next to the model for drift monitoring in the API
+drift_reference_path = os.path.join(args.model_dir, "drift_reference.json")
+with open(drift_reference_path, "w") as f:
+    json.dump(build_drift_reference(X_train), f)
+print(f"Drift reference saved to {drift_reference_path}")
@@ -0,0 +1,179 @@
+"""
+training_data.py
+
+This module writes and reads the train/val/test matrices shared by `model_prep.py`
+and `train_script.py`. CSV files are slow to load: SageMaker copies them to the
+container, then pandas parses every value. Next to the CSV files, `model_prep.py`
+also writes one `.npy` file per matrix and a small `manifest.json` with their shapes,
+dtypes and feature names.
+
+`train_script.py` detects what it was given and loads it in one of three ways:
+- `pipe`: SageMaker Pipe mode, with one FIFO per channel (`<pipe_dir>/X_train_0`,
+  `<pipe_dir>/y_train_0`). The `.npy` header is parsed, then the raw bytes stream
+  straight into a preallocated array, chunk by chunk.
+- `npy`: File mode with a manifest. The `.npy` files are memory-mapped, so nothing is
+  parsed and pages load on first access.
+- `csv`: the original headerless CSV files.
+
+The manifest is written last, so its presence means the `.npy` files are complete.
+`feed_pipes` is a local stand-in for Pipe mode (used by `benchmark_training_io.py`).
+
+Usage:
+    from training_data import load_training_data, save_matrices
+    save_matrices(MODEL_DATA_DIR, {"X_train": X_train, ...}, feature_names)
+    X_train, y_train, data_format = load_training_data("/opt/ml/input/data/training/")
+"""
+
+import json
+import os
+import stat
+import threading
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+PIPE_DIR = "/opt/ml/input/data"  # SageMaker Pipe mode FIFOs: <channel>_<epoch>
+TRAINING_MATRICES = ["X_train", "y_train"]
+CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def save_matrices(directory, matrices, feature_names):
+    """Write each matrix as `<name>.npy` (X float64, y int64) plus the manifest."""
+    files = {}
+    for name, data in matrices.items():
+        dtype = np.float64 if name.startswith("X") else np.int64
+        array = np.ascontiguousarray(data.to_numpy(dtype=dtype))
+        if name.startswith("y"):
+            array = array.ravel()
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+        files[name] = {
+            "file": f"{name}.npy",
+            "shape": list(array.shape),
+            "dtype": array.dtype.str,
+        }
+
+    manifest = {
+        "format": "npy",
+        "version": FORMAT_VERSION,
+        "feature_names": [str(name) for name in feature_names],
+        "files": files,
+    }
+    temp_path = os.path.join(directory, f".{MANIFEST}.tmp")
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, os.path.join(directory, MANIFEST))
+    return manifest
+
+
+def read_manifest(directory):
+    """The manifest in `directory`, or None if there is none."""
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported manifest version: {manifest.get('version')}")
+    return manifest
+
+
+def is_fifo(path):
+    return os.path.exists(path) and stat.S_ISFIFO(os.stat(path).st_mode)
+
+
+def pipe_path(pipe_dir, name, epoch=0):
+    return os.path.join(pipe_dir, f"{name}_{epoch}")
+
+
+def detect_format(train_dir, pipe_dir=PIPE_DIR):
+    """Return "pipe", "npy" or "csv" depending on the inputs that are present."""
+    if all(is_fifo(pipe_path(pipe_dir, name)) for name in TRAINING_MATRICES):
+        return "pipe"
+    if os.path.isdir(train_dir) and read_manifest(train_dir) is not None:
+        return "npy"
+    return "csv"
+
+
+def read_npy_stream(stream, chunk_bytes=CHUNK_BYTES):
+    """Read a `.npy` array from a non-seekable binary stream (e.g. a FIFO).
+
+    The header gives the shape and dtype, so the data is read with `readinto`
+    directly into the final array, without intermediate buffers.
+    """
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    else:
+        raise ValueError(f"Unsupported .npy format version: {version}")
+    if dtype.hasobject:
+        raise ValueError("Object arrays cannot be streamed")
+
+    data = np.empty(int(np.prod(shape)) * dtype.itemsize, dtype=np.uint8)
+    view = memoryview(data)
+    position = 0
+    while position < len(data):
+        n_bytes = stream.readinto(view[position : position + chunk_bytes])
+        if not n_bytes:
+            raise EOFError(f"Stream ended after {position} of {len(data)} bytes")
+        position += n_bytes
+    return data.view(dtype).reshape(shape, order="F" if fortran_order else "C")
+
+
+def load_matrix(name, data_format, train_dir, pipe_dir=PIPE_DIR):
+    """Load one matrix as a numpy array in the given format."""
+    if data_format == "pipe":
+        with open(pipe_path(pipe_dir, name), "rb", buffering=0) as stream:
+            return read_npy_stream(stream)
+    if data_format == "npy":
+        entry = read_manifest(train_dir)["files"][name]
+        array = np.load(
+            os.path.join(train_dir, entry["file"]), mmap_mode="r", allow_pickle=False
+        )
+        if list(array.shape) != entry["shape"] or array.dtype.str != entry["dtype"]:
+            raise ValueError(f"{entry['file']} does not match the manifest")
+        return array
+    return pd.read_csv(os.path.join(train_dir, f"{name}.csv"), header=None).to_numpy()
+
+
+def load_training_data(train_dir, pipe_dir=PIPE_DIR, data_format=None):
+    """Return (X_train DataFrame, y_train Series, format) like the CSV path did.
+
+    Columns are positional (0..n-1), as with `read_csv(header=None)`.
+    """
+    data_format = data_format or detect_format(train_dir, pipe_dir)
+    X = load_matrix("X_train", data_format, train_dir, pipe_dir)
+    y = load_matrix("y_train", data_format, train_dir, pipe_dir)
+    return pd.DataFrame(X), pd.Series(np.ravel(y)), data_format
+
+
+def feed_pipes(data_dir, pipe_dir, names=TRAINING_MATRICES, epoch=0):
+    """Local stand-in for Pipe mode: serve `<data_dir>/<name>.npy` through FIFOs.
+
+    Creates `<pipe_dir>/<name>_<epoch>` and writes each file into its FIFO from a
+    background thread once a reader opens it. Returns the threads.
+    """
+    os.makedirs(pipe_dir, exist_ok=True)
+
+    def feed(source, fifo):
+        with open(source, "rb") as src, open(fifo, "wb") as dst:
+            while True:
+                chunk = src.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                dst.write(chunk)
+
+    threads = []
+    for name in names:
+        fifo = pipe_path(pipe_dir, name, epoch)
+        if not is_fifo(fifo):
+            os.mkfifo(fifo)
+        thread = threading.Thread(
+            target=feed, args=(os.path.join(data_dir, f"{name}.npy"), fifo), daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+    return threads
@@ -0,0 +1,80 @@
+"""
+watermark.py
+
+This module keeps the high-water mark of the DVT admissions that the engineered
+dataset already contains: the largest (`dischtime`, `hadm_id`) pair of the raw
+diagnosis rows processed so far. `dischtime` orders admissions by when they can
+first appear in an extract, and `hadm_id` breaks ties between admissions discharged
+at the same time.
+
+`preprocessing.py` records the mark next to `preprocessed.csv`, and `engineering.py`
+copies it next to `engineered.csv` once that is written, so each output carries the
+mark of the admissions it contains. `incremental.py` advances both after each delta.
+The next daily extract only needs admissions above the mark (plus any corrected
+rows), e.g. `WHERE a.dischtime >= @dischtime` in `data/sql_queries/diagnosis.sql`.
+
+Usage:
+    from watermark import advance_watermark, read_watermark, write_watermark
+    write_watermark(advance_watermark(diagnosis, read_watermark()))
+"""
+
+import json
+import os
+import sys
+
+import pandas as pd
+
+# Add project root directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from schema import DATE_FORMAT
+
+from config import ENGINEERED_FILES
+
+
+def read_watermark(path=ENGINEERED_FILES["watermark"]):
+    """The stored mark as {"dischtime": Timestamp, "hadm_id": int}, or None."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    return {
+        "dischtime": pd.Timestamp(state["dischtime"]),
+        "hadm_id": int(state["hadm_id"]),
+    }
+
+
+def write_watermark(watermark, path=ENGINEERED_FILES["watermark"]):
+    """Store the mark atomically, so a failed run leaves the previous one in place."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {
+                "dischtime": watermark["dischtime"].strftime(DATE_FORMAT),
+                "hadm_id": watermark["hadm_id"],
+            },
+            f,
+            indent=2,
+        )
+    os.replace(tmp_path, path)
+
+
+def above_watermark(diagnosis, watermark):
+    """Boolean mask of the diagnosis rows whose admission is above `watermark`."""
+    if watermark is None:
+        return pd.Series(True, index=diagnosis.index)
+    dischtime = diagnosis["dischtime"]
+    return (dischtime > watermark["dischtime"]) | (
+        (dischtime == watermark["dischtime"])
+        & (diagnosis["hadm_id"] > watermark["hadm_id"])
+    )
+
+
+def advance_watermark(diagnosis, watermark=None):
+    """The larger of `watermark` and the last admission in `diagnosis`."""
+    rows = diagnosis.loc[above_watermark(diagnosis, watermark)]
+    if rows.empty:
+        return watermark
+    last = rows.sort_values(["dischtime", "hadm_id"]).iloc[-1]
+    return {"dischtime": last["dischtime"], "hadm_id": int(last["hadm_id"])}
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add backend directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend")))
+from admission import BULK, INTERACTIVE, AdmissionController, Rejected
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_cancelled_waiter_does_not_leak_its_slot():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, timeout=5.0)
+        await controller.acquire(INTERACTIVE)
+
+        queued = asyncio.ensure_future(controller.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        assert len(controller.waiters[INTERACTIVE]) == 1
+
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert len(controller.waiters[INTERACTIVE]) == 0
+
+        controller.release(INTERACTIVE)
+        assert controller.in_flight[INTERACTIVE] == 0
+
+        # Capacity is intact: the next request gets the slot without waiting
+        await controller.acquire(INTERACTIVE, timeout=0.01)
+        assert controller.in_flight[INTERACTIVE] == 1
+
+    run(scenario())
+
+
+def test_cancelled_after_grant_hands_the_slot_back():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, timeout=5.0)
+        await controller.acquire(INTERACTIVE)
+
+        queued = asyncio.ensure_future(controller.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+
+        # The slot is granted, but the request is cancelled before it resumes
+        controller.release(INTERACTIVE)
+        assert controller.in_flight[INTERACTIVE] == 1
+        queued.cancel()
+        try:
+            await queued
+        except asyncio.CancelledError:
+            pass
+        else:
+            # Before Python 3.12, wait_for returns a result that is already set instead of
+            # raising; the request then owns the slot and releases it when done
+            controller.release(INTERACTIVE)
+        assert controller.in_flight[INTERACTIVE] == 0
+        assert len(controller.waiters[INTERACTIVE]) == 0
+
+    run(scenario())
+
+
+def test_queued_request_times_out_and_frees_its_place():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, bulk_max_concurrency=1, timeout=0.01)
+        await controller.acquire(BULK)
+
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire(BULK)
+        assert rejected.value.status_code == 503
+        assert len(controller.waiters[BULK]) == 0
+
+        controller.release(BULK)
+        await controller.acquire(BULK)
+        assert controller.in_flight[BULK] == 1
+
+    run(scenario())
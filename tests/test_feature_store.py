@@ -0,0 +1,55 @@
+import importlib.util
+import os
+
+import numpy as np
+
+# Loaded by path: backend/ has a `feature_store` module of its own
+spec = importlib.util.spec_from_file_location(
+    "scripts_feature_store",
+    os.path.join(os.path.dirname(__file__), "..", "scripts", "feature_store.py"),
+)
+feature_store = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(feature_store)
+POINTER_FILE = feature_store.POINTER_FILE
+
+
+def build(store_dir):
+    features = np.eye(2)
+    return feature_store.build_feature_store([2, 1], features, ["a", "b"], store_dir=str(store_dir))
+
+
+def versions(store_dir):
+    names = os.listdir(store_dir)
+    return sorted(name for name in names if not name.startswith((".", POINTER_FILE)))
+
+
+def test_builds_in_the_same_tick_get_distinct_ordered_versions(tmp_path, monkeypatch):
+    monkeypatch.setattr(feature_store.time, "time_ns", lambda: 1_700_000_000_000_000_000)
+
+    first = build(tmp_path)
+    second = build(tmp_path)
+
+    assert first < second
+    assert versions(tmp_path) == [first, second]
+    assert (tmp_path / POINTER_FILE).read_text() == second
+
+
+def test_pruning_keeps_the_active_version(tmp_path):
+    old, middle, new = build(tmp_path), build(tmp_path), build(tmp_path)
+    assert versions(tmp_path) == [middle, new]
+
+    # A rollback points CURRENT at an older version than the two newest
+    (tmp_path / old).mkdir()
+    (tmp_path / POINTER_FILE).write_text(old)
+    feature_store._prune_versions(str(tmp_path), keep=1)
+
+    assert versions(tmp_path) == [old, new]
+
+
+def test_legacy_versions_sort_before_nanosecond_versions(tmp_path):
+    (tmp_path / "20991231235959-123").mkdir()
+    version = build(tmp_path)
+    build(tmp_path)
+
+    assert "20991231235959-123" not in versions(tmp_path)
+    assert version in versions(tmp_path)
@@ -0,0 +1,58 @@
+import os
+import signal
+import sys
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+# Add backend directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend")))
+from compact_forest import CompactForest
+from inference_pool import InferencePool
+
+
+@pytest.fixture(scope="module")
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 5))
+    y = (X[:, 0] + rng.normal(size=500) > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=10, max_depth=5, random_state=0).fit(X, y)
+    return CompactForest.from_sklearn(model), X[:50].astype(np.float32)
+
+
+@pytest.fixture
+def pool(forest):
+    pool = InferencePool(forest[0], n_workers=1, max_rows=16, timeout=0.5)
+    yield pool
+    pool.close()
+
+
+def test_pool_matches_forest(pool, forest):
+    model, X = forest
+    np.testing.assert_array_equal(pool.predict_proba(X), model.predict_proba(X))
+
+
+def test_hung_worker_is_replaced(pool, forest):
+    model, X = forest
+    process, _ = pool._workers[0]
+    os.kill(process.pid, signal.SIGSTOP)
+
+    with pytest.raises(RuntimeError, match="did not answer"):
+        pool.predict_proba(X)
+
+    process.join(timeout=1)
+    assert not process.is_alive()
+    np.testing.assert_array_equal(pool.predict_proba(X), model.predict_proba(X))
+
+
+def test_dead_worker_is_replaced(pool, forest):
+    model, X = forest
+    process, _ = pool._workers[0]
+    os.kill(process.pid, signal.SIGKILL)
+    process.join(timeout=1)
+
+    with pytest.raises(RuntimeError, match="exited unexpectedly"):
+        pool.predict_proba(X)
+
+    np.testing.assert_array_equal(pool.predict_proba(X), model.predict_proba(X))
@@ -0,0 +1,106 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add scripts directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+from benchmark_reduction import grouped_reduction, legacy_reduction
+from preprocessing import preprocess
+from reduction import EVENT_ID, reduce_to_subjects
+from schema import RAW_SCHEMA, read_csv
+
+from config import RAW_FILES
+
+
+def merged_rows(rows):
+    """A merged frame as `preprocess` hands it to `reduce_to_subjects`."""
+    df = pd.DataFrame(rows, columns=["subject_id", EVENT_ID, "pe_date", "pe_outcome", "had_ddimer"])
+    df["pe_date"] = pd.to_datetime(df["pe_date"])
+    return df
+
+
+def test_num_pe_events_counts_distinct_pe_diagnoses_per_subject():
+    df = merged_rows(
+        [
+            # Subject 1: two PE diagnoses, each fanned out over two lab rows
+            (1, 0, "2150-01-05", 1, 0),
+            (1, 0, "2150-01-05", 1, 1),
+            (1, 1, "2150-01-02", 1, 0),
+            (1, 1, "2150-01-02", 1, 1),
+            # Subject 2: one DVT without PE, one with
+            (2, 2, None, 0, 0),
+            (2, 3, "2151-03-01", 1, 0),
+            # Subject 3: no PE at all
+            (3, 4, None, 0, 1),
+            (3, 4, None, 0, 0),
+        ]
+    )
+
+    reduced = reduce_to_subjects(df).set_index("subject_id")
+
+    assert reduced["num_pe_events"].to_dict() == {1: 2, 2: 1, 3: 0}
+    assert EVENT_ID not in reduced.columns
+
+
+def test_first_record_is_earliest_pe_date_with_missing_dates_last():
+    df = merged_rows(
+        [
+            (1, 0, "2150-01-05", 1, 0),
+            (1, 1, "2150-01-02", 1, 1),
+            (2, 2, None, 0, 0),
+            (2, 3, "2151-03-01", 1, 1),
+            (3, 4, None, 0, 1),
+            (3, 4, None, 0, 0),
+        ]
+    )
+
+    reduced = reduce_to_subjects(df).set_index("subject_id")
+
+    assert reduced.loc[1, "pe_date"] == pd.Timestamp("2150-01-02")
+    assert reduced.loc[2, "pe_date"] == pd.Timestamp("2151-03-01")
+    assert reduced.loc[3, "had_ddimer"] == 1  # Ties keep the first row in merge order
+
+
+@pytest.fixture(scope="module")
+def raw_tables():
+    diagnosis = read_csv(RAW_FILES["diagnosis"], RAW_SCHEMA)
+    labs = read_csv(RAW_FILES["labs"], RAW_SCHEMA)
+    treatments = read_csv(RAW_FILES["treatments"], RAW_SCHEMA)
+    # Comorbidity columns are only carried along, so an empty table is enough here
+    comorbidities = diagnosis[["subject_id", "hadm_id"]].iloc[:0].copy()
+    return comorbidities, diagnosis, labs, treatments
+
+
+def test_preprocess_does_not_modify_its_inputs(raw_tables):
+    copies = [table.copy() for table in raw_tables]
+
+    preprocess(*raw_tables)
+
+    for table, copy in zip(raw_tables, copies):
+        pd.testing.assert_frame_equal(table, copy)
+
+
+def test_preprocess_num_pe_events_matches_raw_pe_diagnoses(raw_tables):
+    comorbidities, diagnosis, labs, treatments = raw_tables
+
+    df = preprocess(comorbidities, diagnosis, labs, treatments).set_index("subject_id")
+
+    # Subjects without lab rows are dropped by the inner merge
+    with_labs = diagnosis[diagnosis["subject_id"].isin(labs["subject_id"])]
+    expected = (with_labs["pe_outcome"] == 1).groupby(with_labs["subject_id"]).sum()
+    assert df["num_pe_events"].notna().all()
+    np.testing.assert_array_equal(df["num_pe_events"], expected.loc[df.index])
+
+
+def test_reduction_keeps_the_legacy_records(raw_tables):
+    legacy = legacy_reduction(*raw_tables).reset_index(drop=True)
+    # Merges the tables as `preprocess` does, then calls `reduce_to_subjects`
+    grouped = grouped_reduction(*raw_tables).reset_index(drop=True)
+
+    # num_pe_events is deliberately fixed: the legacy code assigned it by row index
+    columns = legacy.columns.drop("num_pe_events")
+    assert set(grouped.columns) == set(legacy.columns)
+    pd.testing.assert_frame_equal(grouped[columns], legacy[columns])
@@ -0,0 +1,61 @@
+import os
+import sys
+
+# Add scripts directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+from segments import append, compact, lookup, merged, segment_files, write_merged
+
+HEADER = "subject_id,hadm_id,value"
+
+
+def write_table(path, lines):
+    with open(path, "w") as f:
+        f.write(HEADER + "\n")
+        f.writelines(line + "\n" for line in lines)
+
+
+def read_lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def test_raw_segments_replace_admissions(tmp_path):
+    path = str(tmp_path / "labs.csv")
+    write_table(path, ["1,10,a", "2,20,b", "1,11,c", "3,30,d"])
+
+    # Admission 10 is corrected, 12 is new; a later segment replaces 12 again
+    append(path, HEADER, ["1,10,A", "1,12,e"], ["10", "12"], key_field=1)
+    append(path, HEADER, ["1,12,E"], ["12"], key_field=1)
+
+    expected = ["2,20,b", "1,11,c", "3,30,d", "1,10,A", "1,12,E"]
+    with merged(path) as source:
+        assert read_lines(source) == [HEADER] + expected
+    assert lookup(path, ["1"]) == ["1,11,c", "1,10,A", "1,12,E"]
+    assert lookup(path, [3, 4]) == ["3,30,d"]
+
+
+def test_output_segments_stay_sorted_and_drop_subjects(tmp_path):
+    path = str(tmp_path / "engineered.csv")
+    write_table(path, ["1,10,a", "3,30,b", "5,50,c"])
+
+    # Subject 3 no longer qualifies: its key is replaced without a new row
+    lines = ["4,40,d", "1,10,A"]
+    append(path, HEADER, lines, ["1", "3", "4"], key_field=0, sorted_by_subject=True)
+
+    with merged(path) as source:
+        assert read_lines(source) == [HEADER, "1,10,A", "4,40,d", "5,50,c"]
+
+
+def test_compact_folds_segments_into_the_base_table(tmp_path):
+    path = str(tmp_path / "labs.csv")
+    write_table(path, ["1,10,a", "2,20,b"])
+    append(path, HEADER, ["2,20,B"], ["20"], key_field=1)
+    write_merged(path, str(tmp_path / "expected.csv"))
+
+    compact(path)
+
+    assert segment_files(path) == []
+    assert read_lines(path) == read_lines(str(tmp_path / "expected.csv"))
+    with merged(path) as source:
+        assert source == path
+    assert lookup(path, ["2"]) == ["2,20,B"]